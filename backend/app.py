@@ -1,30 +1,35 @@
-from flask import Flask, request, jsonify, send_file, session, redirect, url_for, flash, send_from_directory, current_app, abort
+from flask import Flask, Response, stream_with_context, request, jsonify, send_file, session, redirect, url_for, flash, send_from_directory, current_app, abort
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.units import inch, mm
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from roehn_converter import RoehnProjectConverter
+from project_snapshot import RoomCircuitIndex
+from serializers import serialize_circuito, serialize_keypad, serialize_cena
+from project_tree import TREE_FIELDS, build_project_tree, build_project_tree_normalized
+from sak_allocation import SakAllocator, load_renumbering_rows, plan_renumbering
+from csv_export import iter_circuitos_csv
+from pdf_report import build_project_report
+from project_import import import_project
+from auto_binding import load_auto_binding_data, partition_by_board, solve_boards
+from pagination import ListArgsError, parse_list_args, parse_fields, load_only_columns, apply_filters, text_match, paginate
+from project_changes import ProjectChangeTracker
+from artifact_cache import ArtifactCache
+from jobs import JobRunner, JobQueueFull, Artifact, NULL_PROGRESS
 from datetime import datetime, timedelta
-from sqlalchemy import select, event, or_
+from sqlalchemy import select, insert, update, event, or_, inspect, text
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import joinedload
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload, contains_eager, load_only
+from sqlalchemy.exc import IntegrityError, OperationalError
 from functools import wraps
 from werkzeug.security import generate_password_hash
 import uuid
 import io
-import csv
+import hashlib
 import json
 import re
 import os
+import unicodedata
+from urllib.parse import quote
 from datetime import datetime
-from database import db, User, Projeto, Area, Ambiente, Circuito, Modulo, Vinculacao, Keypad, KeypadButton, QuadroEletrico, Cena, Acao, CustomAcao
+from database import db, User, Projeto, Area, Ambiente, Circuito, Modulo, Vinculacao, Keypad, KeypadButton, QuadroEletrico, Cena, Acao, CustomAcao, Job
 
 app = Flask(__name__, instance_relative_config=True)
 
@@ -37,6 +42,16 @@ except OSError:
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.instance_path, 'projetos.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'sua-chave-secreta-muito-longa-aqui-altere-para-uma-chave-segura'
+# Nível do log do conversor RWP: debug (uma linha por item), info, warning, error ou quiet
+app.config['ROEHN_CONVERTER_LOG_LEVEL'] = os.environ.get('ROEHN_CONVERTER_LOG_LEVEL', 'warning')
+# Cache em disco dos arquivos exportados (RWP, PDF, CSV, JSON)
+app.config['ARTIFACT_CACHE_DIR'] = os.path.join(app.instance_path, 'artifact_cache')
+app.config['ARTIFACT_CACHE_MAX_BYTES'] = int(os.environ.get('ARTIFACT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Tarefas em segundo plano (exportações/importações com ?async=1, ver jobs.py)
+app.config['JOBS_DIR'] = os.path.join(app.instance_path, 'jobs')
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('JOB_MAX_PENDING', 20))
+app.config['JOB_RETENTION_SECONDS'] = int(os.environ.get('JOB_RETENTION_SECONDS', 3600))
 
 # Configuração do Flask-Login
 login_manager = LoginManager()
@@ -47,6 +62,18 @@ login_manager.login_message_category = 'info'
 
 db.init_app(app)
 
+# Alterações nos projetos invalidam os artefatos exportados em cache
+project_changes = ProjectChangeTracker().install()
+artifact_cache = ArtifactCache(app.config['ARTIFACT_CACHE_DIR'], app.config['ARTIFACT_CACHE_MAX_BYTES'])
+project_changes.subscribe(artifact_cache.invalidate)
+
+jobs = JobRunner(
+    app, app.config['JOBS_DIR'],
+    max_workers=app.config['JOB_WORKERS'],
+    max_pending=app.config['JOB_MAX_PENDING'],
+    retention=app.config['JOB_RETENTION_SECONDS'],
+)
+
 # Informações sobre os módulos
 MODULO_INFO = {
     'RL12': {'nome_completo': 'ADP-RL12', 'canais': 12, 'tipos_permitidos': ['luz']},
@@ -126,64 +153,6 @@ def serialize_user(user):
     }
 
 
-def serialize_keypad_button(button):
-    circuito = button.circuito
-    cena = button.cena
-    return {
-        "id": button.id,
-        "ordem": button.ordem,
-        "guid": button.guid,
-        "engraver_text": button.engraver_text,
-        "icon": button.icon,
-        "modo": button.modo,
-        "command_on": button.command_on,
-        "command_off": button.command_off,
-        "can_hold": button.can_hold,
-        "is_rocker": button.is_rocker,
-        "rocker_style": button.rocker_style,
-        "modo_double_press": button.modo_double_press,
-        "command_double_press": button.command_double_press,
-        "target_object_guid": button.target_object_guid,
-        "circuito_id": circuito.id if circuito else None,
-        "circuito": {
-            "id": circuito.id,
-            "identificador": circuito.identificador,
-            "nome": circuito.nome,
-            "tipo": circuito.tipo,
-        } if circuito else None,
-        "cena_id": cena.id if cena else None,
-        "cena": {
-            "id": cena.id,
-            "nome": cena.nome,
-        } if cena else None,
-    }
-
-
-def serialize_keypad(keypad):
-    ambiente = keypad.ambiente
-    area = ambiente.area if ambiente else None
-    return {
-        "id": keypad.id,
-        "nome": keypad.nome,
-        "modelo": keypad.modelo,
-        "color": keypad.color,
-        "button_color": keypad.button_color,
-        "button_count": keypad.button_count,
-        "hsnet": keypad.hsnet,
-        "dev_id": keypad.dev_id,
-        "notes": keypad.notes,
-        "ambiente": {
-            "id": ambiente.id,
-            "nome": ambiente.nome,
-            "area": {
-                "id": area.id,
-                "nome": area.nome,
-            } if area else None,
-        } if ambiente else None,
-        "buttons": [serialize_keypad_button(btn) for btn in sorted(keypad.buttons, key=lambda b: b.ordem)],
-    }
-
-
 def ensure_keypad_button_slots(keypad, count: int):
     """Garante que keypad.buttons tenha exatamente `count` itens (1..count)."""
     # cria os que faltam
@@ -228,6 +197,97 @@ def is_hsnet_in_use(hsnet, projeto_id, exclude_keypad_id=None, exclude_modulo_id
         modulo_query = modulo_query.filter(Modulo.id != exclude_modulo_id)
     return modulo_query.first() is not None
 
+def set_attachment_filename(response, download_name):
+    """Define o Content-Disposition de download (mesma codificação usada pelo send_file)."""
+    try:
+        download_name.encode('ascii')
+        value = {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        value = {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='')}"}
+    response.headers.set('Content-Disposition', 'attachment', **value)
+    return response
+
+def send_cached_artifact(projeto_id, token, kind, params, mimetype, download_name):
+    """Envia o artefato do cache, se existir; caso contrário retorna None."""
+    path = artifact_cache.get(projeto_id, token, kind, params)
+    if not path:
+        return None
+    response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+    response.headers['X-Artifact-Cache'] = 'hit'
+    return response
+
+def wants_async():
+    """A requisição pediu execução em segundo plano (?async=1 ou Prefer: respond-async)?"""
+    return (
+        request.values.get('async', '').lower() in ('1', 'true', 'on', 'sim')
+        or 'respond-async' in request.headers.get('Prefer', '')
+    )
+
+def submit_job(kind, fn, projeto_id=None, download=False):
+    """Coloca ``fn(progress)`` na fila de tarefas e responde 202 com o ID da tarefa."""
+    try:
+        job_id = jobs.submit(kind, fn, current_user.id, projeto_id)
+    except JobQueueFull:
+        return jsonify({"ok": False, "error": "Muitas tarefas na fila. Tente novamente em instantes."}), 503
+    except OperationalError as e:
+        # Ex.: banco travado por uma importação em andamento
+        app.logger.warning(f"Não foi possível registrar a tarefa '{kind}': {e}")
+        return jsonify({"ok": False, "error": "Não foi possível registrar a tarefa agora. Tente novamente em instantes."}), 503
+    payload = {"ok": True, "job_id": job_id, "status_url": url_for('api_job_status', job_id=job_id)}
+    if download:
+        payload["download_url"] = url_for('api_job_download', job_id=job_id)
+    response = jsonify(payload)
+    response.status_code = 202
+    response.headers['Location'] = payload["status_url"]
+    return response
+
+def project_etag(fn):
+    """ETag fraca para GETs do projeto atual, derivada da revisão do projeto.
+
+    A revisão é lida sem carregar o ORM; se o cliente já tiver a versão atual
+    (If-None-Match), responde 304 sem executar a view.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        projeto_id = session.get("projeto_atual_id")
+        token = project_changes.token(db.session, projeto_id) if projeto_id else None
+        if token is None:
+            return fn(*args, **kwargs)
+
+        payload = json.dumps(
+            [request.endpoint, kwargs, sorted(request.args.items(multi=True)), projeto_id, token],
+            sort_keys=True, default=str,
+        )
+        etag = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = current_app.make_response(fn(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    return wrapper
+
+def list_page(filters, build_stmt, order_by, key_of):
+    """Lê limit/cursor/filtros da requisição e executa a listagem paginada.
+
+    ``build_stmt()`` devolve o select base (já restrito ao projeto). Retorna
+    ``(objetos, extras)``, onde ``extras`` traz ``total``/``next_cursor`` quando
+    há ``limit``; erros de parâmetro sobem como ListArgsError.
+    """
+    limit, cursor, values = parse_list_args(request.args, filters)
+    stmt = apply_filters(build_stmt(), filters, values)
+    items, total, next_cursor = paginate(db.session, stmt, order_by, key_of, limit, cursor)
+    extras = {} if limit is None else {"total": total, "next_cursor": next_cursor}
+    return items, extras
+
+@app.errorhandler(ListArgsError)
+def handle_list_args_error(e):
+    return jsonify({"ok": False, "error": str(e)}), 400
+
 def is_valid_ip(ip):
     if not ip:
         return True  # Permite IP vazio
@@ -309,6 +369,12 @@ def unauthorized():
 # Criar tabelas e usuário admin padrão
 with app.app_context():
     db.create_all()
+    # Bancos criados antes da coluna projeto.revision
+    colunas_projeto = {c['name'] for c in inspect(db.engine).get_columns('projeto')}
+    if 'revision' not in colunas_projeto:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE projeto ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"))
+        print("Coluna projeto.revision adicionada")
     # Verificar se as tabelas dos quadros elétricos foram criadas
     try:
         # Tentar uma consulta simples para verificar se a tabela existe
@@ -321,6 +387,10 @@ with app.app_context():
         db.create_all()
         print("Tabelas recriadas com sucesso")
     
+    # Tarefas que ficaram pela metade em uma execução anterior
+    jobs.recover()
+    jobs.purge()
+
     # Criar usuário admin padrão se não existir
     if not User.query.filter_by(username='admin').first():
         admin_user = User(username='admin', email='admin@empresa.com', role='admin')
@@ -329,6 +399,61 @@ with app.app_context():
         db.session.commit()
 
 
+# Métricas da última conversão RWP de cada usuário (preenchidas ao fim do download)
+ROEHN_CONVERSION_STATS = {}
+
+
+@app.route('/api/roehn/stats', methods=['GET'])
+@login_required
+def roehn_stats():
+    stats = ROEHN_CONVERSION_STATS.get(current_user.id)
+    if not stats:
+        return jsonify({"ok": False, "error": "Nenhuma conversão registrada."}), 404
+    return jsonify({"ok": True, "stats": stats})
+
+
+# -------------------- Tarefas em segundo plano --------------------
+
+def get_job_or_error(job_id):
+    """Tarefa do usuário atual (ou de qualquer usuário, para admin); ou (None, resposta de erro)."""
+    job = jobs.get(job_id)
+    if job is None:
+        return None, (jsonify({"ok": False, "error": "Tarefa não encontrada."}), 404)
+    if job['user_id'] != current_user.id and current_user.role != 'admin':
+        return None, (jsonify({"ok": False, "error": "Acesso negado."}), 403)
+    return job, None
+
+
+@app.get('/api/jobs')
+@login_required
+def api_jobs_list():
+    return jsonify({"ok": True, "jobs": jobs.list(current_user.id)})
+
+
+@app.get('/api/jobs/<job_id>')
+@login_required
+def api_job_status(job_id):
+    job, error = get_job_or_error(job_id)
+    if error:
+        return error
+    return jsonify({"ok": True, "job": job})
+
+
+@app.get('/api/jobs/<job_id>/download')
+@login_required
+def api_job_download(job_id):
+    job, error = get_job_or_error(job_id)
+    if error:
+        return error
+    if job['status'] != 'concluido' or not job['download']:
+        return jsonify({"ok": False, "error": "A tarefa ainda não gerou um arquivo.", "status": job['status']}), 409
+    row = db.session.get(Job, job_id)
+    if not os.path.exists(row.artifact_path):
+        return jsonify({"ok": False, "error": "O arquivo desta tarefa não está mais disponível."}), 410
+    return send_file(row.artifact_path, mimetype=row.artifact_mimetype, as_attachment=True,
+                     download_name=row.artifact_name)
+
+
 @app.route('/roehn/import', methods=['POST'])
 @login_required
 def roehn_import():
@@ -375,32 +500,70 @@ def roehn_import():
         if not quadro or quadro.projeto_id != projeto.id:
             m4_quadro_id = None
     project_info['m4_quadro_id'] = m4_quadro_id
+
+    compact = request.form.get('compact', '').lower() in ('1', 'true', 'on', 'sim')
+    nome_arquivo = f"{project_info['project_name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.rwp"
+    cache_token = project_changes.token(db.session, projeto.id)
+    cache_params = {k: v for k, v in project_info.items() if k != 'programmer_guid'}
+    cache_params['compact'] = compact
+    # O RWP traz a hora da geração (Created/LastModified): o cache vale só no mesmo dia
+    cache_params['data_geracao'] = datetime.now().strftime('%Y-%m-%d')
+    cached = send_cached_artifact(projeto.id, cache_token, 'rwp', cache_params, 'application/json', nome_arquivo)
+    if cached:
+        return cached
     
-    try:
+    user_id = current_user.id
+    projeto_id = projeto.id
+
+    def registrar_stats(stats):
+        ROEHN_CONVERSION_STATS[user_id] = {
+            'projeto_id': projeto_id,
+            'data': datetime.now().isoformat(timespec='seconds'),
+            **stats.as_dict(),
+        }
+
+    def converter_projeto(projeto, progress):
         # Converter dados do projeto para Roehn
-        converter = RoehnProjectConverter(projeto, db.session, current_user.id)
+        converter = RoehnProjectConverter(
+            projeto, db.session, user_id,
+            log_level=app.config['ROEHN_CONVERTER_LOG_LEVEL'],
+        )
+        progress.update(stage='Convertendo o projeto', percent=5)
         converter.create_project(project_info)
         
         # Processar os dados do projeto atual - CORREÇÃO AQUI
         # Garantir que estamos passando o projeto completo
         converter.process_db_project(projeto)
         
-        # Gerar arquivo para download
-        project_json = converter.export_project()
-        
-        # Criar resposta para download
-        output = io.BytesIO()
-        output.write(project_json.encode('utf-8'))
-        output.seek(0)
-        
-        nome_arquivo = f"{project_info['project_name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.rwp"
+        # Gerar arquivo para download (em streaming, sem montar o documento em memória)
+        progress.update(stage='Gerando o arquivo', percent=60)
+        chunks = converter.iter_export(indent=None if compact else 2, on_complete=registrar_stats)
+        return converter, artifact_cache.tee(projeto_id, cache_token, 'rwp', cache_params, chunks)
+
+    if wants_async():
+        def tarefa(progress):
+            converter, chunks = converter_projeto(db.session.get(Projeto, projeto_id), progress)
+
+            def contar(chunks):
+                gravados = 0
+                for chunk in chunks:
+                    gravados += len(chunk)
+                    progress.update(bytes_gravados=gravados)
+                    yield chunk
+
+            return Artifact(contar(chunks), nome_arquivo, 'application/json')
+
+        return submit_job('roehn', tarefa, projeto_id, download=True)
+
+    try:
+        converter, chunks = converter_projeto(projeto, NULL_PROGRESS)
         
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=nome_arquivo,
-            mimetype='application/json'
-        )
+        response = Response(chunks, mimetype='application/json')
+        set_attachment_filename(response, nome_arquivo)
+        # Tempos das etapas até o ACNET; a serialização (em streaming) fica em /api/roehn/stats
+        response.headers['Server-Timing'] = converter.stats.server_timing()
+        response.headers['X-Artifact-Cache'] = 'miss'
+        return response
         
     except Exception as e:
         # Capturar informações detalhadas do erro
@@ -650,6 +813,7 @@ def api_projetos_list():
         "data_ativo": p.data_ativo.isoformat() if p.data_ativo else None,
         "data_inativo": p.data_inativo.isoformat() if p.data_inativo else None,
         "data_concluido": p.data_concluido.isoformat() if p.data_concluido else None,
+        "revision": p.revision,
     } for p in projetos]
     return jsonify({"ok": True, "projetos": out})
 
@@ -717,6 +881,7 @@ def api_projetos_update(projeto_id):
             "data_ativo": p.data_ativo.isoformat() if p.data_ativo else None,
             "data_inativo": p.data_inativo.isoformat() if p.data_inativo else None,
             "data_concluido": p.data_concluido.isoformat() if p.data_concluido else None,
+            "revision": p.revision,
         }
     })
 
@@ -772,6 +937,7 @@ def api_projetos_create():
         "data_ativo": p.data_ativo.isoformat() if p.data_ativo else None,
         "data_inativo": p.data_inativo.isoformat() if p.data_inativo else None,
         "data_concluido": p.data_concluido.isoformat() if p.data_concluido else None,
+        "revision": p.revision,
     })
 
 @app.get("/<path:prefix>/static/images/favicon-roehn.png")
@@ -797,6 +963,7 @@ def api_projeto_atual():
             "data_ativo": p.data_ativo.isoformat() if p.data_ativo else None,
             "data_inativo": p.data_inativo.isoformat() if p.data_inativo else None,
             "data_concluido": p.data_concluido.isoformat() if p.data_concluido else None,
+            "revision": p.revision,
         }})
 
     # PUT/POST: seleciona um projeto
@@ -953,66 +1120,90 @@ def api_ambientes_delete(ambiente_id):
     db.session.commit()
     return jsonify({"ok": True, "success": True})
 
+# Campos aceitos em ?fields= nas listagens
+CIRCUITO_FIELDS = ("id", "identificador", "nome", "tipo", "dimerizavel", "potencia", "sak", "ambiente")
+KEYPAD_FIELDS = ("id", "nome", "modelo", "color", "button_color", "button_count", "hsnet", "dev_id", "notes", "ambiente", "buttons")
+CENA_FIELDS = ("id", "guid", "nome", "ambiente_id", "scene_movers", "acoes", "ambiente")
+
 # LISTAR CIRCUITOS DO PROJETO ATUAL
 @app.get("/api/circuitos")
 @login_required
+@project_etag
 def api_circuitos_list():
     projeto_id = session.get("projeto_atual_id")
     if not projeto_id:
         return jsonify({"ok": True, "circuitos": []})
 
-    circuitos = (
-        Circuito.query
-        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
-        .join(Area, Ambiente.area_id == Area.id)
-        .filter(Area.projeto_id == projeto_id)
-        .all()
+    fields = parse_fields(request.args, CIRCUITO_FIELDS)
+    options = []
+    if fields is None or "ambiente" in fields:
+        options.append(contains_eager(Circuito.ambiente).contains_eager(Ambiente.area))
+    if fields is not None:
+        options.append(load_only(*load_only_columns(Circuito, fields)))
+
+    circuitos, extras = list_page(
+        {
+            "ambiente_id": lambda v: Ambiente.id == v,
+            "area_id": lambda v: Area.id == v,
+            "tipo": lambda v: Circuito.tipo == v,
+            "vinculado": lambda v: Circuito.vinculacao.has() if v else ~Circuito.vinculacao.has(),
+            "q": text_match(Circuito.identificador, Circuito.nome, Ambiente.nome),
+        },
+        lambda: (
+            select(Circuito)
+            .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+            .join(Area, Ambiente.area_id == Area.id)
+            .where(Area.projeto_id == projeto_id)
+            .options(*options)
+        ),
+        (Circuito.id,),
+        lambda c: [c.id],
     )
-
-    out = []
-    for c in circuitos:
-        out.append({
-            "id": c.id,
-            "identificador": c.identificador,
-            "nome": c.nome,
-            "tipo": c.tipo,
-            "dimerizavel": getattr(c, "dimerizavel", False),  # ⭐⭐⭐ NOVO CAMPO
-            "potencia": getattr(c, "potencia", 0.0),  # NOVO CAMPO
-            "sak": getattr(c, "sak", None),
-            "ambiente": {
-                "id": c.ambiente.id,
-                "nome": c.ambiente.nome,
-                "area": {
-                    "id": c.ambiente.area.id,
-                    "nome": c.ambiente.area.nome,
-                } if getattr(c.ambiente, "area", None) else None,
-            } if c.ambiente else None,
-        })
-    return jsonify({"ok": True, "circuitos": out})
+    return jsonify({"ok": True, "circuitos": [serialize_circuito(c, fields) for c in circuitos], **extras})
 
 # CRIAR CIRCUITO
-@app.post("/api/circuitos")
-@login_required
-def api_circuitos_create():
-    data = request.get_json(silent=True) or request.form or {}
+def parse_circuito_payload(data):
+    """Valida os campos de um novo circuito. Retorna ``(valores, None)`` ou ``(None, erro)``."""
     identificador = (data.get("identificador") or "").strip()
     nome = (data.get("nome") or "").strip()
     tipo = (data.get("tipo") or "").strip()
     ambiente_id = data.get("ambiente_id")
     dimerizavel = data.get("dimerizavel", False)
-    potencia = float(data.get("potencia", 0.0))  # NOVO CAMPO
 
     if not identificador or not nome or not tipo or not ambiente_id:
-        return jsonify({"ok": False, "error": "Campos obrigatórios ausentes."}), 400
+        return None, "Campos obrigatórios ausentes."
 
     if tipo != "luz" and dimerizavel:
-        return jsonify({"ok": False, "error": "Campo 'dimerizavel' só é permitido para circuitos do tipo 'luz'."}), 400
+        return None, "Campo 'dimerizavel' só é permitido para circuitos do tipo 'luz'."
+
+    try:
+        potencia = float(data.get("potencia", 0.0))  # NOVO CAMPO
+        ambiente_id = int(ambiente_id)
+    except (TypeError, ValueError):
+        return None, "Potência e ambiente_id devem ser numéricos."
 
     # Validação para potência não negativa
     if potencia < 0:
-        return jsonify({"ok": False, "error": "A potência não pode ser negativa."}), 400
+        return None, "A potência não pode ser negativa."
 
-    ambiente = db.get_or_404(Ambiente, int(ambiente_id))
+    return {
+        "identificador": identificador,
+        "nome": nome,
+        "tipo": tipo,
+        "dimerizavel": bool(dimerizavel) if tipo == "luz" else False,
+        "potencia": potencia,
+        "ambiente_id": ambiente_id,
+    }, None
+
+@app.post("/api/circuitos")
+@login_required
+def api_circuitos_create():
+    data = request.get_json(silent=True) or request.form or {}
+    valores, erro = parse_circuito_payload(data)
+    if erro:
+        return jsonify({"ok": False, "error": erro}), 400
+
+    ambiente = db.get_or_404(Ambiente, valores["ambiente_id"])
 
     projeto_id = session.get("projeto_atual_id")
     if not getattr(ambiente, "area", None) or getattr(ambiente.area, "projeto_id", None) != projeto_id:
@@ -1022,55 +1213,16 @@ def api_circuitos_create():
         Circuito.query
         .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
         .join(Area, Ambiente.area_id == Area.id)
-        .filter(Area.projeto_id == projeto_id, Circuito.identificador == identificador)
+        .filter(Area.projeto_id == projeto_id, Circuito.identificador == valores["identificador"])
         .first()
     )
     if exists:
         return jsonify({"ok": False, "error": "Identificador já existe neste projeto."}), 409
 
-
     # ---------- GERAÇÃO DE SAK ----------
-    if tipo == "hvac":
-        sak = None
-        quantidade_saks = 0
-    else:
-        quantidade_saks = 2 if tipo == "persiana" else 1
+    sak, quantidade_saks = SakAllocator.load(db.session, projeto_id).allocate(valores["tipo"])
 
-        ultimo = (
-            Circuito.query
-            .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
-            .join(Area, Ambiente.area_id == Area.id)
-            .filter(Area.projeto_id == projeto_id, Circuito.tipo != "hvac")
-            .order_by(Circuito.sak.desc())
-            .first()
-        )
-
-        if ultimo:
-            proximo_base = (ultimo.sak or 0) + (ultimo.quantidade_saks or 1)
-            if tipo == "persiana":
-                existe_seguinte = (
-                    Circuito.query
-                    .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
-                    .join(Area, Ambiente.area_id == Area.id)
-                    .filter(Area.projeto_id == projeto_id, Circuito.sak == proximo_base + 1)
-                    .first()
-                )
-                if existe_seguinte:
-                    proximo_base += 2
-            sak = proximo_base
-        else:
-            sak = 1
-
-    c = Circuito(
-        identificador=identificador,
-        nome=nome,
-        tipo=tipo,
-        dimerizavel=dimerizavel if tipo == "luz" else False,
-        potencia=potencia,  # NOVO CAMPO
-        ambiente_id=ambiente.id,
-        sak=sak,
-        quantidade_saks=quantidade_saks,
-    )
+    c = Circuito(**valores, sak=sak, quantidade_saks=quantidade_saks)
     db.session.add(c)
     db.session.commit()
     
@@ -1083,6 +1235,106 @@ def api_circuitos_create():
         "potencia": c.potencia  # NOVO CAMPO
     })
 
+# Limite de circuitos por requisição em /api/circuitos/bulk
+CIRCUITOS_BULK_MAX = 5000
+
+@app.post("/api/circuitos/bulk")
+@login_required
+def api_circuitos_bulk_create():
+    """Cria vários circuitos de uma vez.
+
+    Aceita uma lista (ou ``{"circuitos": [...]}``) no mesmo formato de
+    POST /api/circuitos. Ambientes e identificadores do projeto são carregados
+    uma vez, os SAKs são alocados em memória na ordem da lista e as linhas
+    válidas são inseridas em um único INSERT (executemany) e um único commit.
+    Cada item recebe seu resultado em ``resultados``; itens inválidos não
+    impedem a criação dos demais.
+    """
+    data = request.get_json(silent=True)
+    itens = data.get("circuitos") if isinstance(data, dict) else data
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"ok": False, "error": "Envie uma lista de circuitos."}), 400
+    if len(itens) > CIRCUITOS_BULK_MAX:
+        return jsonify({"ok": False, "error": f"Máximo de {CIRCUITOS_BULK_MAX} circuitos por requisição."}), 400
+
+    projeto_id = session.get("projeto_atual_id")
+    ambientes_do_projeto = set(db.session.execute(
+        select(Ambiente.id).join(Area, Ambiente.area_id == Area.id).where(Area.projeto_id == projeto_id)
+    ).scalars())
+    identificadores = set(db.session.execute(
+        select(Circuito.identificador)
+        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+        .join(Area, Ambiente.area_id == Area.id)
+        .where(Area.projeto_id == projeto_id)
+    ).scalars())
+    saks = SakAllocator.load(db.session, projeto_id)
+
+    resultados = []
+    novos = []
+    for index, item in enumerate(itens):
+        valores, erro = parse_circuito_payload(item if isinstance(item, dict) else {})
+        status = 400
+        if not erro and valores["ambiente_id"] not in ambientes_do_projeto:
+            erro = "Ambiente não pertence ao projeto atual."
+        elif not erro and valores["identificador"] in identificadores:
+            erro, status = "Identificador já existe neste projeto.", 409
+        if erro:
+            resultados.append({"index": index, "ok": False, "status": status, "error": erro})
+            continue
+
+        identificadores.add(valores["identificador"])
+        valores["sak"], valores["quantidade_saks"] = saks.allocate(valores["tipo"])
+        novos.append(valores)
+        resultados.append({"index": index, "ok": True, **valores})
+
+    if novos:
+        # O INSERT em massa do ORM separa as linhas com valores None em outro
+        # executemany; agrupar os circuitos sem SAK (hvac) mantém dois comandos
+        db.session.execute(insert(Circuito), sorted(novos, key=lambda v: v["sak"] is None))
+        # Os identificadores são únicos no projeto: uma consulta recupera os IDs gerados
+        ids = dict(db.session.execute(
+            select(Circuito.identificador, Circuito.id)
+            .where(Circuito.ambiente_id.in_(ambientes_do_projeto),
+                   Circuito.identificador.in_([v["identificador"] for v in novos]))
+        ).all())
+        db.session.commit()
+        for resultado in resultados:
+            if resultado["ok"]:
+                resultado["id"] = ids.get(resultado["identificador"])
+
+    return jsonify({
+        "ok": True,
+        "criados": len(novos),
+        "erros": len(resultados) - len(novos),
+        "resultados": resultados,
+    })
+
+@app.post("/api/circuitos/renumerar-saks")
+@login_required
+def api_circuitos_renumerar_saks():
+    """Renumera os SAKs de todos os circuitos do projeto atual.
+
+    Os SAKs são recalculados a partir de 1 na ordem área → ambiente →
+    identificador (persiana ocupa dois, hvac fica sem). Com ``dry_run`` só
+    devolve a diferença; senão grava tudo em um único UPDATE em massa.
+    """
+    projeto_id = session.get("projeto_atual_id")
+    if not projeto_id:
+        return jsonify({"ok": False, "error": "Nenhum projeto selecionado."}), 400
+    data = request.get_json(silent=True) or {}
+    dry_run = data.get("dry_run", request.args.get("dry_run"))
+    dry_run = str(dry_run).lower() in ("1", "true", "on", "sim")
+
+    alteracoes, resumo = plan_renumbering(load_renumbering_rows(db.session, projeto_id))
+    if alteracoes and not dry_run:
+        db.session.execute(update(Circuito), [
+            {"id": a["id"], "sak": a["sak_novo"], "quantidade_saks": a["quantidade_nova"]}
+            for a in alteracoes
+        ])
+        db.session.commit()
+
+    return jsonify({"ok": True, "dry_run": dry_run, "resumo": resumo, "alteracoes": alteracoes})
+
 # -------------------- Quadros Elétricos (AutomationBoards) --------------------
 
 @app.get("/api/quadros_eletricos")
@@ -1404,6 +1656,7 @@ def modulos_spa():
     
 @app.get("/api/modulos")
 @login_required
+@project_etag
 def api_modulos_list():
     projeto_id = session.get("projeto_atual_id")
     if not projeto_id:
@@ -1670,25 +1923,23 @@ def api_vinculacao_options():
             if tipo_mod not in compat[t]:
                 compat[t].append(tipo_mod)
 
-    # Vinculações existentes do projeto (para filtrar circuitos e marcar canais ocupados)
-    vincs = (
-        Vinculacao.query
-        .join(Circuito, Vinculacao.circuito_id == Circuito.id)
-        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
-        .join(Area, Ambiente.area_id == Area.id)
-        .join(Modulo, Vinculacao.modulo_id == Modulo.id)
-        .filter(Area.projeto_id == projeto_id, Modulo.projeto_id == projeto_id)
-        .all()
-    )
-    circuitos_vinculados_ids = {v.circuito_id for v in vincs}
-
-    # Circuitos do projeto (EXCLUINDO os já vinculados)
-    circuitos = (
-        Circuito.query
-        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
-        .join(Area, Ambiente.area_id == Area.id)
-        .filter(Area.projeto_id == projeto_id)
-        .all()
+    # Circuitos do projeto ainda sem vinculação (filtrados e paginados no SQL)
+    circuitos, extras = list_page(
+        {
+            "ambiente_id": lambda v: Ambiente.id == v,
+            "area_id": lambda v: Area.id == v,
+            "tipo": lambda v: Circuito.tipo == v,
+            "q": text_match(Circuito.identificador, Circuito.nome, Ambiente.nome),
+        },
+        lambda: (
+            select(Circuito)
+            .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+            .join(Area, Ambiente.area_id == Area.id)
+            .where(Area.projeto_id == projeto_id, ~Circuito.vinculacao.has())
+            .options(contains_eager(Circuito.ambiente).contains_eager(Ambiente.area))
+        ),
+        (Circuito.id,),
+        lambda c: [c.id],
     )
     circuitos_out = [{
         "id": c.id,
@@ -1698,13 +1949,18 @@ def api_vinculacao_options():
         "potencia": c.potencia,  # ← ADICIONE ESTA LINHA
         "area_nome": getattr(c.ambiente.area, "nome", None) if c.ambiente and c.ambiente.area else None,
         "ambiente_nome": getattr(c.ambiente, "nome", None) if c.ambiente else None,
-    } for c in circuitos if c.id not in circuitos_vinculados_ids]
+    } for c in circuitos]
 
-    # Resto do código permanece igual...
+    # Canais ocupados por módulo do projeto
     modulos = Modulo.query.filter_by(projeto_id=projeto_id).all()
     ocupados_por_mod = {}
-    for v in vincs:
-        ocupados_por_mod.setdefault(v.modulo_id, set()).add(v.canal)
+    canais_ocupados = db.session.execute(
+        select(Vinculacao.modulo_id, Vinculacao.canal)
+        .join(Modulo, Vinculacao.modulo_id == Modulo.id)
+        .where(Modulo.projeto_id == projeto_id)
+    )
+    for modulo_id, canal in canais_ocupados:
+        ocupados_por_mod.setdefault(modulo_id, set()).add(canal)
 
     modulos_out = []
     for m in modulos:
@@ -1718,23 +1974,37 @@ def api_vinculacao_options():
             "quantidade_canais": m.quantidade_canais,
         })
 
-    return jsonify({"ok": True, "compat": compat, "circuitos": circuitos_out, "modulos": modulos_out})
+    return jsonify({"ok": True, "compat": compat, "circuitos": circuitos_out, "modulos": modulos_out, **extras})
 
 @app.get("/api/vinculacoes")
 @login_required
+@project_etag
 def api_vinculacoes_list():
     projeto_id = session.get("projeto_atual_id")
     if not projeto_id:
         return jsonify({"ok": True, "vinculacoes": []})
 
-    vincs = (
-        Vinculacao.query
-        .join(Circuito, Vinculacao.circuito_id == Circuito.id)
-        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
-        .join(Area, Ambiente.area_id == Area.id)
-        .join(Modulo, Vinculacao.modulo_id == Modulo.id)
-        .filter(Area.projeto_id == projeto_id, Modulo.projeto_id == projeto_id)
-        .all()
+    vincs, extras = list_page(
+        {
+            "ambiente_id": lambda v: Ambiente.id == v,
+            "area_id": lambda v: Area.id == v,
+            "tipo": lambda v: Circuito.tipo == v,
+            "q": text_match(Circuito.identificador, Circuito.nome, Modulo.nome),
+        },
+        lambda: (
+            select(Vinculacao)
+            .join(Circuito, Vinculacao.circuito_id == Circuito.id)
+            .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+            .join(Area, Ambiente.area_id == Area.id)
+            .join(Modulo, Vinculacao.modulo_id == Modulo.id)
+            .where(Area.projeto_id == projeto_id, Modulo.projeto_id == projeto_id)
+            .options(
+                contains_eager(Vinculacao.circuito).contains_eager(Circuito.ambiente).contains_eager(Ambiente.area),
+                contains_eager(Vinculacao.modulo),
+            )
+        ),
+        (Vinculacao.id,),
+        lambda v: [v.id],
     )
 
     out = []
@@ -1756,7 +2026,7 @@ def api_vinculacoes_list():
             "canal": v.canal,
             "potencia": c.potencia,
         })
-    return jsonify({"ok": True, "vinculacoes": out})
+    return jsonify({"ok": True, "vinculacoes": out, **extras})
 
 @app.post("/api/vinculacoes")
 @login_required
@@ -1809,251 +2079,77 @@ from sqlalchemy import select
 @app.post("/api/vinculacoes/auto")
 @login_required
 def api_vinculacoes_auto():
+    """Vincula automaticamente os circuitos sem vinculação, quadro a quadro.
+
+    Com ``dry_run`` (no JSON ou na query string) nada é gravado: a resposta
+    traz as vinculações propostas, a corrente de cada grupo de canais e os
+    circuitos que ficariam sem vinculação, por quadro.
+    """
     projeto_id = session.get("projeto_atual_id")
     if not projeto_id:
         return jsonify({"ok": False, "error": "Projeto não selecionado."}), 400
-
-    # Verificar se há exatamente um quadro elétrico
-    quadros = QuadroEletrico.query.filter_by(projeto_id=projeto_id).all()
-    if len(quadros) != 1:
-        return jsonify({
-            "ok": False, 
-            "error": f"A vinculação automática requer exatamente 1 quadro elétrico. Encontrados: {len(quadros)}"
-        }), 400
+    data = request.get_json(silent=True) or {}
+    dry_run = str(data.get("dry_run", request.args.get("dry_run"))).lower() in ("1", "true", "on", "sim")
 
     try:
-        # CORREÇÃO: Usar select() explicitamente para evitar warning
-        circuitos_vinculados_subquery = select(Vinculacao.circuito_id)
-        
-        circuitos_nao_vinculados = (
-            Circuito.query
-            .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
-            .join(Area, Ambiente.area_id == Area.id)
-            .filter(Area.projeto_id == projeto_id)
-            .filter(Circuito.id.notin_(circuitos_vinculados_subquery))
-            .all()
-        )
-
-        # Buscar módulos disponíveis
-        modulos_disponiveis = (
-            Modulo.query
-            .filter_by(projeto_id=projeto_id)
-            .all()
-        )
-
-        # Mapear compatibilidade atualizada
-        compatibilidade = {
-            "luz": ["RL4", "RL12", "DIM8"],
-            "persiana": ["LX4"], 
-            "hvac": ["SA1"]
-        }
-
-        # Prioridades por tipo de circuito
-        prioridades = {
-            "luz": {
-                "dimerizavel": ["DIM8", "RL12", "RL4"],
-                "nao_dimerizavel": ["RL12", "RL4", "DIM8"]
-            },
-            "persiana": ["LX4"],
-            "hvac": ["SA1"]
-        }
-
-        vinculacoes_criadas = 0
-        erros = []
-
-        # CORREÇÃO: Função para calcular corrente considerando tensão de 120V
-        def calcular_corrente(potencia):
-            if not potencia or potencia <= 0:
-                return 0
-            # CORREÇÃO: Usar 120V conforme seus circuitos
-            return potencia / 120
-
-        # CORREÇÃO: Função para calcular corrente total do grupo considerando vinculações existentes E pendentes
-        def calcular_corrente_grupo(modulo_id, canais_grupo):
-            # Corrente das vinculações existentes no banco
-            vinculacoes_existentes = Vinculacao.query.filter_by(modulo_id=modulo_id).filter(
-                Vinculacao.canal.in_(canais_grupo)
-            ).all()
-            corrente_existente = sum(calcular_corrente(v.circuito.potencia) for v in vinculacoes_existentes)
-
-            # Corrente das vinculações pendentes (na sessão atual)
-            corrente_pendente = 0
-            for obj in db.session.new:
-                if (isinstance(obj, Vinculacao) and 
-                    obj.modulo_id == modulo_id and 
-                    obj.canal in canais_grupo):
-                    circuito = Circuito.query.get(obj.circuito_id)
-                    if circuito:
-                        corrente_pendente += calcular_corrente(circuito.potencia)
-
-            return corrente_existente + corrente_pendente
-
-        # Para cada módulo, obter canais disponíveis
-        modulos_com_info = []
-        for modulo in modulos_disponiveis:
-            # Obter canais ocupados para este módulo
-            vinculacoes_modulo = Vinculacao.query.filter_by(modulo_id=modulo.id).all()
-            canais_ocupados = [v.canal for v in vinculacoes_modulo]
-            
-            # Contar circuitos por ambiente neste módulo
-            ambientes_no_modulo = {}
-            for v in vinculacoes_modulo:
-                ambiente_id = v.circuito.ambiente_id
-                ambientes_no_modulo[ambiente_id] = ambientes_no_modulo.get(ambiente_id, 0) + 1
-            
-            canais_disponiveis = [
-                i for i in range(1, (modulo.quantidade_canais or 0) + 1) 
-                if i not in canais_ocupados
+        quadros, modulos, vinculacoes, circuitos = load_auto_binding_data(db.session, projeto_id)
+        if not quadros:
+            return jsonify({
+                "ok": False,
+                "error": "A vinculação automática requer ao menos 1 quadro elétrico."
+            }), 400
+
+        particoes, sem_quadro = partition_by_board(quadros, modulos, vinculacoes, circuitos)
+        resultados = solve_boards(particoes, ESPECIFICACOES_MODULOS)
+
+        plano = []
+        erros = [f"Circuito {c.identificador} sem quadro elétrico no ambiente ou na área" for c in sem_quadro]
+        nao_vinculados = [
+            {"circuito_id": c.id, "identificador": c.identificador, "tipo": c.tipo, "quadro_id": None}
+            for c in sem_quadro
+        ]
+        quadros_out = []
+        for (quadro, _, _, circuitos_quadro), (plano_quadro, erros_quadro, correntes) in zip(particoes, resultados):
+            vinculados = {v["circuito_id"] for v in plano_quadro}
+            pendentes = [
+                {"circuito_id": c.id, "identificador": c.identificador, "tipo": c.tipo, "quadro_id": quadro.id}
+                for c in circuitos_quadro if c.id not in vinculados
             ]
-            
-            modulos_com_info.append({
-                "modulo": modulo,
-                "canais_disponiveis": canais_disponiveis,
-                "ambientes": ambientes_no_modulo,
-                "vinculacoes_pendentes": []  # Para trackear vinculações sendo criadas
+            plano.extend(plano_quadro)
+            erros.extend(erros_quadro)
+            nao_vinculados.extend(pendentes)
+            quadros_out.append({
+                "id": quadro.id,
+                "nome": quadro.nome,
+                "vinculacoes": plano_quadro,
+                "correntes": correntes,
+                "erros": erros_quadro,
+                "nao_vinculados": pendentes,
             })
 
-        # Agrupar circuitos por ambiente
-        circuitos_por_ambiente = {}
-        for circuito in circuitos_nao_vinculados:
-            ambiente_id = circuito.ambiente_id
-            if ambiente_id not in circuitos_por_ambiente:
-                circuitos_por_ambiente[ambiente_id] = []
-            circuitos_por_ambiente[ambiente_id].append(circuito)
-
-        # Ordenar ambientes por quantidade de circuitos
-        ambientes_ordenados = sorted(circuitos_por_ambiente.keys(), 
-                                   key=lambda a: len(circuitos_por_ambiente[a]), reverse=True)
-
-        # Processar cada ambiente
-        for ambiente_id in ambientes_ordenados:
-            circuitos_ambiente = circuitos_por_ambiente[ambiente_id]
-            
-            # Ordenar circuitos: dimerizáveis primeiro
-            circuitos_ordenados = sorted(circuitos_ambiente, 
-                                       key=lambda c: (not c.dimerizavel, c.tipo))
-            
-            for circuito in circuitos_ordenados:
-                # Determinar módulos compatíveis
-                if circuito.tipo == "luz":
-                    if circuito.dimerizavel:
-                        modulos_compativeis_tipos = prioridades["luz"]["dimerizavel"]
-                    else:
-                        modulos_compativeis_tipos = prioridades["luz"]["nao_dimerizavel"]
-                else:
-                    modulos_compativeis_tipos = prioridades.get(circuito.tipo, [])
-                
-                # Filtrar módulos compatíveis
-                modulos_compatíveis = [
-                    m for m in modulos_com_info 
-                    if m["modulo"].tipo in modulos_compativeis_tipos
-                    and m["canais_disponiveis"]
-                ]
-
-                if not modulos_compatíveis:
-                    erros.append(f"Nenhum módulo compatível disponível para circuito {circuito.identificador} ({circuito.tipo}{' - dimerizável' if circuito.dimerizavel else ''})")
-                    continue
-
-                # Calcular score para cada módulo compatível
-                for modulo_info in modulos_compatíveis:
-                    # Pontuar por ambiente
-                    score_ambiente = modulo_info["ambientes"].get(ambiente_id, 0) * 10
-                    # Pontuar por canais disponíveis
-                    score_canais = len(modulo_info["canais_disponiveis"])
-                    # Pontuar por prioridade do tipo
-                    tipo_modulo = modulo_info["modulo"].tipo
-                    prioridade_tipo = modulos_compativeis_tipos.index(tipo_modulo) if tipo_modulo in modulos_compativeis_tipos else 999
-                    score_prioridade = (len(modulos_compativeis_tipos) - prioridade_tipo) * 5
-                    
-                    # Penalizar DIM8 para circuitos não-dimerizáveis
-                    if circuito.tipo == "luz" and not circuito.dimerizavel and tipo_modulo == "DIM8":
-                        score_prioridade = -100
-                    
-                    modulo_info["score_agrupamento"] = score_ambiente + score_canais + score_prioridade
-
-                # Ordenar módulos por score
-                modulos_compatíveis.sort(key=lambda m: m["score_agrupamento"], reverse=True)
-
-                vinculado = False
-                for modulo_info in modulos_compatíveis:
-                    modulo = modulo_info["modulo"]
-                    canais_disponiveis = modulo_info["canais_disponiveis"]
-
-                    # Tentar cada canal disponível
-                    for canal in canais_disponiveis[:]:
-                        try:
-                            # CORREÇÃO: Calcular corrente com tensão correta
-                            corrente_circuito = calcular_corrente(circuito.potencia)
-                            
-                            # Verificar restrições elétricas
-                            especificacao = ESPECIFICACOES_MODULOS.get(modulo.tipo)
-                            if especificacao:
-                                # Verificar corrente por canal individual
-                                if corrente_circuito > especificacao["correntePorCanal"]:
-                                    erros.append(f"Circuito {circuito.identificador} excede corrente do canal ({corrente_circuito:.2f}A > {especificacao['correntePorCanal']}A)")
-                                    continue
-
-                                # CORREÇÃO: Verificação rigorosa do grupo
-                                grupo = next((g for g in especificacao["grupos"] if canal in g["canais"]), None)
-                                if grupo:
-                                    # Calcular corrente total do grupo (existente + pendente + atual)
-                                    corrente_total_grupo = calcular_corrente_grupo(modulo.id, grupo["canais"])
-                                    corrente_total_grupo += corrente_circuito
-
-                                    if corrente_total_grupo > grupo["maxCorrente"]:
-                                        erros.append(f"Circuito {circuito.identificador} excede corrente do grupo ({corrente_total_grupo:.2f}A > {grupo['maxCorrente']}A) no módulo {modulo.nome}")
-                                        continue
-
-                            # Se passou em todas as verificações, criar vinculação
-                            vinculacao = Vinculacao(
-                                circuito_id=circuito.id,
-                                modulo_id=modulo.id,
-                                canal=canal
-                            )
-                            db.session.add(vinculacao)
-                            
-                            # CORREÇÃO: Adicionar à lista de pendentes para cálculos futuros
-                            modulo_info["vinculacoes_pendentes"].append({
-                                "canal": canal,
-                                "corrente": corrente_circuito
-                            })
-                            
-                            vinculacoes_criadas += 1
-                            vinculado = True
-                            
-                            # Atualizar informações do módulo
-                            modulo_info["canais_disponiveis"].remove(canal)
-                            modulo_info["ambientes"][ambiente_id] = modulo_info["ambientes"].get(ambiente_id, 0) + 1
-                            
-                            print(f"Vinculado: {circuito.identificador} -> {modulo.nome} (canal {canal}) - {corrente_circuito:.2f}A")
-                            break
-
-                        except Exception as e:
-                            erros.append(f"Erro ao vincular circuito {circuito.identificador} no canal {canal}: {str(e)}")
-                            continue
-
-                    if vinculado:
-                        break
-
-                if not vinculado:
-                    erros.append(f"Não foi possível vincular circuito {circuito.identificador} - restrições elétricas ou nenhum canal livre compatível")
-
-        db.session.commit()
+        if not dry_run:
+            for v in plano:
+                print(f"Vinculado: {v['identificador']} -> {v['modulo_nome']} (canal {v['canal']}) - {v['corrente']:.2f}A")
+            if plano:
+                db.session.execute(insert(Vinculacao), [
+                    {"circuito_id": v["circuito_id"], "modulo_id": v["modulo_id"], "canal": v["canal"]}
+                    for v in plano
+                ])
+            db.session.commit()
+        vinculacoes_criadas = 0 if dry_run else len(plano)
         
         # Log detalhado
-        print(f"=== RESUMO VINCULAÇÃO AUTOMÁTICA ===")
-        print(f"Vinculações criadas: {vinculacoes_criadas}")
+        print(f"=== RESUMO VINCULAÇÃO AUTOMÁTICA{' (SIMULAÇÃO)' if dry_run else ''} ===")
+        print(f"Quadros: {len(particoes)}")
+        print(f"Vinculações {'propostas' if dry_run else 'criadas'}: {len(plano)}")
         print(f"Erros: {len(erros)}")
         
-        # CORREÇÃO: Log de distribuição por módulo
-        for modulo_info in modulos_com_info:
-            modulo = modulo_info["modulo"]
-            especificacao = ESPECIFICACOES_MODULOS.get(modulo.tipo)
-            if especificacao:
-                print(f"\nMódulo {modulo.nome} ({modulo.tipo}):")
-                for grupo in especificacao["grupos"]:
-                    corrente_grupo = calcular_corrente_grupo(modulo.id, grupo["canais"])
-                    print(f"  Grupo {grupo['canais']}: {corrente_grupo:.2f}A / {grupo['maxCorrente']}A")
+        # Log de distribuição por módulo
+        for quadro_out in quadros_out:
+            for modulo in quadro_out["correntes"]:
+                print(f"\nMódulo {modulo['modulo_nome']} ({modulo['tipo']}):")
+                for grupo in modulo["grupos"]:
+                    print(f"  Grupo {grupo['canais']}: {grupo['corrente']:.2f}A / {grupo['max_corrente']}A")
         
         for erro in erros:
             print(f"Erro: {erro}")
@@ -2061,10 +2157,17 @@ def api_vinculacoes_auto():
             
         return jsonify({
             "ok": True,
+            "dry_run": dry_run,
             "vinculacoes_criadas": vinculacoes_criadas,
+            "vinculacoes": plano,
+            "quadros": quadros_out,
+            "nao_vinculados": nao_vinculados,
             "erros": erros,
             "total_erros": len(erros),
-            "message": f"Vinculação automática concluída: {vinculacoes_criadas} vinculações criadas"
+            "message": (
+                f"Simulação concluída: {len(plano)} vinculações propostas" if dry_run
+                else f"Vinculação automática concluída: {vinculacoes_criadas} vinculações criadas"
+            )
         })
         
     except Exception as e:
@@ -2119,89 +2222,31 @@ def projeto_spa():
 
 @app.get("/api/projeto_tree")
 @login_required
+@project_etag
 def api_projeto_tree():
     projeto_id = session.get("projeto_atual_id")
     if not projeto_id:
         return jsonify({"ok": True, "projeto": None, "areas": []})
 
-    # Carrega Áreas -> Ambientes -> Circuitos, Cenas, Quadros Elétricos -> Módulos
-    areas = (
-        Area.query
-        .options(
-            joinedload(Area.ambientes).joinedload(Ambiente.cenas),
-            joinedload(Area.ambientes)
-            .joinedload(Ambiente.circuitos)
-            .joinedload(Circuito.vinculacao)
-            .joinedload(Vinculacao.modulo),
-            joinedload(Area.ambientes)
-            .joinedload(Ambiente.keypads)
-            .joinedload(Keypad.buttons)
-            .joinedload(KeypadButton.circuito),
-            joinedload(Area.ambientes)
-            .joinedload(Ambiente.quadros_eletricos)
-            .joinedload(QuadroEletrico.modulos),
-        )
-        .filter(Area.projeto_id == projeto_id)
-        .all()
-    )
+    projeto_out = {"id": projeto_id, "nome": session.get("projeto_atual_nome")}
+    # ?fields=circuitos,cenas: só essas partes de cada ambiente são carregadas e devolvidas
+    fields = parse_fields(request.args, ("id",) + TREE_FIELDS)
 
-    out_areas = []
-    for a in areas:
-        ambs = []
-        for amb in a.ambientes:
-            circs = []
-            for c in amb.circuitos:
-                vinc = getattr(c, "vinculacao", None)
-                circs.append({
-                    "id": c.id,
-                    "tipo": c.tipo,
-                    "identificador": c.identificador,
-                    "nome": c.nome,
-                    "vinculacao": {
-                        "modulo_nome": getattr(vinc.modulo, "nome", None) if vinc and vinc.modulo else None,
-                        "canal": getattr(vinc, "canal", None),
-                    } if vinc else None,
-                })
-            
-            keypads_out = [
-                serialize_keypad(k)
-                for k in sorted(amb.keypads, key=lambda kp: (kp.nome or "").lower())
-            ]
-            
-            quadros_out = []
-            for q in amb.quadros_eletricos:
-                quadros_out.append({
-                    "id": q.id,
-                    "nome": q.nome,
-                    "modulos": [
-                        {
-                            "id": m.id,
-                            "nome": m.nome,
-                            "tipo": m.tipo,
-                            "quantidade_canais": m.quantidade_canais,
-                        }
-                        for m in q.modulos
-                    ]
-                })
-            
-            cenas_out = [serialize_cena(c) for c in amb.cenas]
-
-            ambs.append({
-                "id": amb.id,
-                "nome": amb.nome,
-                "circuitos": circs,
-                "keypads": keypads_out,
-                "quadros_eletricos": quadros_out,
-                "cenas": cenas_out,
-            })
-        out_areas.append({"id": a.id, "nome": a.nome, "ambientes": ambs})
+    # ?normalized=1: entidades por ID + relacionamentos, sem repetir objetos aninhados
+    if request.args.get("normalized", "").lower() in ("1", "true", "on", "sim"):
+        entities, relationships = build_project_tree_normalized(db.session, projeto_id, fields)
+        return jsonify({
+            "ok": True,
+            "projeto": projeto_out,
+            "entities": entities,
+            "relationships": relationships,
+        })
 
-    modulos = Modulo.query.filter_by(projeto_id=projeto_id).all()
-    modulos_out = [{"id": m.id, "nome": m.nome, "tipo": m.tipo} for m in modulos]
+    out_areas, modulos_out = build_project_tree(db.session, projeto_id, fields)
 
     return jsonify({
         "ok": True,
-        "projeto": {"id": projeto_id, "nome": session.get("projeto_atual_nome")},
+        "projeto": projeto_out,
         "areas": out_areas,
         "modulos": modulos_out,
     })
@@ -2213,116 +2258,32 @@ def api_projeto_tree():
 def exportar_csv():
     projeto_atual_id = session.get('projeto_atual_id')
     projeto = Projeto.query.get(projeto_atual_id)
-    
-    circuitos = Circuito.query.join(Ambiente).join(Area).filter(Area.projeto_id == projeto_atual_id).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Adicionar coluna do quadro elétrico
-    writer.writerow(['Circuito', 'Tipo', 'Nome', 'Area', 'Ambiente', 'SAKs', 'Canal', 'Modulo', 'Quadro Elétrico', 'id Modulo'])
-    
-    for circuito in circuitos:
-        vinculacao = Vinculacao.query.filter_by(circuito_id=circuito.id).first()
-        if vinculacao:
-            modulo = Modulo.query.get(vinculacao.modulo_id)
-            ambiente = Ambiente.query.get(circuito.ambiente_id)
-            area = Area.query.get(ambiente.area_id)
-            
-            # Obter nome do quadro elétrico (se existir)
-            quadro_nome = modulo.quadro_eletrico.nome if modulo and modulo.quadro_eletrico else "-"
-            
-            # Para circuitos HVAC, mostrar vazio no campo SAK
-            if circuito.tipo == 'hvac':
-                sak_value = ''
-            elif circuito.quantidade_saks > 1:
-                sak_value = f"{circuito.sak}-{circuito.sak + circuito.quantidade_saks - 1}"
-            else:
-                sak_value = str(circuito.sak)
-            
-            writer.writerow([
-                circuito.identificador,
-                circuito.tipo,
-                circuito.nome,
-                area.nome,
-                ambiente.nome,
-                sak_value,
-                vinculacao.canal,
-                modulo.nome if modulo else "-",
-                quadro_nome,  # Nova coluna
-                modulo.id if modulo else ""
-            ])
-    
-    output.seek(0)
-    
+
     # Obter nome do projeto para usar no nome do arquivo
     nome_projeto = projeto.nome if projeto else 'projeto'
     
     # Limpar o nome do projeto para usar no nome do arquivo
     nome_arquivo = re.sub(r'[^a-zA-Z0-9_]', '_', nome_projeto)
-    
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'{nome_arquivo}_roehn.csv'
-    )
-
-class NumberedCanvas(canvas.Canvas):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._saved_page_states = []
-
-    def showPage(self):
-        self._saved_page_states.append(dict(self.__dict__))
-        self._startPage()
-
-    def save(self):
-        total_pages = len(self._saved_page_states)
-        for state in self._saved_page_states:
-            self.__dict__.update(state)
-            self.draw_page_number(total_pages)
-            super().showPage()
-        super().save()
-
-    def draw_page_number(self, page_count):
-        self.setFont("Helvetica", 8)
-        # Centralizado no rodapé: "Página X de Y"
-        self.drawCentredString(A4[0] / 2, 12 * mm, f"Página {self._pageNumber} de {page_count}")
-
 
-def footer(canvas, doc):
-    canvas.saveState()
-    width, height = A4
-    margin = 30
-
-    y_line = 18 * mm
-    canvas.setLineWidth(0.5)
-    canvas.line(margin, y_line, width - margin, y_line)
-
-    timestamp_str = getattr(doc, 'client_timestamp', None)
-    tz_offset_str = getattr(doc, 'tz_offset', None)
-
-    if timestamp_str and tz_offset_str is not None:
-        try:
-            utc_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            offset_minutes = int(tz_offset_str)
-            local_time = utc_time - timedelta(minutes=offset_minutes)
-            formatted_time = local_time.strftime('%d/%m/%Y %H:%M')
-        except (ValueError, TypeError):
-            formatted_time = datetime.now().strftime('%d/%m/%Y %H:%M')
-    else:
-        formatted_time = datetime.now().strftime('%d/%m/%Y %H:%M')
-
-    canvas.setFont("Helvetica", 8)
-    canvas.drawRightString(width - margin, 12 * mm, f"Zafiro - Luxury Technology • {current_user.username} • {formatted_time}")
-
-    canvas.restoreState()
-
-
-@app.route('/exportar-projeto/<int:projeto_id>')
-@login_required
-def exportar_projeto(projeto_id):
+    cache_token = project_changes.token(db.session, projeto_atual_id) if projeto else None
+    if projeto:
+        cached = send_cached_artifact(projeto.id, cache_token, 'csv', {}, 'text/csv', f'{nome_arquivo}_roehn.csv')
+        if cached:
+            return cached
+    
+    # Uma consulta, lida e enviada em blocos; o cache grava o arquivo ao final do download
+    chunks = stream_with_context(iter_circuitos_csv(db.session, projeto_atual_id))
+    if projeto:
+        chunks = artifact_cache.tee(projeto.id, cache_token, 'csv', {}, chunks)
+
+    response = Response(chunks, mimetype='text/csv')
+    set_attachment_filename(response, f'{nome_arquivo}_roehn.csv')
+    response.headers['X-Artifact-Cache'] = 'miss'
+    return response
+
+def build_project_export(projeto_id, progress=NULL_PROGRESS):
+    """JSON de exportação do projeto (/exportar-projeto), em bytes."""
+    progress.update(stage='Carregando o projeto', percent=5)
     projeto = Projeto.query.options(
         joinedload(Projeto.areas)
         .joinedload(Area.ambientes)
@@ -2344,8 +2305,7 @@ def exportar_projeto(projeto_id):
         joinedload(Projeto.modulos)
     ).get_or_404(projeto_id)
 
-    if projeto.user_id != current_user.id and current_user.role != 'admin':
-        return jsonify({"ok": False, "error": "Acesso negado."}), 403
+    progress.update(stage='Montando a exportação', percent=30)
 
     # Estrutura de dados para exportação
     export_data = {
@@ -2497,17 +2457,44 @@ def exportar_projeto(projeto_id):
                             'level': custom_acao.level,
                         })
 
-    # Preparar arquivo para download
-    output = io.BytesIO()
-    output.write(json.dumps(export_data, indent=2).encode('utf-8'))
-    output.seek(0)
-    
-    # Nome do arquivo
-    safe_nome = re.sub(r'[^a-zA-Z0-9_.-]', '_', projeto.nome)
+    progress.update(stage='Gravando o JSON', percent=80)
+    return json.dumps(export_data, indent=2).encode('utf-8')
+
+
+@app.route('/exportar-projeto/<int:projeto_id>')
+@login_required
+def exportar_projeto(projeto_id):
+    # Verificação de acesso e cache antes de carregar o projeto inteiro
+    projeto_row = db.session.execute(
+        select(Projeto.nome, Projeto.user_id).where(Projeto.id == projeto_id)
+    ).first()
+    if projeto_row is None:
+        abort(404)
+    if projeto_row.user_id != current_user.id and current_user.role != 'admin':
+        return jsonify({"ok": False, "error": "Acesso negado."}), 403
+
+    safe_nome = re.sub(r'[^a-zA-Z0-9_.-]', '_', projeto_row.nome)
     nome_arquivo = f"export_{safe_nome}_{datetime.now().strftime('%Y%m%d')}.json"
-    
+    cache_token = project_changes.token(db.session, projeto_id)
+    # O JSON traz a hora da exportação (exported_at, UTC): o cache vale só no mesmo dia
+    cache_params = {'data_exportacao': datetime.utcnow().strftime('%Y-%m-%d')}
+    cached = send_cached_artifact(projeto_id, cache_token, 'json', cache_params, 'application/json', nome_arquivo)
+    if cached:
+        return cached
+
+    def gerar_json(progress):
+        data = build_project_export(projeto_id, progress)
+        artifact_cache.put(projeto_id, cache_token, 'json', cache_params, data)
+        return data
+
+    if wants_async():
+        return submit_job(
+            'exportar-projeto', lambda progress: Artifact(gerar_json(progress), nome_arquivo, 'application/json'),
+            projeto_id, download=True,
+        )
+
     return send_file(
-        output,
+        io.BytesIO(gerar_json(NULL_PROGRESS)),
         mimetype='application/json',
         as_attachment=True,
         download_name=nome_arquivo
@@ -2536,25 +2523,27 @@ def importar_planner():
     if not all(key in data for key in required_keys):
         return jsonify({"ok": False, "error": "Estrutura do JSON do planner inválida."}), 400
 
-    id_map = {
-        'areas': {},
-        'ambientes': {},
-    }
+    user_id = current_user.id
+
+    def importar(progress):
+        id_map = {
+            'areas': {},
+            'ambientes': {},
+        }
 
-    try:
         with db.session.begin_nested():
             # 1. Criar Projeto
             original_nome = data['ProjectName']
             novo_nome = original_nome
             count = 1
-            while Projeto.query.filter_by(nome=novo_nome, user_id=current_user.id).first():
+            while Projeto.query.filter_by(nome=novo_nome, user_id=user_id).first():
                 novo_nome = f"{original_nome} (importado {count})"
                 count += 1
 
             now = datetime.utcnow()
             novo_projeto = Projeto(
                 nome=novo_nome,
-                user_id=current_user.id,
+                user_id=user_id,
                 status='ATIVO',
                 data_ativo=now
             )
@@ -2562,6 +2551,7 @@ def importar_planner():
             db.session.flush()
 
             # 2. Criar Áreas
+            progress.update(stage='Áreas', percent=10)
             for area_data in data.get('ProjectDataAreas', []):
                 nova_area = Area(nome=area_data['Name'], projeto_id=novo_projeto.id)
                 db.session.add(nova_area)
@@ -2569,6 +2559,7 @@ def importar_planner():
                 id_map['areas'][area_data['Id']] = nova_area
 
             # 3. Criar Ambientes
+            progress.update(stage='Ambientes', percent=30, areas=len(id_map['areas']))
             for room_data in data.get('ProjectDataRooms', []):
                 area = id_map['areas'].get(room_data['IdArea'])
                 if not area:
@@ -2579,7 +2570,9 @@ def importar_planner():
                 id_map['ambientes'][room_data['Id']] = novo_ambiente
 
             # 4. Criar Keypads
+            progress.update(stage='Keypads', percent=50, ambientes=len(id_map['ambientes']))
             hsnet_counter = 110
+            keypads_criados = 0
             for device_data in data.get('ProjectDataDevices', []):
                 if device_data.get('Type') != 'Keypad':
                     continue
@@ -2633,8 +2626,29 @@ def importar_planner():
                         # button.icon = map_icon(button_data.get('IconID'))
 
                 hsnet_counter += 1
+                keypads_criados += 1
+                progress.update(keypads=keypads_criados)
 
         db.session.commit()
+        return novo_projeto
+
+    if wants_async():
+        def tarefa(progress):
+            try:
+                novo_projeto = importar(progress)
+            except IntegrityError:
+                raise ValueError("Erro de integridade nos dados. Verifique se há nomes duplicados.")
+            return {
+                "projeto_id": novo_projeto.id,
+                "projeto_nome": novo_projeto.nome,
+                "message": f"Projeto '{novo_projeto.nome}' importado com sucesso do planner!",
+            }
+
+        return submit_job('importar-planner', tarefa)
+
+    try:
+        novo_projeto = importar(NULL_PROGRESS)
+        novo_nome = novo_projeto.nome
 
         # Define o projeto recém-criado como o projeto atual na sessão
         session["projeto_atual_id"] = novo_projeto.id
@@ -2674,283 +2688,33 @@ def importar_projeto():
     if 'projeto' not in data or 'areas' not in data:
         return jsonify({"ok": False, "error": "Estrutura do JSON inválida. Faltam chaves essenciais."}), 400
 
-    # ID Mappings
-    id_map = {
-        'areas': {}, 'ambientes': {}, 'quadros_eletricos': {},
-        'circuitos': {}, 'modulos': {}, 'keypads': {}, 'cenas': {}, 'acoes': {}
-    }
+    user_id = current_user.id
 
-    try:
+    def importar(progress):
         # Iniciar transação
         with db.session.begin_nested():
-            # 1. Criar Projeto
-            original_nome = data['projeto']['nome']
-            novo_nome = original_nome
-            count = 1
-            while Projeto.query.filter_by(nome=novo_nome, user_id=current_user.id).first():
-                novo_nome = f"{original_nome} (cópia {count})"
-                count += 1
-
-            def parse_iso_date(date_string):
-                if not date_string:
-                    return None
-                try:
-                    # Handle both Z and +00:00 timezones
-                    if date_string.endswith('Z'):
-                        return datetime.fromisoformat(date_string[:-1] + '+00:00')
-                    return datetime.fromisoformat(date_string)
-                except (ValueError, TypeError):
-                    return None
-
-            def remap_numeric_guid(value, mapping):
-                if value is None:
-                    return None
-                value_str = str(value).strip()
-                try:
-                    original_id = int(value_str)
-                except (ValueError, TypeError):
-                    return value_str
-                mapped_id = mapping.get(original_id)
-                return str(mapped_id) if mapped_id is not None else value_str
-
-            projeto_data = data['projeto']
-            novo_projeto = Projeto(
-                nome=novo_nome,
-                status=projeto_data.get('status', 'ATIVO'),
-                user_id=current_user.id,
-                data_criacao=parse_iso_date(projeto_data.get('data_criacao')) or datetime.utcnow(),
-                data_ativo=parse_iso_date(projeto_data.get('data_ativo')),
-                data_inativo=parse_iso_date(projeto_data.get('data_inativo')),
-                data_concluido=parse_iso_date(projeto_data.get('data_concluido')),
-            )
-            db.session.add(novo_projeto)
-            db.session.flush()
-
-            # 2. Criar Áreas
-            for area_data in data.get('areas', []):
-                nova_area = Area(nome=area_data['nome'], projeto_id=novo_projeto.id)
-                db.session.add(nova_area)
-                db.session.flush()
-                id_map['areas'][area_data['id']] = nova_area.id
+            novo_projeto = import_project(db.session, data, user_id, progress)
 
-            # 3. Criar Ambientes
-            for ambiente_data in data.get('ambientes', []):
-                nova_area_id = id_map['areas'].get(ambiente_data['area_id'])
-                if not nova_area_id: continue
-                novo_ambiente = Ambiente(nome=ambiente_data['nome'], area_id=nova_area_id)
-                db.session.add(novo_ambiente)
-                db.session.flush()
-                id_map['ambientes'][ambiente_data['id']] = novo_ambiente.id
-
-            # 4. Criar Quadros Elétricos
-            for quadro_data in data.get('quadros_eletricos', []):
-                novo_ambiente_id = id_map['ambientes'].get(quadro_data['ambiente_id'])
-                if not novo_ambiente_id: continue
-                novo_quadro = QuadroEletrico(
-                    nome=quadro_data['nome'],
-                    notes=quadro_data.get('notes'),
-                    ambiente_id=novo_ambiente_id,
-                    projeto_id=novo_projeto.id
-                )
-                db.session.add(novo_quadro)
-                db.session.flush()
-                id_map['quadros_eletricos'][quadro_data['id']] = novo_quadro.id
-
-            # 5. Criar Módulos
-            for modulo_data in data.get('modulos', []):
-                novo_quadro_id = id_map['quadros_eletricos'].get(modulo_data.get('quadro_eletrico_id'))
-                novo_modulo = Modulo(
-                    nome=modulo_data['nome'],
-                    tipo=modulo_data['tipo'],
-                    quantidade_canais=modulo_data['quantidade_canais'],
-                    hsnet=modulo_data.get('hsnet'),
-                    dev_id=modulo_data.get('dev_id'),
-                    is_controller=modulo_data.get('is_controller', False),
-                    is_logic_server=modulo_data.get('is_logic_server', False),
-                    ip_address=modulo_data.get('ip_address'),
-                    quadro_eletrico_id=novo_quadro_id,
-                    projeto_id=novo_projeto.id
-                )
-                db.session.add(novo_modulo)
-                db.session.flush()
-                id_map['modulos'][modulo_data['id']] = novo_modulo.id
-
-            # 6. Criar Circuitos
-            for circuito_data in data.get('circuitos', []):
-                novo_ambiente_id = id_map['ambientes'].get(circuito_data['ambiente_id'])
-                if not novo_ambiente_id: continue
-                novo_circuito = Circuito(
-                    identificador=circuito_data['identificador'],
-                    nome=circuito_data['nome'],
-                    tipo=circuito_data['tipo'],
-                    dimerizavel=circuito_data.get('dimerizavel', False),
-                    potencia=circuito_data.get('potencia', 0.0),
-                    sak=circuito_data.get('sak'),
-                    quantidade_saks=circuito_data.get('quantidade_saks', 1),
-                    ambiente_id=novo_ambiente_id
-                )
-                db.session.add(novo_circuito)
-                db.session.flush()
-                id_map['circuitos'][circuito_data['id']] = novo_circuito.id
-            
-            # 7. Criar Vinculações
-            for vinc_data in data.get('vinculacoes', []):
-                novo_circuito_id = id_map['circuitos'].get(vinc_data['circuito_id'])
-                novo_modulo_id = id_map['modulos'].get(vinc_data['modulo_id'])
-                if not novo_circuito_id or not novo_modulo_id: continue
-                nova_vinc = Vinculacao(
-                    circuito_id=novo_circuito_id,
-                    modulo_id=novo_modulo_id,
-                    canal=vinc_data['canal']
-                )
-                db.session.add(nova_vinc)
-
-            # 8. Criar Keypads e Botões
-            for keypad_data in data.get('keypads', []):
-                novo_ambiente_id = id_map['ambientes'].get(keypad_data['ambiente_id'])
-                if not novo_ambiente_id: continue
-                created_at = parse_iso_date(keypad_data.get('created_at'))
-                updated_at = parse_iso_date(keypad_data.get('updated_at'))
-                novo_keypad = Keypad(
-                    nome=keypad_data['nome'],
-                    modelo=keypad_data.get('modelo', 'RQR-K'),
-                    color=keypad_data.get('color', 'WHITE'),
-                    button_color=keypad_data.get('button_color', 'WHITE'),
-                    button_count=keypad_data.get('button_count', 4),
-                    hsnet=keypad_data['hsnet'],
-                    dev_id=keypad_data.get('dev_id'),
-                    notes=keypad_data.get('notes'),
-                    ambiente_id=novo_ambiente_id,
-                    projeto_id=novo_projeto.id
-                )
-                if created_at:
-                    novo_keypad.created_at = created_at
-                if updated_at:
-                    novo_keypad.updated_at = updated_at
-                db.session.add(novo_keypad)
-                db.session.flush()
-                id_map['keypads'][keypad_data['id']] = novo_keypad.id
-
-            for btn_data in data.get('keypad_buttons', []):
-                novo_keypad_id = id_map['keypads'].get(btn_data['keypad_id'])
-                novo_circuito_id = id_map['circuitos'].get(btn_data['circuito_id'])
-                # Cenas ainda não foram mapeadas, faremos isso depois
-                if not novo_keypad_id: continue
-                created_at = parse_iso_date(btn_data.get('created_at'))
-                updated_at = parse_iso_date(btn_data.get('updated_at'))
-                is_rocker_value = btn_data.get('is_rocker', False)
-                if isinstance(is_rocker_value, str):
-                    is_rocker = is_rocker_value.lower() in ("true", "1", "yes", "y")
-                else:
-                    is_rocker = bool(is_rocker_value)
-                original_target_object = btn_data.get('target_object_guid')
-                mapped_target_object = remap_numeric_guid(original_target_object, id_map['circuitos'])
-                if mapped_target_object is None:
-                    mapped_target_object = original_target_object or "00000000-0000-0000-0000-000000000000"
-                novo_btn = KeypadButton(
-                    keypad_id=novo_keypad_id,
-                    ordem=btn_data['ordem'],
-                    guid=btn_data.get('guid', str(uuid.uuid4())),
-                    engraver_text=btn_data.get('engraver_text'),
-                    icon=btn_data.get('icon'),
-                    rocker_style=btn_data.get('rocker_style'),
-                    is_rocker=is_rocker,
-                    circuito_id=novo_circuito_id,
-                    # cena_id será atualizado depois
-                    modo=btn_data.get('modo', 3),
-                    command_on=btn_data.get('command_on', 0),
-                    command_off=btn_data.get('command_off', 0),
-                    can_hold=btn_data.get('can_hold', False),
-                    modo_double_press=btn_data.get('modo_double_press', 3),
-                    command_double_press=btn_data.get('command_double_press', 0),
-                    target_object_guid=mapped_target_object,
-                    notes=btn_data.get('notes')
-                )
-                if created_at:
-                    novo_btn.created_at = created_at
-                if updated_at:
-                    novo_btn.updated_at = updated_at
-                db.session.add(novo_btn)
-            
-            # 9. Criar Cenas, Ações e CustomAcoes
-            for cena_data in data.get('cenas', []):
-                novo_ambiente_id = id_map['ambientes'].get(cena_data['ambiente_id'])
-                if not novo_ambiente_id: continue
-                nova_cena = Cena(
-                    guid=cena_data.get('guid', str(uuid.uuid4())),
-                    nome=cena_data['nome'],
-                    scene_movers=cena_data.get('scene_movers', False),
-                    ambiente_id=novo_ambiente_id
-                )
-                db.session.add(nova_cena)
-                db.session.flush()
-                id_map['cenas'][cena_data['id']] = nova_cena.id
-
-            for acao_data in data.get('acoes', []):
-                nova_cena_id = id_map['cenas'].get(acao_data['cena_id'])
-                if not nova_cena_id: continue
-                action_type = acao_data.get('action_type', 0)
-                old_target = acao_data.get('target_guid')
-                if action_type == 0:
-                    new_target = remap_numeric_guid(old_target, id_map['circuitos'])
-                elif action_type == 7:
-                    new_target = remap_numeric_guid(old_target, id_map['ambientes'])
-                else:
-                    new_target = old_target
-                nova_acao = Acao(
-                    cena_id=nova_cena_id,
-                    level=acao_data.get('level', 100),
-                    action_type=acao_data.get('action_type', 0),
-                    target_guid=new_target
-                )
-                db.session.add(nova_acao)
-                db.session.flush()
-                id_map['acoes'][acao_data['id']] = nova_acao.id
-
-            for custom_acao_data in data.get('custom_acoes', []):
-                nova_acao_id = id_map['acoes'].get(custom_acao_data['acao_id'])
-                if not nova_acao_id: continue
-                custom_target = remap_numeric_guid(custom_acao_data.get('target_guid'), id_map['circuitos'])
-                nova_custom_acao = CustomAcao(
-                    acao_id=nova_acao_id,
-                    target_guid=custom_target,
-                    enable=custom_acao_data.get('enable', True),
-                    level=custom_acao_data.get('level', 50)
-                )
-                db.session.add(nova_custom_acao)
+        db.session.commit()
+        return novo_projeto
 
-            # 10. Pós-processamento para atualizar referências
-            db.session.flush()
+    if wants_async():
+        def tarefa(progress):
+            try:
+                novo_projeto = importar(progress)
+            except IntegrityError:
+                raise ValueError("Erro de integridade nos dados. Verifique se há nomes duplicados.")
+            return {
+                "projeto_id": novo_projeto.id,
+                "projeto_nome": novo_projeto.nome,
+                "message": f"Projeto '{novo_projeto.nome}' importado com sucesso!",
+            }
 
-            # Atualizar parent_controller_id nos módulos
-            for modulo_data in data.get('modulos', []):
-                if modulo_data.get('parent_controller_id'):
-                    novo_modulo_id = id_map['modulos'].get(modulo_data['id'])
-                    novo_parent_id = id_map['modulos'].get(modulo_data['parent_controller_id'])
-                    if novo_modulo_id and novo_parent_id:
-                        module_to_update = db.session.get(Modulo, novo_modulo_id)
-                        if module_to_update:
-                            module_to_update.parent_controller_id = novo_parent_id
-            # Atualizar KeypadButton.cena_id
-            for btn_data in data.get('keypad_buttons', []):
-                if btn_data.get('cena_id'):
-                    novo_keypad_id = id_map['keypads'].get(btn_data['keypad_id'])
-                    nova_cena_id = id_map['cenas'].get(btn_data['cena_id'])
-                    if novo_keypad_id and nova_cena_id:
-                        # Encontrar o botão correspondente no banco de dados e atualizá-lo
-                        btn_to_update = KeypadButton.query.filter_by(
-                            keypad_id=novo_keypad_id,
-                            ordem=btn_data['ordem']
-                        ).first()
-                        if btn_to_update:
-                            btn_to_update.cena_id = nova_cena_id
-
-            # Atualizar GUIDs em Acao e CustomAcao
-            # Esta parte é complexa se os GUIDs devem ser remapeados.
-            # Por simplicidade, assumimos que os GUIDs de circuito/ambiente são os IDs antigos.
-            # Uma implementação mais robusta remapearia os GUIDs.
+        return submit_job('importar-projeto', tarefa)
 
-        db.session.commit()
+    try:
+        novo_projeto = importar(NULL_PROGRESS)
+        novo_nome = novo_projeto.nome
         return jsonify({"ok": True, "message": f"Projeto '{novo_nome}' importado com sucesso!", "projeto_id": novo_projeto.id})
 
     except IntegrityError as e:
@@ -2981,33 +2745,18 @@ def change_password():
 @app.route('/exportar-pdf/<int:projeto_id>')
 @login_required
 def exportar_pdf(projeto_id):
-    projeto = Projeto.query.options(
-        joinedload(Projeto.areas).
-        joinedload(Area.ambientes).
-        joinedload(Ambiente.circuitos).
-        joinedload(Circuito.vinculacao).
-        joinedload(Vinculacao.modulo)
-    ).get_or_404(projeto_id)
-
-    if projeto.user_id != current_user.id and current_user.role != 'admin':
+    # Verificação de acesso e cache antes de carregar o projeto inteiro
+    projeto_row = db.session.execute(
+        select(Projeto.nome, Projeto.user_id).where(Projeto.id == projeto_id)
+    ).first()
+    if projeto_row is None:
+        abort(404)
+    if projeto_row.user_id != current_user.id and current_user.role != 'admin':
         flash('Acesso negado a este projeto', 'danger')
         return redirect(url_for('index'))
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=30,
-        leftMargin=30,
-        topMargin=30,
-        bottomMargin=30,
-        title=f"Projeto {projeto.nome}"
-    )
-
     client_timestamp_str = request.args.get('client_timestamp')
     tz_offset_str = request.args.get('tz_offset')
-    doc.client_timestamp = client_timestamp_str
-    doc.tz_offset = tz_offset_str
 
     if client_timestamp_str and tz_offset_str is not None:
         try:
@@ -3020,261 +2769,48 @@ def exportar_pdf(projeto_id):
     else:
         formatted_time = datetime.now().strftime('%d/%m/%Y %H:%M')
 
-    styles = getSampleStyleSheet()
-    # Base Styles
-    if 'RoehnTitle' not in styles:
-        styles.add(ParagraphStyle(name='RoehnTitle', parent=styles['Heading1'], fontSize=16, spaceAfter=30, alignment=TA_CENTER))
-    if 'RoehnSubtitle' not in styles:
-        styles.add(ParagraphStyle(name='RoehnSubtitle', parent=styles['Heading2'], fontSize=12, spaceAfter=12, spaceBefore=12))
-    if 'RoehnCenter' not in styles:
-        styles.add(ParagraphStyle(name='RoehnCenter', parent=styles['Normal'], alignment=TA_CENTER))
-    if 'LeftNormal' not in styles:
-        styles.add(ParagraphStyle(name='LeftNormal', parent=styles['Normal'], alignment=TA_LEFT))
-
-    # Styles for tables with word wrapping
-    if 'TableHeader' not in styles:
-        styles.add(ParagraphStyle(name='TableHeader', parent=styles['Normal'], alignment=TA_CENTER, fontSize=9, textColor=colors.whitesmoke, fontName='Helvetica-Bold'))
-    if 'TableBody' not in styles:
-        styles.add(ParagraphStyle(name='TableBody', parent=styles['Normal'], alignment=TA_LEFT, fontSize=8))
-    if 'TableBodyCenter' not in styles:
-        styles.add(ParagraphStyle(name='TableBodyCenter', parent=styles['TableBody'], alignment=TA_CENTER))
-
-    elements = []
-    zafirologopath = "static/images/zafirologo.png"
-    zafirologo = Image(zafirologopath, width=2*inch, height=2*inch)
-    elements.append(zafirologo)
-    elements.append(Paragraph("RELATÓRIO DE PROJETO", styles['RoehnCenter']))
-    elements.append(Spacer(1, 0.2*inch))
-    elements.append(Paragraph(f"<b>Projeto:</b> {projeto.nome}", styles['LeftNormal']))
-    elements.append(Spacer(1, 0.1*inch))
-    elements.append(Paragraph(f"<b>Data de emissão:</b> {formatted_time}", styles['LeftNormal']))
-    elements.append(Spacer(1, 0.1*inch))
-    elements.append(Paragraph(f"<b>Emitido por:</b> {current_user.username}", styles['LeftNormal']))
-    elements.append(Spacer(1, 0.3*inch))
-
-    # Resumo por Área
-    for area in projeto.areas:
-        elements.append(Paragraph(f"ÁREA: {area.nome}", styles['Heading2']))
-        elements.append(Spacer(1, 0.1*inch))
-        
-        for ambiente in area.ambientes:
-            elements.append(Paragraph(f"Ambiente: {ambiente.nome}", styles['Heading3']))
-            
-            # Prepare data for styling and for the table
-            header_row = [Paragraph(h, styles['TableHeader']) for h in ["Circuito", "Nome", "Tipo", "SAKs", "Módulo", "Canal", "Verificado"]]
-            table_data_styled = [header_row]
-            color_commands = []
-            raw_data_for_coloring = [] # Keep track of raw types for coloring logic
-
-            for circuito in ambiente.circuitos:
-                modulo_nome = "Não vinculado"
-                canal = "-"
-                if circuito.vinculacao:
-                    modulo_nome = circuito.vinculacao.modulo.nome
-                    canal = str(circuito.vinculacao.canal)
-                
-                sak_value = ""
-                if circuito.tipo == 'hvac':
-                    pass
-                elif circuito.tipo == 'persiana':
-                    # First row for persiana (up)
-                    row_styled_up = [
-                        Paragraph(circuito.identificador, styles['TableBodyCenter']),
-                        Paragraph(f"{circuito.nome} (sobe)", styles['TableBodyCenter']),  # <-- antes: TableBody
-                        Paragraph(circuito.tipo.upper(), styles['TableBodyCenter']),
-                        Paragraph(str(circuito.sak), styles['TableBodyCenter']),
-                        Paragraph(modulo_nome, styles['TableBodyCenter']),                # <-- antes: TableBody
-                        Paragraph(f"{canal}s", styles['TableBodyCenter']),
-                        Paragraph("", styles['TableBodyCenter'])
-                    ]
-                    table_data_styled.append(row_styled_up)
-                    raw_data_for_coloring.append({'tipo': circuito.tipo, 'nome': f"{circuito.nome} (sobe)"})
-
-                    # Second row for persiana (down)
-                    row_styled_down = [
-                        Paragraph(circuito.identificador, styles['TableBodyCenter']),
-                        Paragraph(f"{circuito.nome} (desce)", styles['TableBodyCenter']), # <-- antes: TableBody
-                        Paragraph(circuito.tipo.upper(), styles['TableBodyCenter']),
-                        Paragraph(str(circuito.sak + 1), styles['TableBodyCenter']),
-                        Paragraph(modulo_nome, styles['TableBodyCenter']),                # <-- antes: TableBody
-                        Paragraph(f"{canal}d", styles['TableBodyCenter']),
-                        Paragraph("", styles['TableBodyCenter'])
-                    ]
-                    table_data_styled.append(row_styled_down)
-                    raw_data_for_coloring.append({'tipo': circuito.tipo, 'nome': f"{circuito.nome} (desce)"})
-                    continue
-                else:
-                    sak_value = str(circuito.sak)
-
-                # Row for other circuit types
-                row_styled = [
-                    Paragraph(circuito.identificador, styles['TableBodyCenter']),
-                    Paragraph(circuito.nome, styles['TableBodyCenter']),
-                    Paragraph(circuito.tipo.upper(), styles['TableBodyCenter']),
-                    Paragraph(sak_value, styles['TableBodyCenter']),
-                    Paragraph(modulo_nome, styles['TableBodyCenter']),
-                    Paragraph(canal, styles['TableBodyCenter']),
-                    Paragraph("", styles['TableBodyCenter'])
-                ]
-                table_data_styled.append(row_styled)
-                raw_data_for_coloring.append({'tipo': circuito.tipo, 'nome': circuito.nome})
-            
-            if len(table_data_styled) > 1:
-                # Apply coloring based on raw data
-                for i, row in enumerate(raw_data_for_coloring, 1):
-                    if row['tipo'] == "luz":
-                        color_commands.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor("#fff3cd")))
-                    elif row['tipo'] == "persiana":
-                        if "(sobe)" in row['nome'] or "(desce)" in row['nome']:
-                            color_commands.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor("#d1ecf1")))
-                    elif row['tipo'] == "hvac":
-                        color_commands.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor("#d4edda")))
-
-                circuito_table = Table(table_data_styled, colWidths=[0.7*inch, 1.5*inch, 0.8*inch, 0.6*inch, 1.2*inch, 0.6*inch, 0.8*inch], repeatRows=1)
-
-                base_style = [
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'), # Vertical alignment
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 9),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#4d4f52")),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#f1f3f5")])
-                ]
-
-                estilo_tabela = TableStyle(base_style + color_commands)
-                circuito_table.setStyle(estilo_tabela)
-                elements.append(circuito_table)
-            else:
-                elements.append(Paragraph("Nenhum circuito neste ambiente.", styles['Italic']))
-            
-            elements.append(Spacer(1, 0.2*inch))
-        
-        if area != projeto.areas[-1]:
-            elements.append(PageBreak())
-
-    # Resumo de Módulos
-    elements.append(PageBreak())
-    elements.append(Paragraph("RESUMO DE MÓDULOS", styles['Heading2']))
-    elements.append(Spacer(1, 0.2*inch))
-    
-    todos_circuitos = {c.id: c for area in projeto.areas for ambiente in area.ambientes for c in ambiente.circuitos}
-    modulos_projeto = Modulo.query.filter(Modulo.projeto_id == projeto_id).options(joinedload(Modulo.vinculacoes)).all()
-    
-    if modulos_projeto:
-        for modulo in modulos_projeto:
-            elements.append(Paragraph(f"Módulo: {modulo.nome} ({modulo.tipo})", styles['Heading3']))
-            
-            header_row_mod = [Paragraph(h, styles['TableHeader']) for h in ["Canal", "Circuito", "Nome", "A. Registrada", "A. Medida"]]
-            canal_data_styled = [header_row_mod]
-            color_commands_mod = []
-            raw_data_for_coloring_mod = []
-
-            canais_ocupados = {v.canal: v for v in modulo.vinculacoes}
-            
-            for i, canal_num in enumerate(range(1, modulo.quantidade_canais + 1), 1):
-                if canal_num in canais_ocupados:
-                    vinculacao = canais_ocupados[canal_num]
-                    circuito = todos_circuitos.get(vinculacao.circuito_id)
-                    if circuito:
-                        amperagem = f"{(circuito.potencia or 0) / 120:.2f}A" if circuito.potencia else "0.00A"
-                        row_styled = [
-                            Paragraph(str(canal_num), styles['TableBodyCenter']),
-                            Paragraph(circuito.identificador, styles['TableBodyCenter']),
-                            Paragraph(circuito.nome, styles['TableBodyCenter']),
-                            Paragraph(amperagem, styles['TableBodyCenter']),
-                            Paragraph("", styles['TableBodyCenter'])
-                        ]
-                        canal_data_styled.append(row_styled)
-                        raw_data_for_coloring_mod.append({'tipo': circuito.tipo})
-                    else:
-                        canal_data_styled.append([Paragraph(str(canal_num), styles['TableBodyCenter']), Paragraph("ID Desconhecido", styles['TableBodyCenter']), Paragraph("Circuito não encontrado", styles['TableBody']), Paragraph("-", styles['TableBodyCenter']), Paragraph("", styles['TableBodyCenter'])])
-                        raw_data_for_coloring_mod.append({'tipo': 'unknown'})
-                else:
-                    canal_data_styled.append([Paragraph(str(canal_num), styles['TableBodyCenter']), Paragraph("Livre", styles['TableBodyCenter']), Paragraph("-", styles['TableBody']), Paragraph("-", styles['TableBodyCenter']), Paragraph("", styles['TableBodyCenter'])])
-                    raw_data_for_coloring_mod.append({'tipo': 'free'})
-            
-            # Apply coloring
-            for i, row in enumerate(raw_data_for_coloring_mod, 1):
-                tipo = row.get('tipo')
-                if tipo == "luz":
-                    color_commands_mod.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor("#fff3cd")))
-                elif tipo == "persiana":
-                    color_commands_mod.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor("#d1ecf1")))
-                elif tipo == "hvac":
-                    color_commands_mod.append(('BACKGROUND', (0, i), (-1, i), colors.HexColor("#d4edda")))
-
-            canal_table = Table(canal_data_styled, colWidths=[0.6*inch, 1.0*inch, 2.0*inch, 1.2*inch, 1.2*inch], repeatRows=1)
-
-            base_style = [
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#4d4f52")),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#f1f3f5")])
-            ]
-
-            estilo_canal = TableStyle(base_style + color_commands_mod)
-            canal_table.setStyle(estilo_canal)
-            elements.append(canal_table)
-            elements.append(Spacer(1, 0.3*inch))
-    else:
-        elements.append(Paragraph("Nenhum módulo configurado neste projeto.", styles['Italic']))
+    # O PDF em cache vale para o mesmo usuário no mesmo dia de emissão
+    nome_arquivo = f"projeto_{projeto_row.nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    cache_token = project_changes.token(db.session, projeto_id)
+    cache_params = {'usuario': current_user.username, 'data_emissao': formatted_time.split(' ')[0]}
+    cached = send_cached_artifact(projeto_id, cache_token, 'pdf', cache_params, 'application/pdf', nome_arquivo)
+    if cached:
+        return cached
+
+    emitido_por = current_user.username
+
+    def gerar_pdf(progress):
+        progress.update(stage='Carregando o projeto', percent=5)
+        projeto = Projeto.query.options(
+            joinedload(Projeto.areas).
+            joinedload(Area.ambientes).
+            joinedload(Ambiente.circuitos).
+            joinedload(Circuito.vinculacao).
+            joinedload(Vinculacao.modulo)
+        ).get_or_404(projeto_id)
+
+        modulos_projeto = Modulo.query.filter(Modulo.projeto_id == projeto_id).options(joinedload(Modulo.vinculacoes)).all()
+
+        progress.update(stage='Gerando o PDF', percent=20)
+        buffer = io.BytesIO()
+        build_project_report(
+            buffer, projeto, modulos_projeto, emitido_por, formatted_time,
+            client_timestamp=client_timestamp_str, tz_offset=tz_offset_str,
+            on_page=lambda pagina: progress.update(paginas=pagina),
+        )
 
-    # Seção de Assinaturas
-    elements.append(PageBreak())
-    elements.append(Paragraph("REGISTRO DE VISITAS TÉCNICAS", styles['Heading2']))
-    elements.append(Spacer(1, 0.2*inch))
+        data = buffer.getvalue()
+        artifact_cache.put(projeto_id, cache_token, 'pdf', cache_params, data)
+        return data
 
-    assinatura_data = [["Data", "Técnico Responsável", "Assinatura"]]
-    for i in range(10):
-        assinatura_data.append(["____/____/______", "", ""])
-    
-    assinatura_table = Table(assinatura_data, colWidths=[1.5*inch, 3*inch, 2.5*inch], rowHeights=0.5*inch)
-    assinatura_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(assinatura_table)
-
-    # Página de Observações
-    elements.append(PageBreak())
-    elements.append(Paragraph("OBSERVAÇÕES GERAIS", styles['Heading2']))
-    elements.append(Spacer(1, 0.2*inch))
-
-    obs_data = []
-    for i in range(1, 11):
-        obs_data.append([f"Dia {i}:", ""])
-    
-    obs_table = Table(obs_data, colWidths=[0.8*inch, 6.2*inch], rowHeights=1.5*inch)
-    obs_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP')
-    ]))
-    elements.append(obs_table)
-
-    doc.build(
-        elements,
-        onFirstPage=footer,
-        onLaterPages=footer,
-        canvasmaker=NumberedCanvas
-    )
+    if wants_async():
+        return submit_job(
+            'pdf', lambda progress: Artifact(gerar_pdf(progress), nome_arquivo, 'application/pdf'),
+            projeto_id, download=True,
+        )
 
-    buffer.seek(0)
-    
-    nome_arquivo = f"projeto_{projeto.nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    
     return send_file(
-        buffer,
+        io.BytesIO(gerar_pdf(NULL_PROGRESS)),
         as_attachment=True,
         download_name=nome_arquivo,
         mimetype='application/pdf'
@@ -3317,24 +2853,44 @@ def api_keypads_next_hsnet():
 
 @app.get("/api/keypads")
 @login_required
+@project_etag
 def api_keypads_list():
     projeto_id = session.get("projeto_atual_id")
     if not projeto_id:
         return jsonify({"ok": True, "keypads": []})
 
-    keypads = (
-        Keypad.query
-        .join(Ambiente, Keypad.ambiente_id == Ambiente.id)
-        .join(Area, Ambiente.area_id == Area.id)
-        .filter(Area.projeto_id == projeto_id)
-        .options(
-            joinedload(Keypad.ambiente).joinedload(Ambiente.area),
-            joinedload(Keypad.buttons).joinedload(KeypadButton.circuito),
-        )
-        .order_by(Ambiente.nome.asc(), Keypad.nome.asc(), Keypad.id.asc())
-        .all()
+    fields = parse_fields(request.args, KEYPAD_FIELDS)
+    options = [contains_eager(Keypad.ambiente).contains_eager(Ambiente.area)]
+    if fields is not None:
+        options.append(load_only(*load_only_columns(Keypad, fields, Keypad.nome)))
+    # Os botões (e seus circuitos/cenas) só são carregados quando pedidos
+    if fields is None or "buttons" in fields:
+        options += [
+            selectinload(Keypad.buttons).joinedload(KeypadButton.circuito),
+            selectinload(Keypad.buttons).joinedload(KeypadButton.cena),
+        ]
+
+    # vinculado: ao menos um botão ligado a um circuito ou a uma cena
+    botao_vinculado = Keypad.buttons.any(or_(KeypadButton.circuito_id.isnot(None), KeypadButton.cena_id.isnot(None)))
+    keypads, extras = list_page(
+        {
+            "ambiente_id": lambda v: Ambiente.id == v,
+            "area_id": lambda v: Area.id == v,
+            "tipo": lambda v: Keypad.modelo == v,
+            "vinculado": lambda v: botao_vinculado if v else ~botao_vinculado,
+            "q": text_match(Keypad.nome, Ambiente.nome),
+        },
+        lambda: (
+            select(Keypad)
+            .join(Ambiente, Keypad.ambiente_id == Ambiente.id)
+            .join(Area, Ambiente.area_id == Area.id)
+            .where(Area.projeto_id == projeto_id)
+            .options(*options)
+        ),
+        (Ambiente.nome, Keypad.nome, Keypad.id),
+        lambda k: [k.ambiente.nome, k.nome, k.id],
     )
-    return jsonify({"ok": True, "keypads": [serialize_keypad(k) for k in keypads]})
+    return jsonify({"ok": True, "keypads": [serialize_keypad(k, fields=fields) for k in keypads], **extras})
 
 
 @app.get("/api/keypads/<int:keypad_id>")
@@ -3741,75 +3297,59 @@ def api_keypad_button_update(keypad_id, ordem):
 
 # -------------------- Cenas (Scenes) --------------------
 
-def serialize_custom_acao(custom_acao):
-    """Serializes a CustomAcao object."""
-    return {
-        "id": custom_acao.id,
-        "target_guid": custom_acao.target_guid,
-        "enable": custom_acao.enable,
-        "level": custom_acao.level,
-    }
-
-def serialize_acao(acao):
-    """Serializes an Acao object."""
-    return {
-        "id": acao.id,
-        "level": acao.level,
-        "action_type": acao.action_type,
-        "target_guid": acao.target_guid,
-        "custom_acoes": [serialize_custom_acao(ca) for ca in sorted(acao.custom_acoes, key=lambda x: x.id)],
-    }
-
-def serialize_cena(cena):
-    """Serializes a Cena object."""
-    return {
-        "id": cena.id,
-        "guid": cena.guid,
-        "nome": cena.nome,
-        "ambiente_id": cena.ambiente_id,
-        "scene_movers": cena.scene_movers,
-        "acoes": [serialize_acao(a) for a in sorted(cena.acoes, key=lambda x: x.id)],
-    }
-
 @app.get("/cenas")
 def cenas_spa():
     return current_app.send_static_file("index.html")
 
 @app.get("/api/cenas")
 @login_required
+@project_etag
 def get_all_cenas():
     projeto_id = session.get("projeto_atual_id")
     if not projeto_id:
         return jsonify({"ok": True, "cenas": []})
 
-    cenas = (
-        Cena.query
-        .join(Ambiente, Cena.ambiente_id == Ambiente.id)
-        .join(Area, Ambiente.area_id == Area.id)
-        .filter(Area.projeto_id == projeto_id)
-        .options(
-            joinedload(Cena.ambiente).joinedload(Ambiente.area),
-            joinedload(Cena.acoes).joinedload(Acao.custom_acoes)
-        )
-        .order_by(Area.nome, Ambiente.nome, Cena.nome)
-        .all()
+    fields = parse_fields(request.args, CENA_FIELDS)
+    options = [contains_eager(Cena.ambiente).contains_eager(Ambiente.area)]
+    if fields is not None:
+        options.append(load_only(*load_only_columns(Cena, fields, Cena.nome)))
+    # Ações e ações customizadas só são carregadas quando pedidas
+    if fields is None or "acoes" in fields:
+        options.append(selectinload(Cena.acoes).selectinload(Acao.custom_acoes))
+
+    cenas, extras = list_page(
+        {
+            "ambiente_id": lambda v: Ambiente.id == v,
+            "area_id": lambda v: Area.id == v,
+            "q": text_match(Cena.nome, Ambiente.nome),
+        },
+        lambda: (
+            select(Cena)
+            .join(Ambiente, Cena.ambiente_id == Ambiente.id)
+            .join(Area, Ambiente.area_id == Area.id)
+            .where(Area.projeto_id == projeto_id)
+            .options(*options)
+        ),
+        (Area.nome, Ambiente.nome, Cena.nome, Cena.id),
+        lambda c: [c.ambiente.area.nome, c.ambiente.nome, c.nome, c.id],
     )
 
     # Adicionar dados do ambiente na serialização
     cenas_serializadas = []
     for c in cenas:
-        cena_data = serialize_cena(c)
-        cena_data['ambiente'] = {
-            'id': c.ambiente.id,
-            'nome': c.ambiente.nome,
-            'area': {
-                'id': c.ambiente.area.id,
-                'nome': c.ambiente.area.nome
+        cena_data = serialize_cena(c, fields)
+        if fields is None or 'ambiente' in fields:
+            cena_data['ambiente'] = {
+                'id': c.ambiente.id,
+                'nome': c.ambiente.nome,
+                'area': {
+                    'id': c.ambiente.area.id,
+                    'nome': c.ambiente.area.nome
+                }
             }
-        }
         cenas_serializadas.append(cena_data)
 
-    return jsonify({"ok": True, "cenas": cenas_serializadas})
+    return jsonify({"ok": True, "cenas": cenas_serializadas, **extras})
 
 
 @app.get("/api/ambientes/<int:ambiente_id>/cenas")
@@ -3856,6 +3396,9 @@ def create_cena():
     if ambiente.area.projeto_id != projeto_id:
         return jsonify({"ok": False, "error": "Ambiente não pertence ao projeto atual."}), 403
 
+    # Circuitos do projeto carregados uma única vez para as validações abaixo
+    circuit_index = RoomCircuitIndex.load(db.session, projeto_id)
+
     # Validação para scene_movers
     if scene_movers:
         all_circuit_ids = set()
@@ -3876,12 +3419,12 @@ def create_cena():
                     pass
 
         if all_circuit_ids:
-            circuits = Circuito.query.filter(Circuito.id.in_(list(all_circuit_ids))).all()
+            circuits = [c for c in map(circuit_index.get, all_circuit_ids) if c is not None]
             if any(c.tipo != 'persiana' for c in circuits):
                 return jsonify({"ok": False, "error": "Movimentadores de cena só podem ser habilitados se todos os itens da cena forem persianas."}), 400
 
         if all_group_ambiente_ids:
-            group_circuits = Circuito.query.filter(Circuito.ambiente_id.in_(list(all_group_ambiente_ids))).all()
+            group_circuits = [c for amb_id in all_group_ambiente_ids for c in circuit_index.circuits_in(amb_id)]
             for c in group_circuits:
                 if c.tipo in ['luz', 'persiana'] and c.tipo != 'persiana':
                     return jsonify({"ok": False, "error": "Movimentadores de cena só podem ser habilitados se todos os itens da cena forem persianas (encontrado em grupo)."}), 400
@@ -3891,7 +3434,7 @@ def create_cena():
         if acao_data.get("action_type") == 0: # Ação de Circuito
             try:
                 circuito_id = int(acao_data.get("target_guid"))
-                circuito = db.session.get(Circuito, circuito_id)
+                circuito = circuit_index.get(circuito_id)
                 if circuito and circuito.tipo == 'hvac':
                     return jsonify({"ok": False, "error": "Não é permitido adicionar circuitos do tipo HVAC em cenas de iluminação."}), 400
             except (ValueError, TypeError):
@@ -3966,6 +3509,9 @@ def update_cena(cena_id):
     if "acoes" in data:
         acoes_data = data.get("acoes", [])
 
+        # Circuitos do projeto carregados uma única vez para as validações abaixo
+        circuit_index = RoomCircuitIndex.load(db.session, projeto_id)
+
         # Validação para scene_movers
         if data.get("scene_movers"):
             all_circuit_ids = set()
@@ -3984,7 +3530,7 @@ def update_cena(cena_id):
                         # O target_guid de um grupo é o ID do AMBIENTE
                         ambiente_id_grupo = int(acao_data.get("target_guid"))
                         # Pegar todos os circuitos daquele ambiente
-                        circs_no_grupo = Circuito.query.filter_by(ambiente_id=ambiente_id_grupo).all()
+                        circs_no_grupo = circuit_index.circuits_in(ambiente_id_grupo)
                         for c in circs_no_grupo:
                             if c.tipo != 'hvac': # Ignorar HVAC na validação
                                 all_circuit_ids.add(c.id)
@@ -3992,7 +3538,7 @@ def update_cena(cena_id):
                         pass
 
             if all_circuit_ids:
-                circuits = Circuito.query.filter(Circuito.id.in_(list(all_circuit_ids))).all()
+                circuits = [c for c in map(circuit_index.get, all_circuit_ids) if c is not None]
                 if any(c.tipo != 'persiana' for c in circuits):
                     return jsonify({"ok": False, "error": "Movimentadores de cena só podem ser habilitados se todos os itens da cena forem persianas."}), 400
 
@@ -4001,7 +3547,7 @@ def update_cena(cena_id):
             if acao_data.get("action_type") == 0:
                 try:
                     circuito_id = int(acao_data.get("target_guid"))
-                    circuito = db.session.get(Circuito, circuito_id)
+                    circuito = circuit_index.get(circuito_id)
                     if circuito and circuito.tipo == 'hvac':
                         return jsonify({"ok": False, "error": "Não é permitido adicionar circuitos do tipo HVAC em cenas de iluminação."}), 400
                 except (ValueError, TypeError):
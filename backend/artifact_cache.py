@@ -0,0 +1,137 @@
+# artifact_cache.py
+"""Cache em disco dos arquivos exportados (RWP, PDF, CSV e JSON).
+
+Cada artefato é identificado pelo projeto, por um token de revisão do projeto
+e pelos parâmetros da exportação. Os arquivos ficam em
+``<raiz>/<projeto_id>/<chave>.<tipo>``; ``invalidate`` apaga a pasta do
+projeto inteira. O tamanho total é limitado e os artefatos menos usados
+(mtime mais antigo, atualizado a cada acerto) são removidos primeiro.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+# Incrementar quando o formato de algum artefato mudar, para não servir
+# arquivos gerados por uma versão anterior do código
+FORMAT_VERSION = 1
+
+
+class ArtifactCache:
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _project_dir(self, projeto_id):
+        return os.path.join(self.root, str(int(projeto_id)))
+
+    def key(self, token, kind, params=None):
+        payload = json.dumps(
+            {"v": FORMAT_VERSION, "token": token, "kind": kind, "params": params or {}},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, projeto_id, token, kind, params=None):
+        return os.path.join(self._project_dir(projeto_id), f"{self.key(token, kind, params)}.{kind}")
+
+    def get(self, projeto_id, token, kind, params=None):
+        """Caminho do artefato em cache, ou ``None``. Um acerto renova a posição no LRU."""
+        path = self.path(projeto_id, token, kind, params)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, projeto_id, token, kind, params, data):
+        """Grava ``data`` (bytes) no cache e devolve o caminho do artefato."""
+        path = self.path(projeto_id, token, kind, params)
+        tmp_path = self._temp_file(path)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._discard(tmp_path)
+            return None
+        self.evict()
+        return path
+
+    def tee(self, projeto_id, token, kind, params, chunks):
+        """Repassa os blocos de ``chunks`` e grava o artefato quando o último for entregue.
+
+        Se o download for interrompido no meio, o arquivo parcial é descartado.
+        """
+        path = self.path(projeto_id, token, kind, params)
+        try:
+            tmp_path = self._temp_file(path)
+            tmp = open(tmp_path, "wb")
+        except OSError:
+            yield from chunks
+            return
+
+        complete = False
+        try:
+            for chunk in chunks:
+                tmp.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            tmp.close()
+            if complete:
+                try:
+                    os.replace(tmp_path, path)
+                except OSError:
+                    self._discard(tmp_path)
+                else:
+                    self.evict()
+            else:
+                self._discard(tmp_path)
+
+    def invalidate(self, projeto_id):
+        """Remove todos os artefatos de um projeto."""
+        shutil.rmtree(self._project_dir(projeto_id), ignore_errors=True)
+
+    def evict(self):
+        """Remove os artefatos menos usados até o total caber em ``max_bytes``."""
+        with self._lock:
+            entries = []
+            total = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if filename.startswith("."):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                self._discard(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def _temp_file(self, path):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        os.close(fd)
+        return tmp_path
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
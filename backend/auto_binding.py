@@ -0,0 +1,318 @@
+# auto_binding.py
+"""Motor da vinculação automática de circuitos (/api/vinculacoes/auto).
+
+Módulos, vinculações existentes e a potência dos circuitos são carregados uma
+vez; o plano é montado em memória e gravado pela rota em um único INSERT.
+
+Regras (as mesmas da versão anterior da rota):
+
+- circuitos agrupados por ambiente, ambientes com mais circuitos primeiro e,
+  dentro de cada um, dimerizáveis primeiro;
+- módulos compatíveis ordenados pela pontuação: circuitos do mesmo ambiente
+  no módulo × 10 + canais livres + prioridade do tipo de módulo × 5
+  (DIM8 para luz não dimerizável vale -100);
+- em cada módulo, o menor canal livre que respeite os limites de
+  ``ESPECIFICACOES_MODULOS``: corrente por canal e corrente máxima do grupo
+  (vinculações existentes + as já planejadas + o circuito).
+
+Cada grupo de canais guarda sua corrente acumulada e um heap com os canais
+livres, então escolher o canal de um módulo não depende do número de canais.
+
+Com mais de um quadro elétrico, cada quadro é resolvido à parte só com os
+seus módulos (``quadro_eletrico_id``) e os circuitos atribuídos a ele: os do
+mesmo ambiente do quadro ou, na falta, da mesma área. Os quadros são
+resolvidos em sequência (um quadro com 5.000 circuitos e 600 módulos leva
+menos de 1 s).
+"""
+import heapq
+
+from sqlalchemy import select
+
+from database import Ambiente, Area, Circuito, Modulo, Vinculacao, QuadroEletrico
+
+# Tipos de módulo aceitos por tipo de circuito, em ordem de preferência
+PRIORIDADES = {
+    "luz": {
+        "dimerizavel": ["DIM8", "RL12", "RL4"],
+        "nao_dimerizavel": ["RL12", "RL4", "DIM8"],
+    },
+    "persiana": ["LX4"],
+    "hvac": ["SA1"],
+}
+
+
+def calcular_corrente(potencia):
+    """Corrente do circuito em 120 V."""
+    if not potencia or potencia <= 0:
+        return 0
+    return potencia / 120
+
+
+def tipos_compativeis(circuito):
+    if circuito.tipo == "luz":
+        return PRIORIDADES["luz"]["dimerizavel" if circuito.dimerizavel else "nao_dimerizavel"]
+    return PRIORIDADES.get(circuito.tipo, [])
+
+
+class _Grupo:
+    __slots__ = ("canais", "max_corrente", "existente", "pendente", "livres")
+
+    def __init__(self, canais, max_corrente):
+        self.canais = set(canais)
+        self.max_corrente = max_corrente
+        # Somadas separadamente, na mesma ordem da versão anterior
+        self.existente = 0
+        self.pendente = 0
+        self.livres = []
+
+    @property
+    def corrente(self):
+        return self.existente + self.pendente
+
+
+class _ModuloPlano:
+    """Canais livres, correntes por grupo e ambientes de um módulo durante o planejamento."""
+
+    def __init__(self, posicao, modulo, especificacao):
+        self.posicao = posicao
+        self.id = modulo.id
+        self.nome = modulo.nome
+        self.tipo = modulo.tipo
+        self.quadro_eletrico_id = modulo.quadro_eletrico_id
+        self.especificacao = especificacao
+        self.grupos = [_Grupo(g["canais"], g["maxCorrente"]) for g in (especificacao or {}).get("grupos", ())]
+        self.sem_grupo = []  # heap dos canais livres fora dos grupos
+        self.ambientes = {}
+        self.quantidade_canais = modulo.quantidade_canais or 0
+        self.livres = 0
+
+    def _grupos_do_canal(self, canal):
+        return [g for g in self.grupos if canal in g.canais]
+
+    def ocupar(self, canal, corrente, ambiente_id, existente):
+        for grupo in self._grupos_do_canal(canal):
+            if existente:
+                grupo.existente += corrente
+            else:
+                grupo.pendente += corrente
+        self.ambientes[ambiente_id] = self.ambientes.get(ambiente_id, 0) + 1
+
+    def liberar_canais(self, ocupados):
+        for canal in range(1, self.quantidade_canais + 1):
+            if canal in ocupados:
+                continue
+            grupos = self._grupos_do_canal(canal)
+            heapq.heappush(grupos[0].livres if grupos else self.sem_grupo, canal)
+            self.livres += 1
+
+    def escolher_canal(self, circuito, corrente, erros):
+        """Menor canal livre que comporte ``corrente``; os limites violados antes
+        dele vão para ``erros`` (uma mensagem por grupo)."""
+        if self.especificacao and corrente > self.especificacao["correntePorCanal"]:
+            erros.append(f"Circuito {circuito.identificador} excede corrente do canal "
+                         f"({corrente:.2f}A > {self.especificacao['correntePorCanal']}A)")
+            return None
+
+        canal, heap = (self.sem_grupo[0], self.sem_grupo) if self.sem_grupo else (None, None)
+        excedidos = []
+        for grupo in self.grupos:
+            if not grupo.livres:
+                continue
+            total = grupo.corrente + corrente
+            if total > grupo.max_corrente:
+                excedidos.append((grupo.livres[0], total, grupo.max_corrente))
+            elif canal is None or grupo.livres[0] < canal:
+                canal, heap = grupo.livres[0], grupo.livres
+
+        for primeiro, total, max_corrente in sorted(excedidos):
+            if canal is None or primeiro < canal:
+                erros.append(f"Circuito {circuito.identificador} excede corrente do grupo "
+                             f"({total:.2f}A > {max_corrente}A) no módulo {self.nome}")
+        if canal is None:
+            return None
+        heapq.heappop(heap)
+        self.livres -= 1
+        return canal
+
+
+class AutoBindingPlanner:
+    def __init__(self, modulos, vinculacoes, especificacoes):
+        """``modulos``: linhas com id, nome, tipo, quantidade_canais e
+        quadro_eletrico_id; ``vinculacoes``: linhas existentes com modulo_id,
+        canal, potencia e ambiente_id do circuito."""
+        self.modulos = [_ModuloPlano(i, m, especificacoes.get(m.tipo)) for i, m in enumerate(modulos)]
+        por_id = {m.id: m for m in self.modulos}
+        ocupados = {}
+        for v in vinculacoes:
+            modulo = por_id.get(v.modulo_id)
+            if modulo is None:
+                continue
+            ocupados.setdefault(v.modulo_id, set()).add(v.canal)
+            modulo.ocupar(v.canal, calcular_corrente(v.potencia), v.ambiente_id, existente=True)
+        self.por_tipo = {}
+        for modulo in self.modulos:
+            modulo.liberar_canais(ocupados.get(modulo.id, ()))
+            self.por_tipo.setdefault(modulo.tipo, []).append(modulo)
+
+    def _candidatos(self, circuito, tipos):
+        """Heap de (-pontuação, posição, módulo): o mesmo desempate da ordenação estável anterior."""
+        heap = []
+        for prioridade, tipo in enumerate(tipos):
+            for modulo in self.por_tipo.get(tipo, ()):
+                if not modulo.livres:
+                    continue
+                score_prioridade = (len(tipos) - prioridade) * 5
+                if circuito.tipo == "luz" and not circuito.dimerizavel and tipo == "DIM8":
+                    score_prioridade = -100
+                score = modulo.ambientes.get(circuito.ambiente_id, 0) * 10 + modulo.livres + score_prioridade
+                heap.append((-score, modulo.posicao, modulo))
+        heapq.heapify(heap)
+        return heap
+
+    def plan(self, circuitos):
+        """Devolve ``(vinculacoes, erros)``; cada vinculação é um dict com
+        circuito_id, modulo_id e canal, mais identificador, nome do módulo e
+        corrente para o log e para a prévia."""
+        por_ambiente = {}
+        for circuito in circuitos:
+            por_ambiente.setdefault(circuito.ambiente_id, []).append(circuito)
+
+        vinculacoes = []
+        erros = []
+        for ambiente_id in sorted(por_ambiente, key=lambda a: len(por_ambiente[a]), reverse=True):
+            for circuito in sorted(por_ambiente[ambiente_id], key=lambda c: (not c.dimerizavel, c.tipo)):
+                candidatos = self._candidatos(circuito, tipos_compativeis(circuito))
+                if not candidatos:
+                    erros.append(f"Nenhum módulo compatível disponível para circuito {circuito.identificador} "
+                                 f"({circuito.tipo}{' - dimerizável' if circuito.dimerizavel else ''})")
+                    continue
+
+                corrente = calcular_corrente(circuito.potencia)
+                while candidatos:
+                    modulo = heapq.heappop(candidatos)[2]
+                    canal = modulo.escolher_canal(circuito, corrente, erros)
+                    if canal is not None:
+                        modulo.ocupar(canal, corrente, ambiente_id, existente=False)
+                        vinculacoes.append({
+                            "circuito_id": circuito.id,
+                            "identificador": circuito.identificador,
+                            "modulo_id": modulo.id,
+                            "modulo_nome": modulo.nome,
+                            "canal": canal,
+                            "corrente": corrente,
+                        })
+                        break
+                else:
+                    erros.append(f"Não foi possível vincular circuito {circuito.identificador} - "
+                                 f"restrições elétricas ou nenhum canal livre compatível")
+        return vinculacoes, erros
+
+    def correntes_por_grupo(self):
+        """Corrente de cada grupo de canais dos módulos com especificação."""
+        return [
+            {
+                "modulo_id": modulo.id,
+                "modulo_nome": modulo.nome,
+                "tipo": modulo.tipo,
+                "grupos": [
+                    {"canais": sorted(g.canais), "corrente": g.corrente, "max_corrente": g.max_corrente}
+                    for g in modulo.grupos
+                ],
+            }
+            for modulo in self.modulos if modulo.especificacao
+        ]
+
+
+def load_auto_binding_data(session, projeto_id):
+    """Quadros, módulos, vinculações existentes e circuitos sem vinculação do
+    projeto, uma consulta para cada."""
+    quadros = session.execute(
+        select(QuadroEletrico.id, QuadroEletrico.nome, QuadroEletrico.ambiente_id, Ambiente.area_id)
+        .join(Ambiente, QuadroEletrico.ambiente_id == Ambiente.id)
+        .where(QuadroEletrico.projeto_id == projeto_id)
+        .order_by(QuadroEletrico.id)
+    ).all()
+    modulos = session.execute(
+        select(Modulo.id, Modulo.nome, Modulo.tipo, Modulo.quantidade_canais, Modulo.quadro_eletrico_id)
+        .where(Modulo.projeto_id == projeto_id)
+        .order_by(Modulo.id)
+    ).all()
+    vinculacoes = session.execute(
+        select(Vinculacao.modulo_id, Vinculacao.canal, Circuito.potencia, Circuito.ambiente_id)
+        .join(Circuito, Vinculacao.circuito_id == Circuito.id)
+        .join(Modulo, Vinculacao.modulo_id == Modulo.id)
+        .where(Modulo.projeto_id == projeto_id)
+        .order_by(Vinculacao.id)
+    ).all()
+    circuitos = session.execute(
+        select(Circuito.id, Circuito.identificador, Circuito.tipo, Circuito.dimerizavel,
+               Circuito.potencia, Circuito.ambiente_id, Ambiente.area_id)
+        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+        .join(Area, Ambiente.area_id == Area.id)
+        .where(Area.projeto_id == projeto_id)
+        .where(Circuito.id.notin_(select(Vinculacao.circuito_id)))
+        .order_by(Circuito.id)
+    ).all()
+    return quadros, modulos, vinculacoes, circuitos
+
+
+def partition_by_board(quadros, modulos, vinculacoes, circuitos):
+    """Separa o problema por quadro elétrico.
+
+    Devolve ``(particoes, sem_quadro)``: ``particoes`` é uma lista de
+    ``(quadro, modulos, vinculacoes, circuitos)`` e ``sem_quadro`` os circuitos
+    que não couberam em nenhum quadro. Com um único quadro tudo vai para ele,
+    inclusive módulos ainda sem quadro, como antes.
+    """
+    if len(quadros) == 1:
+        return [(quadros[0], list(modulos), list(vinculacoes), list(circuitos))], []
+
+    quadro_do_ambiente = {}
+    quadro_da_area = {}
+    for q in quadros:
+        quadro_do_ambiente.setdefault(q.ambiente_id, q.id)
+        quadro_da_area.setdefault(q.area_id, q.id)
+
+    modulos_do_quadro = {q.id: [] for q in quadros}
+    quadro_do_modulo = {}
+    for m in modulos:
+        if m.quadro_eletrico_id in modulos_do_quadro:
+            modulos_do_quadro[m.quadro_eletrico_id].append(m)
+            quadro_do_modulo[m.id] = m.quadro_eletrico_id
+    vinculacoes_do_quadro = {q.id: [] for q in quadros}
+    for v in vinculacoes:
+        if v.modulo_id in quadro_do_modulo:
+            vinculacoes_do_quadro[quadro_do_modulo[v.modulo_id]].append(v)
+
+    circuitos_do_quadro = {q.id: [] for q in quadros}
+    sem_quadro = []
+    for c in circuitos:
+        quadro_id = quadro_do_ambiente.get(c.ambiente_id, quadro_da_area.get(c.area_id))
+        if quadro_id is None:
+            sem_quadro.append(c)
+        else:
+            circuitos_do_quadro[quadro_id].append(c)
+
+    particoes = [
+        (q, modulos_do_quadro[q.id], vinculacoes_do_quadro[q.id], circuitos_do_quadro[q.id])
+        for q in quadros if circuitos_do_quadro[q.id]
+    ]
+    return particoes, sem_quadro
+
+
+def solve_board(modulos, vinculacoes, circuitos, especificacoes):
+    """Resolve um quadro: (plano, erros, correntes por grupo)."""
+    planner = AutoBindingPlanner(modulos, vinculacoes, especificacoes)
+    plano, erros = planner.plan(circuitos)
+    return plano, erros, planner.correntes_por_grupo()
+
+
+def solve_boards(particoes, especificacoes):
+    """Resolve cada partição e devolve os resultados na mesma ordem.
+
+    Os quadros não compartilham módulos, então cada um é resolvido à parte.
+    """
+    return [
+        solve_board(modulos, vinculacoes, circuitos, especificacoes)
+        for _, modulos, vinculacoes, circuitos in particoes
+    ]
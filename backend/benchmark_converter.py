@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos conversores ROEHN com projetos sintéticos.
+
+Gera projetos em escalas configuráveis (ex.: 10/100/1000 ambientes com N
+circuitos, keypads e cenas cada) e mede separadamente cada etapa:
+
+- roehn_converter (banco):     create_project, process_db_project, export_project
+- standalone_roehn_converter:  create_project, convert_project_from_json, export_project
+
+Os tempos vêm de execuções sem tracemalloc (melhor e mediana de --repeat
+rodadas); o pico de memória de cada etapa vem de uma rodada extra com
+tracemalloc ativo. Antes das rodadas, confere que o snapshot do projeto é
+carregado em até SNAPSHOT_QUERY_COUNT consultas. O resultado é gravado em
+JSON para comparar commits:
+
+    python benchmark_converter.py --rooms 10 100 1000 --converter db -o bench_novo.json
+    python benchmark_converter.py --rooms 10 100 --compare bench_antigo.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Adiciona o diretório atual ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from database import db, User, Projeto, Area, Ambiente, QuadroEletrico, Circuito, Modulo, Vinculacao, Keypad, KeypadButton, Cena, Acao, CustomAcao
+from project_snapshot import QueryCounter, SNAPSHOT_QUERY_COUNT, load_project_snapshot
+import roehn_converter
+import standalone_roehn_converter
+
+PROJECT_INFO = {
+    'project_name': 'Benchmark',
+    'client_name': 'Benchmark',
+    'm4_ip': '192.168.0.245',
+    'm4_hsnet': 245,
+}
+
+# Capacidade de canais por tipo de módulo e o tipo usado para cada circuito
+MODULE_CHANNELS = {'RL12': 12, 'DIM8': 8, 'LX4': 4, 'SA1': 1}
+CIRCUIT_TYPES = ['luz', 'luz', 'luz', 'persiana', 'luz', 'hvac']
+
+# O standalone reconhece os módulos pelo nome comercial completo
+STANDALONE_MODULE_TYPES = {
+    'RL12': 'ADP-RL12',
+    'RL4': 'AQL-GV-RL4',
+    'LX4': 'ADP-LX4',
+    'SA1': 'AQL-GV-SA1',
+    'DIM8': 'ADP-DIM8',
+}
+
+
+def _module_type_for(circuito):
+    if circuito['tipo'] == 'persiana':
+        return 'LX4'
+    if circuito['tipo'] == 'hvac':
+        return 'SA1'
+    return 'DIM8' if circuito['dimerizavel'] else 'RL12'
+
+
+def generate_project(rooms, circuits=6, keypads=1, scenes=2, rooms_per_area=10):
+    """Gera um projeto sintético como dicionário (mesmo formato do export de projeto).
+
+    Cada área tem um quadro elétrico e um controlador ADP-M8; o primeiro quadro
+    recebe também o AQL-GV-M4 (logic server). Os circuitos são vinculados em
+    módulos RL12/DIM8/LX4/SA1 abertos sob demanda no quadro da área.
+    """
+    ids = {}
+
+    def next_id(table):
+        ids[table] = ids.get(table, 0) + 1
+        return ids[table]
+
+    projeto = {'id': 1, 'nome': f'Benchmark {rooms} ambientes', 'areas': [], 'modulos': []}
+    main_controller = {
+        'id': next_id('modulo'), 'nome': 'AQL-GV-M4', 'tipo': 'AQL-GV-M4', 'quantidade_canais': 0,
+        'hsnet': 245, 'dev_id': None, 'is_controller': True, 'is_logic_server': True,
+        'ip_address': PROJECT_INFO['m4_ip'], 'quadro_eletrico_id': None, 'parent_controller_id': None,
+    }
+    projeto['modulos'].append(main_controller)
+
+    keypad_hsnet = 1000
+    area = None
+    for room_index in range(rooms):
+        if room_index % rooms_per_area == 0:
+            area = {'id': next_id('area'), 'nome': f'Area {len(projeto["areas"]) + 1}', 'ambientes': []}
+            projeto['areas'].append(area)
+            quadro = {'id': next_id('quadro'), 'nome': f'Quadro {area["id"]}', 'notes': None}
+            if main_controller['quadro_eletrico_id'] is None:
+                main_controller['quadro_eletrico_id'] = quadro['id']
+            controller = {
+                'id': next_id('modulo'), 'nome': f'M8 {area["id"]}', 'tipo': 'ADP-M8', 'quantidade_canais': 0,
+                'hsnet': None, 'dev_id': None, 'is_controller': True, 'is_logic_server': False,
+                'ip_address': f'192.168.{area["id"] // 250}.{area["id"] % 250 + 1}',
+                'quadro_eletrico_id': quadro['id'], 'parent_controller_id': None,
+            }
+            projeto['modulos'].append(controller)
+            open_modules = {}
+
+        ambiente = {
+            'id': next_id('ambiente'), 'nome': f'Ambiente {room_index + 1}',
+            'circuitos': [], 'keypads': [], 'quadros_eletricos': [], 'cenas': [],
+        }
+        if room_index % rooms_per_area == 0:
+            ambiente['quadros_eletricos'].append(quadro)
+        area['ambientes'].append(ambiente)
+
+        for circuit_index in range(circuits):
+            tipo = CIRCUIT_TYPES[circuit_index % len(CIRCUIT_TYPES)]
+            circuito = {
+                'id': next_id('circuito'), 'identificador': f'C{room_index + 1}.{circuit_index + 1}',
+                'nome': f'Circuito {room_index + 1}.{circuit_index + 1}', 'tipo': tipo,
+                'dimerizavel': tipo == 'luz' and circuit_index % 2 == 0, 'potencia': 100.0,
+                'sak': None, 'quantidade_saks': 1, 'vinculacao': None,
+            }
+            module_type = _module_type_for(circuito)
+            modulo = open_modules.get(module_type)
+            if modulo is None or modulo['_canais_usados'] >= MODULE_CHANNELS[module_type]:
+                modulo = {
+                    'id': next_id('modulo'), 'nome': f'{module_type} {ids["modulo"]}', 'tipo': module_type,
+                    'quantidade_canais': MODULE_CHANNELS[module_type], 'hsnet': None, 'dev_id': None,
+                    'is_controller': False, 'is_logic_server': False, 'ip_address': None,
+                    'quadro_eletrico_id': quadro['id'], 'parent_controller_id': controller['id'],
+                    '_canais_usados': 0,
+                }
+                projeto['modulos'].append(modulo)
+                open_modules[module_type] = modulo
+            modulo['_canais_usados'] += 1
+            circuito['vinculacao'] = {
+                'id': next_id('vinculacao'), 'canal': modulo['_canais_usados'],
+                'modulo': {'id': modulo['id'], 'nome': modulo['nome']},
+            }
+            ambiente['circuitos'].append(circuito)
+
+        for scene_index in range(scenes):
+            cena = {
+                'id': next_id('cena'), 'guid': f'c0000000-0000-0000-0000-{ids["cena"]:012d}',
+                'nome': f'Cena {scene_index + 1}', 'scene_movers': False, 'acoes': [],
+            }
+            if ambiente['circuitos']:
+                first = ambiente['circuitos'][0]
+                cena['acoes'].append({
+                    'id': next_id('acao'), 'level': 80, 'action_type': 0, 'target_guid': str(first['id']),
+                    'custom_acoes': [],
+                })
+                cena['acoes'].append({
+                    'id': next_id('acao'), 'level': 100, 'action_type': 7, 'target_guid': str(ambiente['id']),
+                    'custom_acoes': [
+                        {'id': next_id('custom_acao'), 'target_guid': str(first['id']), 'enable': False, 'level': 0},
+                    ],
+                })
+            ambiente['cenas'].append(cena)
+
+        for keypad_index in range(keypads):
+            keypad = {
+                'id': next_id('keypad'), 'nome': f'Keypad {keypad_index + 1}', 'modelo': 'RQR-K',
+                'color': 'WHITE', 'button_color': 'WHITE', 'button_count': 4,
+                'hsnet': keypad_hsnet, 'dev_id': None, 'notes': None, 'buttons': [],
+            }
+            keypad_hsnet += 1
+            for ordem in range(1, 5):
+                button = {
+                    'id': next_id('keypad_button'), 'ordem': ordem, 'guid': f'b0000000-0000-0000-0000-{ids["keypad_button"]:012d}',
+                    'engraver_text': None, 'icon': 'spot' if ordem == 1 else None, 'is_rocker': ordem == 4,
+                    'circuito_id': None, 'cena_id': None,
+                }
+                if ordem <= 2 and len(ambiente['circuitos']) >= ordem:
+                    button['circuito_id'] = ambiente['circuitos'][ordem - 1]['id']
+                elif ordem == 3 and ambiente['cenas']:
+                    button['cena_id'] = ambiente['cenas'][0]['id']
+                keypad['buttons'].append(button)
+            ambiente['keypads'].append(keypad)
+
+    for modulo in projeto['modulos']:
+        modulo.pop('_canais_usados', None)
+    return projeto
+
+
+def seed_project(session, projeto):
+    """Grava o projeto sintético no banco (IDs explícitos) e devolve o Projeto."""
+    session.add(User(id=1, username='benchmark', email='benchmark@example.com'))
+    session.add(Projeto(id=projeto['id'], nome=projeto['nome'], user_id=1))
+
+    for modulo in projeto['modulos']:
+        session.add(Modulo(
+            id=modulo['id'], nome=modulo['nome'], tipo=modulo['tipo'], quantidade_canais=modulo['quantidade_canais'],
+            projeto_id=projeto['id'], hsnet=modulo['hsnet'], dev_id=modulo['dev_id'],
+            is_controller=modulo['is_controller'], is_logic_server=modulo['is_logic_server'],
+            ip_address=modulo['ip_address'], quadro_eletrico_id=modulo['quadro_eletrico_id'],
+            parent_controller_id=modulo['parent_controller_id'],
+        ))
+
+    for area in projeto['areas']:
+        session.add(Area(id=area['id'], nome=area['nome'], projeto_id=projeto['id']))
+        for ambiente in area['ambientes']:
+            session.add(Ambiente(id=ambiente['id'], nome=ambiente['nome'], area_id=area['id']))
+            for quadro in ambiente['quadros_eletricos']:
+                session.add(QuadroEletrico(
+                    id=quadro['id'], nome=quadro['nome'], ambiente_id=ambiente['id'], projeto_id=projeto['id'],
+                ))
+            for circuito in ambiente['circuitos']:
+                session.add(Circuito(
+                    id=circuito['id'], identificador=circuito['identificador'], nome=circuito['nome'],
+                    tipo=circuito['tipo'], dimerizavel=circuito['dimerizavel'], potencia=circuito['potencia'],
+                    ambiente_id=ambiente['id'],
+                ))
+                vinculacao = circuito['vinculacao']
+                session.add(Vinculacao(
+                    id=vinculacao['id'], circuito_id=circuito['id'], modulo_id=vinculacao['modulo']['id'],
+                    canal=vinculacao['canal'],
+                ))
+            for cena in ambiente['cenas']:
+                session.add(Cena(
+                    id=cena['id'], guid=cena['guid'], nome=cena['nome'], ambiente_id=ambiente['id'],
+                    scene_movers=cena['scene_movers'],
+                ))
+                for acao in cena['acoes']:
+                    session.add(Acao(
+                        id=acao['id'], cena_id=cena['id'], level=acao['level'], action_type=acao['action_type'],
+                        target_guid=acao['target_guid'],
+                    ))
+                    for custom in acao['custom_acoes']:
+                        session.add(CustomAcao(
+                            id=custom['id'], acao_id=acao['id'], target_guid=custom['target_guid'],
+                            enable=custom['enable'], level=custom['level'],
+                        ))
+            for keypad in ambiente['keypads']:
+                session.add(Keypad(
+                    id=keypad['id'], nome=keypad['nome'], modelo=keypad['modelo'], color=keypad['color'],
+                    button_color=keypad['button_color'], button_count=keypad['button_count'],
+                    hsnet=keypad['hsnet'], dev_id=keypad['dev_id'], ambiente_id=ambiente['id'],
+                    projeto_id=projeto['id'], notes=keypad['notes'],
+                ))
+                for button in keypad['buttons']:
+                    session.add(KeypadButton(
+                        id=button['id'], keypad_id=keypad['id'], ordem=button['ordem'], guid=button['guid'],
+                        engraver_text=button['engraver_text'], icon=button['icon'], is_rocker=button['is_rocker'],
+                        circuito_id=button['circuito_id'], cena_id=button['cena_id'],
+                    ))
+
+    session.commit()
+    session.expunge_all()
+
+
+def to_standalone_input(projeto):
+    """Converte o projeto sintético para o formato de entrada do standalone_roehn_converter."""
+    standalone = json.loads(json.dumps(projeto))
+    for modulo in standalone['modulos']:
+        modulo['tipo'] = STANDALONE_MODULE_TYPES.get(modulo['tipo'], modulo['tipo'])
+    for area in standalone['areas']:
+        for ambiente in area['ambientes']:
+            for keypad in ambiente['keypads']:
+                for button in keypad['buttons']:
+                    button['button_index'] = button['ordem']
+                    if button['circuito_id']:
+                        action = {'type': 'Toggle', 'target_type': 'circuito', 'target_id': button['circuito_id']}
+                    elif button['cena_id']:
+                        action = {'type': 'Toggle', 'target_type': 'cena', 'target_id': button['cena_id']}
+                    else:
+                        action = {}
+                    button['json_config'] = {'action': action, 'EngraverText': button['engraver_text'] or ''}
+    standalone['projeto'] = dict(PROJECT_INFO, ip_address=PROJECT_INFO['m4_ip'], hsnet=PROJECT_INFO['m4_hsnet'])
+    return standalone
+
+
+def _db_stages(session, projeto_id):
+    converter = roehn_converter.RoehnProjectConverter(None, session, 1)
+    yield 'create_project', lambda: converter.create_project(dict(PROJECT_INFO))
+    yield 'process_db_project', lambda: converter.process_db_project(session.get(Projeto, projeto_id))
+    yield 'export_project', converter.export_project
+
+
+def _standalone_stages(project_json):
+    converter = standalone_roehn_converter.RoehnProjectConverter()
+    yield 'create_project', lambda: converter.create_project(dict(project_json['projeto']))
+    yield 'convert_project_from_json', lambda: converter.convert_project_from_json(project_json)
+    yield 'export_project', converter.export_project
+
+
+def check_snapshot_queries(session, projeto_id):
+    """Confere que o snapshot do projeto é carregado em até SNAPSHOT_QUERY_COUNT consultas."""
+    with QueryCounter(session) as counter:
+        snapshot = load_project_snapshot(session, projeto_id)
+    if snapshot is None:
+        raise ValueError(f"Projeto {projeto_id} não encontrado")
+    counter.assert_at_most(SNAPSHOT_QUERY_COUNT)
+    return counter.count
+
+
+def run_stages(stages, trace_memory=False):
+    """Executa as etapas em ordem; devolve {etapa: métricas} e a saída do export."""
+    results = {}
+    output = None
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, stage in stages:
+            if trace_memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            output = stage()
+            elapsed = time.perf_counter() - start
+            results[name] = {'seconds': elapsed}
+            if trace_memory:
+                results[name]['peak_bytes'] = tracemalloc.get_traced_memory()[1] - baseline
+    return results, output
+
+
+def benchmark(make_stages, repeat):
+    """Roda ``repeat`` vezes para tempo e uma vez com tracemalloc para memória."""
+    timings = {}
+    output = None
+    for _ in range(repeat):
+        results, output = run_stages(make_stages())
+        for name, metrics in results.items():
+            timings.setdefault(name, []).append(metrics['seconds'])
+
+    tracemalloc.start()
+    try:
+        traced, _ = run_stages(make_stages(), trace_memory=True)
+    finally:
+        tracemalloc.stop()
+
+    stages = {}
+    for name, samples in timings.items():
+        stages[name] = {
+            'min_seconds': round(min(samples), 6),
+            'median_seconds': round(statistics.median(samples), 6),
+            'peak_bytes': traced[name]['peak_bytes'],
+        }
+    return {
+        'stages': stages,
+        'total_seconds': round(sum(stage['min_seconds'] for stage in stages.values()), 6),
+        'output_bytes': len(output.encode('utf-8')) if output else 0,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    results = []
+    for rooms in args.rooms:
+        projeto = generate_project(rooms, args.circuits, args.keypads, args.scenes, args.rooms_per_area)
+        scale = {
+            'rooms': rooms,
+            'circuits_per_room': args.circuits,
+            'keypads_per_room': args.keypads,
+            'scenes_per_room': args.scenes,
+            'modules': len(projeto['modulos']),
+        }
+
+        if args.converter in ('db', 'both'):
+            with app.app_context():
+                db.drop_all()
+                db.create_all()
+                seed_project(db.session, projeto)
+                check_snapshot_queries(db.session, projeto['id'])
+                result = benchmark(lambda: _db_stages(db.session, projeto['id']), args.repeat)
+                db.session.remove()
+            results.append(dict(scale, converter='roehn_converter', **result))
+            _print_result(results[-1])
+
+        if args.converter in ('standalone', 'both'):
+            project_json = to_standalone_input(projeto)
+            result = benchmark(lambda: _standalone_stages(json.loads(json.dumps(project_json))), args.repeat)
+            results.append(dict(scale, converter='standalone_roehn_converter', **result))
+            _print_result(results[-1])
+
+    return {
+        'revision': _git_revision(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+
+def _print_result(result):
+    print(f"{result['converter']} | {result['rooms']} ambientes | {result['modules']} módulos | "
+          f"{result['output_bytes'] / 1024:.0f} KiB", file=sys.stderr)
+    for name, stage in result['stages'].items():
+        print(f"  {name:<28} {stage['min_seconds'] * 1000:10.1f} ms (mediana {stage['median_seconds'] * 1000:.1f} ms)"
+              f"  pico {stage['peak_bytes'] / (1024 * 1024):8.2f} MiB", file=sys.stderr)
+
+
+def compare(previous, current):
+    """Imprime a variação de tempo/memória por etapa em relação a um resultado anterior."""
+    key = lambda result: (result['converter'], result['rooms'], result['circuits_per_room'],
+                          result['keypads_per_room'], result['scenes_per_room'])
+    old_results = {key(result): result for result in previous.get('results', [])}
+    print(f"\nComparação com {previous.get('revision') or 'resultado anterior'}:")
+    for result in current['results']:
+        old = old_results.get(key(result))
+        if not old:
+            continue
+        print(f"{result['converter']} | {result['rooms']} ambientes")
+        for name, stage in result['stages'].items():
+            old_stage = old['stages'].get(name)
+            if not old_stage or not old_stage['min_seconds']:
+                continue
+            time_ratio = stage['min_seconds'] / old_stage['min_seconds']
+            memory_ratio = stage['peak_bytes'] / old_stage['peak_bytes'] if old_stage['peak_bytes'] else 0
+            print(f"  {name:<28} tempo x{time_ratio:.2f}  memória x{memory_ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos conversores ROEHN com projetos sintéticos.')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[10, 100], help='Quantidades de ambientes a medir.')
+    parser.add_argument('--circuits', type=int, default=6, help='Circuitos por ambiente.')
+    parser.add_argument('--keypads', type=int, default=1, help='Keypads por ambiente.')
+    parser.add_argument('--scenes', type=int, default=2, help='Cenas por ambiente.')
+    parser.add_argument('--rooms-per-area', type=int, default=10, help='Ambientes por área (uma área = um quadro e um ADP-M8).')
+    parser.add_argument('--repeat', type=int, default=3, help='Rodadas cronometradas por escala.')
+    parser.add_argument('--converter', choices=['db', 'standalone', 'both'], default='both')
+    parser.add_argument('-o', '--output', help='Arquivo JSON de saída (padrão: stdout).')
+    parser.add_argument('--compare', help='Resultado JSON anterior para comparar.')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}")
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
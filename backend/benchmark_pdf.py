@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark do relatório PDF (/exportar-pdf) com projetos sintéticos.
+
+Duas comparações:
+
+* ``canvas``: o canvas anterior, que guardava o estado de cada página até o
+  ``save()`` para escrever "Página X de Y", contra ``pdf_report.NumberedCanvas``
+  (total de páginas em um form XObject);
+* ``tabelas``: todas as células das tabelas como Paragraph (como antes) contra
+  texto simples nas células que cabem em uma linha.
+
+Para cada variante mede, com ``tracemalloc``, o pico de memória e a memória em
+uso quando o ``save()`` do canvas começa (onde o estado guardado das páginas
+aparece), além do tempo de montagem e do tamanho do PDF:
+
+    python benchmark_pdf.py --rooms 500
+    python benchmark_pdf.py --rooms 334 --suite tabelas --repeat 3
+    python benchmark_pdf.py --rooms 100 500 -o bench_pdf.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Adiciona o diretório atual ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from database import db, Projeto, Area, Ambiente, Circuito, Modulo, Vinculacao
+import pdf_report
+from pdf_report import NumberedCanvas, build_project_report
+from sak_allocation import load_renumbering_rows, plan_renumbering
+from benchmark_converter import generate_project, seed_project, _git_revision
+
+
+class LegacyNumberedCanvas(canvas.Canvas):
+    """Canvas anterior (estado de todas as páginas guardado até o fim), só para comparação."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_page_states = []
+
+    def showPage(self):
+        self._saved_page_states.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        total_pages = len(self._saved_page_states)
+        for state in self._saved_page_states:
+            self.__dict__.update(state)
+            self.setFont("Helvetica", 8)
+            self.drawCentredString(A4[0] / 2, 12 * mm, f"Página {self._pageNumber} de {total_pages}")
+            super().showPage()
+        super().save()
+
+
+@contextlib.contextmanager
+def paragraph_cells():
+    """Todas as células das tabelas como Paragraph, como o relatório fazia antes."""
+    fits = pdf_report._fits
+    pdf_report._fits = lambda *args: False
+    try:
+        yield
+    finally:
+        pdf_report._fits = fits
+
+
+# suíte -> variante -> (canvas, contexto de montagem)
+SUITES = {
+    'canvas': {
+        'estado por página (anterior)': (LegacyNumberedCanvas, contextlib.nullcontext),
+        'form XObject': (NumberedCanvas, contextlib.nullcontext),
+    },
+    'tabelas': {
+        'Paragraph por célula (anterior)': (NumberedCanvas, paragraph_cells),
+        'texto simples': (NumberedCanvas, contextlib.nullcontext),
+    },
+}
+
+
+def assign_saks(session, projeto_id):
+    """O projeto sintético vem sem SAKs; numera como /api/circuitos/renumerar-saks."""
+    alteracoes, _ = plan_renumbering(load_renumbering_rows(session, projeto_id))
+    session.execute(update(Circuito), [
+        {"id": a["id"], "sak": a["sak_novo"], "quantidade_saks": a["quantidade_nova"]} for a in alteracoes
+    ])
+    session.commit()
+
+
+def load_report_data(session, projeto_id):
+    """Mesma carga da rota /exportar-pdf."""
+    projeto = session.get(Projeto, projeto_id, options=[
+        joinedload(Projeto.areas).
+        joinedload(Area.ambientes).
+        joinedload(Ambiente.circuitos).
+        joinedload(Circuito.vinculacao).
+        joinedload(Vinculacao.modulo)
+    ])
+    modulos = session.query(Modulo).filter(Modulo.projeto_id == projeto_id).options(joinedload(Modulo.vinculacoes)).all()
+    return projeto, modulos
+
+
+def render(projeto, modulos, canvasmaker):
+    output = io.BytesIO()
+    build_project_report(output, projeto, modulos, 'benchmark', '01/01/2024 12:00',
+                         client_timestamp='2024-01-01T12:00:00Z', tz_offset='0', canvasmaker=canvasmaker)
+    return output.getvalue()
+
+
+def measure(projeto, modulos, canvasmaker, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf = render(projeto, modulos, canvasmaker)
+        samples.append(time.perf_counter() - start)
+
+    at_save = {}
+
+    class TracedCanvas(canvasmaker):
+        def save(self):
+            at_save['bytes'] = tracemalloc.get_traced_memory()[0]
+            super().save()
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        render(projeto, modulos, TracedCanvas)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'pages': int(re.search(rb'/Count (\d+)', pdf).group(1)),
+        'peak_bytes': peak - baseline,
+        'at_save_bytes': at_save['bytes'] - baseline,
+        'min_seconds': round(min(samples), 6),
+        'median_seconds': round(statistics.median(samples), 6),
+        'pdf_bytes': len(pdf),
+    }
+
+
+def run_benchmarks(args):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    results = []
+    for rooms in args.rooms:
+        projeto_data = generate_project(rooms, args.circuits, 0, 0, args.rooms_per_area)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seed_project(db.session, projeto_data)
+            assign_saks(db.session, projeto_data['id'])
+            projeto, modulos = load_report_data(db.session, projeto_data['id'])
+            for suite in args.suite:
+                for name, (canvasmaker, context) in SUITES[suite].items():
+                    with context():
+                        result = dict(rooms=rooms, circuits_per_room=args.circuits, suite=suite, variant=name,
+                                      **measure(projeto, modulos, canvasmaker, args.repeat))
+                    results.append(result)
+                    print(f"{rooms:>5} ambientes | {name:<31} {result['pages']:5d} páginas "
+                          f"pico {result['peak_bytes'] / 1024 / 1024:7.1f} MiB "
+                          f"no save {result['at_save_bytes'] / 1024 / 1024:7.1f} MiB "
+                          f"{result['min_seconds'] * 1000:9.1f} ms (mediana {result['median_seconds'] * 1000:.1f} ms) "
+                          f"{result['pdf_bytes'] / 1024:8.0f} KiB", file=sys.stderr)
+            db.session.remove()
+
+    return {
+        'revision': _git_revision(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do relatório PDF com projetos sintéticos.')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[500], help='Quantidades de ambientes a medir.')
+    parser.add_argument('--circuits', type=int, default=6, help='Circuitos por ambiente.')
+    parser.add_argument('--rooms-per-area', type=int, default=10, help='Ambientes por área.')
+    parser.add_argument('--suite', nargs='+', choices=list(SUITES), default=list(SUITES),
+                        help='Comparações a rodar (padrão: todas).')
+    parser.add_argument('--repeat', type=int, default=1, help='Rodadas cronometradas por variante.')
+    parser.add_argument('-o', '--output', help='Arquivo JSON de saída (padrão: stdout).')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}")
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Benchmark da montagem de /api/projeto_tree com projetos sintéticos.
+
+Compara a carga anterior (joinedload encadeado de cenas, circuitos, keypads e
+quadros a partir de ``Area.ambientes``, mais os lazy loads da serialização)
+com ``project_tree.build_project_tree`` (uma consulta por tabela) e com o
+formato normalizado. Para cada variante mede consultas, linhas devolvidas pelo
+SQLite (somadas por consulta) e o tempo total de carga + serialização:
+
+    python benchmark_tree.py --rooms 500
+    python benchmark_tree.py --rooms 100 500 --keypads 2 -o bench_tree.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Adiciona o diretório atual ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from database import db, Area, Ambiente, QuadroEletrico, Circuito, Modulo, Vinculacao, Keypad, KeypadButton
+from serializers import serialize_keypad, serialize_cena
+from project_tree import build_project_tree, build_project_tree_normalized
+from benchmark_converter import generate_project, seed_project, _git_revision
+
+
+def legacy_project_tree(session, projeto_id):
+    """Montagem anterior de /api/projeto_tree, mantida só como referência de comparação."""
+    areas = (
+        session.query(Area)
+        .options(
+            joinedload(Area.ambientes).joinedload(Ambiente.cenas),
+            joinedload(Area.ambientes)
+            .joinedload(Ambiente.circuitos)
+            .joinedload(Circuito.vinculacao)
+            .joinedload(Vinculacao.modulo),
+            joinedload(Area.ambientes)
+            .joinedload(Ambiente.keypads)
+            .joinedload(Keypad.buttons)
+            .joinedload(KeypadButton.circuito),
+            joinedload(Area.ambientes)
+            .joinedload(Ambiente.quadros_eletricos)
+            .joinedload(QuadroEletrico.modulos),
+        )
+        .filter(Area.projeto_id == projeto_id)
+        .all()
+    )
+
+    out_areas = []
+    for a in areas:
+        ambs = []
+        for amb in a.ambientes:
+            circs = []
+            for c in amb.circuitos:
+                vinc = getattr(c, "vinculacao", None)
+                circs.append({
+                    "id": c.id,
+                    "tipo": c.tipo,
+                    "identificador": c.identificador,
+                    "nome": c.nome,
+                    "vinculacao": {
+                        "modulo_nome": getattr(vinc.modulo, "nome", None) if vinc and vinc.modulo else None,
+                        "canal": getattr(vinc, "canal", None),
+                    } if vinc else None,
+                })
+            ambs.append({
+                "id": amb.id,
+                "nome": amb.nome,
+                "circuitos": circs,
+                "keypads": [serialize_keypad(k) for k in sorted(amb.keypads, key=lambda kp: (kp.nome or "").lower())],
+                "quadros_eletricos": [
+                    {
+                        "id": q.id,
+                        "nome": q.nome,
+                        "modulos": [
+                            {"id": m.id, "nome": m.nome, "tipo": m.tipo, "quantidade_canais": m.quantidade_canais}
+                            for m in q.modulos
+                        ],
+                    }
+                    for q in amb.quadros_eletricos
+                ],
+                "cenas": [serialize_cena(c) for c in amb.cenas],
+            })
+        out_areas.append({"id": a.id, "nome": a.nome, "ambientes": ambs})
+
+    modulos = session.query(Modulo).filter_by(projeto_id=projeto_id).all()
+    return out_areas, [{"id": m.id, "nome": m.nome, "tipo": m.tipo} for m in modulos]
+
+
+VARIANTS = {
+    'joinedload (anterior)': legacy_project_tree,
+    'snapshot': build_project_tree,
+    'snapshot normalizado': build_project_tree_normalized,
+}
+
+
+class StatementRecorder:
+    """Guarda os comandos SQL (e parâmetros) executados, para contar as linhas depois."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        return False
+
+    def count_rows(self):
+        with self.engine.connect() as conn:
+            return sum(len(conn.exec_driver_sql(statement, parameters).fetchall())
+                       for statement, parameters in self.statements)
+
+
+def measure(session, build, projeto_id, repeat):
+    samples = []
+    for _ in range(repeat):
+        session.expunge_all()
+        start = time.perf_counter()
+        payload = json.dumps(build(session, projeto_id))
+        samples.append(time.perf_counter() - start)
+
+    session.expunge_all()
+    with StatementRecorder(db.engine) as recorder:
+        build(session, projeto_id)
+    return {
+        'queries': len(recorder.statements),
+        'rows': recorder.count_rows(),
+        'min_seconds': round(min(samples), 6),
+        'median_seconds': round(statistics.median(samples), 6),
+        'payload_bytes': len(payload.encode('utf-8')),
+    }
+
+
+def run_benchmarks(args):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    results = []
+    for rooms in args.rooms:
+        projeto = generate_project(rooms, args.circuits, args.keypads, args.scenes, args.rooms_per_area)
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            seed_project(db.session, projeto)
+            for name, build in VARIANTS.items():
+                result = dict(rooms=rooms, circuits_per_room=args.circuits, keypads_per_room=args.keypads,
+                              scenes_per_room=args.scenes, variant=name,
+                              **measure(db.session, build, projeto['id'], args.repeat))
+                results.append(result)
+                print(f"{rooms:>5} ambientes | {name:<22} {result['queries']:5d} consultas {result['rows']:8d} linhas "
+                      f"{result['min_seconds'] * 1000:9.1f} ms (mediana {result['median_seconds'] * 1000:.1f} ms) "
+                      f"{result['payload_bytes'] / 1024:8.0f} KiB", file=sys.stderr)
+            db.session.remove()
+
+    return {
+        'revision': _git_revision(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de /api/projeto_tree com projetos sintéticos.')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[500], help='Quantidades de ambientes a medir.')
+    parser.add_argument('--circuits', type=int, default=6, help='Circuitos por ambiente.')
+    parser.add_argument('--keypads', type=int, default=1, help='Keypads por ambiente.')
+    parser.add_argument('--scenes', type=int, default=2, help='Cenas por ambiente.')
+    parser.add_argument('--rooms-per-area', type=int, default=10, help='Ambientes por área.')
+    parser.add_argument('--repeat', type=int, default=3, help='Rodadas cronometradas por variante.')
+    parser.add_argument('-o', '--output', help='Arquivo JSON de saída (padrão: stdout).')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.output}")
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
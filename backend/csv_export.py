@@ -0,0 +1,79 @@
+# csv_export.py
+"""CSV dos circuitos vinculados do projeto (/exportar-csv).
+
+As linhas vêm de um único SELECT (circuito ⋈ vinculação ⋈ módulo ⋈ quadro ⋈
+ambiente ⋈ área) lido em lotes, e o CSV sai em blocos à medida que os lotes
+chegam: nem a consulta nem a memória crescem com o número de circuitos.
+"""
+import csv
+import io
+
+from sqlalchemy import select
+
+from database import Area, Ambiente, Circuito, Modulo, QuadroEletrico, Vinculacao
+
+CSV_HEADER = ['Circuito', 'Tipo', 'Nome', 'Area', 'Ambiente', 'SAKs', 'Canal', 'Modulo', 'Quadro Elétrico', 'id Modulo']
+
+# Linhas lidas do banco (e escritas) por bloco
+CSV_BATCH_SIZE = 500
+
+
+def circuitos_csv_select(projeto_id):
+    return (
+        select(
+            Circuito.identificador, Circuito.tipo, Circuito.nome, Circuito.sak, Circuito.quantidade_saks,
+            Area.nome.label('area_nome'), Ambiente.nome.label('ambiente_nome'), Vinculacao.canal,
+            Modulo.id.label('modulo_id'), Modulo.nome.label('modulo_nome'),
+            QuadroEletrico.nome.label('quadro_nome'),
+        )
+        .join(Vinculacao, Vinculacao.circuito_id == Circuito.id)
+        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+        .join(Area, Ambiente.area_id == Area.id)
+        .outerjoin(Modulo, Vinculacao.modulo_id == Modulo.id)
+        .outerjoin(QuadroEletrico, Modulo.quadro_eletrico_id == QuadroEletrico.id)
+        .where(Area.projeto_id == projeto_id)
+        .order_by(Circuito.id)
+    )
+
+
+def sak_label(tipo, sak, quantidade_saks):
+    # Para circuitos HVAC, mostrar vazio no campo SAK
+    if tipo == 'hvac':
+        return ''
+    if (quantidade_saks or 0) > 1:
+        return f"{sak}-{sak + quantidade_saks - 1}"
+    return str(sak)
+
+
+def iter_circuitos_csv(session, projeto_id, batch_size=CSV_BATCH_SIZE):
+    """Gera o CSV em blocos de bytes (UTF-8), um por lote de linhas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(CSV_HEADER)
+    yield flush()
+
+    result = session.execute(circuitos_csv_select(projeto_id), execution_options={'yield_per': batch_size})
+    for rows in result.partitions():
+        writer.writerows(
+            [
+                r.identificador,
+                r.tipo,
+                r.nome,
+                r.area_nome,
+                r.ambiente_nome,
+                sak_label(r.tipo, r.sak, r.quantidade_saks),
+                r.canal,
+                r.modulo_nome if r.modulo_id is not None else "-",
+                r.quadro_nome if r.quadro_nome is not None else "-",
+                r.modulo_id if r.modulo_id is not None else "",
+            ]
+            for r in rows
+        )
+        yield flush()
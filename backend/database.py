@@ -34,6 +34,9 @@ class Projeto(db.Model):
     data_inativo = db.Column(db.DateTime, nullable=True)
     data_concluido = db.Column(db.DateTime, nullable=True)
 
+    # Incrementada a cada alteração no projeto ou em seus registros (ver project_changes.py)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     areas = db.relationship('Area', backref='projeto', lazy=True, cascade='all, delete-orphan')
     modulos = db.relationship('Modulo', backref='projeto', lazy=True, cascade='all, delete-orphan')
     keypads = db.relationship('Keypad', backref='projeto', lazy=True, cascade='all, delete-orphan')
@@ -200,3 +203,24 @@ class CustomAcao(db.Model):
     level = db.Column(db.Integer, nullable=False, default=100)
 
     __table_args__ = (db.UniqueConstraint('acao_id', 'target_guid', name='unique_custom_acao'),)
+
+
+class Job(db.Model):
+    """Tarefa em segundo plano (exportações e importações pesadas); ver jobs.py."""
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Sem chave estrangeira: a tarefa (e o arquivo gerado) sobrevive à exclusão do projeto
+    projeto_id = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, executando, concluido, erro
+    stage = db.Column(db.String(100), nullable=True)
+    percent = db.Column(db.Integer, nullable=False, default=0)
+    counters = db.Column(db.JSON, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    artifact_path = db.Column(db.String(500), nullable=True)
+    artifact_name = db.Column(db.String(255), nullable=True)
+    artifact_mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,288 @@
+# jobs.py
+"""Tarefas em segundo plano para exportações e importações pesadas.
+
+As rotas pesadas (/roehn/import, /exportar-pdf, /exportar-projeto,
+/api/importar-projeto, /api/importar-planner) podem devolver o ID de uma
+tarefa em vez de executar tudo dentro da requisição. As tarefas rodam em um
+pool de threads limitado, cada uma com o seu próprio app context (e portanto a
+sua própria sessão do banco), e ficam registradas na tabela ``job``.
+
+A tabela é gravada nas transições (pendente → executando → concluido/erro).
+O progresso durante a execução (etapa, percentual, contadores) fica em
+memória: uma importação mantém a escrita do SQLite travada até o commit, e
+gravar o progresso por outra conexão esperaria por ela.
+
+A função da tarefa recebe um ``JobProgress`` e devolve um ``Artifact`` (arquivo
+para download, gravado em ``<diretório>/<id>``) ou um dict (resultado JSON).
+Tarefas terminadas há mais de ``retention`` segundos são apagadas, com os
+arquivos, a cada nova tarefa e na listagem.
+
+Se a transição final não puder ser gravada (ex.: banco travado por outra
+importação mesmo após as novas tentativas), a tarefa fica marcada como erro em
+memória, e ``get`` a informa assim, em vez de mostrar "executando" para sempre.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Union
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from database import db, Job
+
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDO = 'concluido'
+ERRO = 'erro'
+
+# Tentativas de gravar uma transição na tabela (cada uma já espera o busy
+# timeout do SQLite) e pausa entre elas, em segundos
+STATUS_WRITE_ATTEMPTS = 3
+STATUS_WRITE_PAUSE = 1.0
+
+
+class JobQueueFull(Exception):
+    """Há tarefas demais aguardando na fila."""
+
+
+@dataclass
+class Artifact:
+    """Arquivo gerado por uma tarefa: ``content`` em bytes ou em blocos de bytes."""
+    content: Union[bytes, Iterable[bytes]]
+    download_name: str
+    mimetype: str
+
+
+class JobProgress:
+    """Progresso de uma tarefa em execução; sem runner, não faz nada (modo síncrono)."""
+
+    def __init__(self, runner=None, job_id=None):
+        self._runner = runner
+        self._job_id = job_id
+
+    def update(self, stage=None, percent=None, **counters):
+        if self._runner is not None:
+            self._runner._set_progress(self._job_id, stage, percent, counters)
+
+
+NULL_PROGRESS = JobProgress()
+
+
+class JobRunner:
+    def __init__(self, app, directory, max_workers=2, max_pending=20, retention=3600):
+        self.app = app
+        self.directory = directory
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._live = {}  # job_id -> {"status", "stage", "percent", "counters"}
+        os.makedirs(directory, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # API usada pelas rotas
+    # ------------------------------------------------------------------
+    def submit(self, kind, fn, user_id, projeto_id=None):
+        """Registra a tarefa e a coloca na fila; devolve o ID."""
+        self.purge()
+        with self._lock:
+            if sum(1 for s in self._live.values() if s['status'] == PENDENTE) >= self.max_pending:
+                raise JobQueueFull()
+            job_id = uuid.uuid4().hex
+            self._live[job_id] = {'status': PENDENTE, 'stage': None, 'percent': 0, 'counters': {}}
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(Job).values(
+                    id=job_id, kind=kind, user_id=user_id, projeto_id=projeto_id,
+                    status=PENDENTE, percent=0, counters={}, created_at=datetime.utcnow(),
+                ))
+        except BaseException:
+            with self._lock:
+                self._live.pop(job_id, None)
+            raise
+        self._executor.submit(self._run, job_id, fn)
+        return job_id
+
+    def get(self, job_id):
+        """Estado da tarefa como dict (tabela + progresso em memória), ou ``None``."""
+        row = db.session.execute(select(Job).where(Job.id == job_id)).scalar_one_or_none()
+        return self._as_dict(row) if row is not None else None
+
+    def list(self, user_id, limit=50):
+        self.purge()
+        rows = db.session.execute(
+            select(Job).where(Job.user_id == user_id).order_by(Job.created_at.desc()).limit(limit)
+        ).scalars()
+        return [self._as_dict(row) for row in rows]
+
+    def purge(self):
+        """Apaga as tarefas terminadas há mais de ``retention`` segundos e os seus arquivos."""
+        limite = datetime.utcnow() - timedelta(seconds=self.retention)
+        with self._lock:
+            for job_id in [k for k, v in self._live.items() if v.get('finished_at') and v['finished_at'] < limite]:
+                del self._live[job_id]
+        with db.engine.begin() as conn:
+            stale = conn.execute(
+                select(Job.id, Job.artifact_path)
+                .where(Job.status.in_([CONCLUIDO, ERRO]), Job.finished_at < limite)
+            ).all()
+            if stale:
+                conn.execute(delete(Job).where(Job.id.in_([row.id for row in stale])))
+        for row in stale:
+            self._remove(row.artifact_path)
+        return len(stale)
+
+    def recover(self):
+        """Marca como erro as tarefas que ficaram pendentes/executando (servidor reiniciado)."""
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(Job)
+                .where(Job.status.in_([PENDENTE, EXECUTANDO]))
+                .values(status=ERRO, error='Tarefa interrompida: o servidor foi reiniciado.',
+                        finished_at=datetime.utcnow())
+            )
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+    def _run(self, job_id, fn):
+        with self.app.app_context():
+            # Mesmo sem conseguir gravar o início, a tarefa roda: o que importa é a transição final
+            self._set_status(job_id, EXECUTANDO, started_at=datetime.utcnow())
+            final = None
+            try:
+                result = fn(JobProgress(self, job_id))
+                values = {'result': None, 'percent': 100}
+                if isinstance(result, Artifact):
+                    values.update(self._store(job_id, result))
+                else:
+                    values['result'] = result
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Erro na tarefa {job_id}: {e}\n{traceback.format_exc()}")
+                final = (ERRO, {'error': str(e) or e.__class__.__name__})
+            else:
+                final = (CONCLUIDO, values)
+            finally:
+                status, values = final or (ERRO, {'error': 'Tarefa interrompida.'})
+                if not self._set_status(job_id, status, **values) and status == CONCLUIDO:
+                    # O resultado não foi registrado: tenta ao menos marcar a tarefa como erro
+                    self._set_status(job_id, ERRO, error='Não foi possível registrar o resultado da tarefa.')
+                with self._lock:
+                    live = self._live.get(job_id)
+                    if live is not None and not live.get('error'):
+                        self._live.pop(job_id, None)
+
+    def _store(self, job_id, artifact):
+        path = os.path.join(self.directory, job_id)
+        content = artifact.content
+        if isinstance(content, (bytes, bytearray)):
+            content = [content]
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in content:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        return {
+            'artifact_path': path,
+            'artifact_name': artifact.download_name,
+            'artifact_mimetype': artifact.mimetype,
+        }
+
+    def _set_status(self, job_id, status, **values):
+        """Grava a transição, com novas tentativas; devolve False se não conseguir.
+
+        Uma transição final que não foi gravada fica registrada em ``_live``
+        como erro, para ``get`` continuar informando o estado certo.
+        """
+        with self._lock:
+            live = self._live.get(job_id)
+            if live is not None:
+                live['status'] = status
+                values.setdefault('stage', live['stage'])
+                values.setdefault('counters', dict(live['counters']))
+                if 'percent' not in values:
+                    values['percent'] = live['percent']
+        if status in (CONCLUIDO, ERRO):
+            values['finished_at'] = datetime.utcnow()
+        for attempt in range(1, STATUS_WRITE_ATTEMPTS + 1):
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(update(Job).where(Job.id == job_id).values(status=status, **values))
+                return True
+            except OperationalError as e:
+                self.app.logger.warning(
+                    f"Tarefa {job_id}: falha ao gravar o status '{status}' "
+                    f"(tentativa {attempt}/{STATUS_WRITE_ATTEMPTS}): {e}"
+                )
+                if attempt < STATUS_WRITE_ATTEMPTS:
+                    time.sleep(STATUS_WRITE_PAUSE)
+
+        self.app.logger.error(f"Tarefa {job_id}: status '{status}' não gravado")
+        if status in (CONCLUIDO, ERRO):
+            with self._lock:
+                live = self._live.setdefault(job_id, {'stage': None, 'percent': 0, 'counters': {}})
+                live.update(
+                    status=ERRO,
+                    error=values.get('error') if status == ERRO else 'Não foi possível registrar o resultado da tarefa.',
+                    finished_at=values['finished_at'],
+                )
+        return False
+
+    def _set_progress(self, job_id, stage, percent, counters):
+        with self._lock:
+            live = self._live.get(job_id)
+            if live is None:
+                return
+            if stage is not None:
+                live['stage'] = stage
+            if percent is not None:
+                live['percent'] = max(0, min(100, int(percent)))
+            live['counters'].update(counters)
+
+    def _as_dict(self, job):
+        data = {
+            'id': job.id,
+            'kind': job.kind,
+            'user_id': job.user_id,
+            'projeto_id': job.projeto_id,
+            'status': job.status,
+            'stage': job.stage,
+            'percent': job.percent,
+            'counters': job.counters or {},
+            'result': job.result,
+            'error': job.error,
+            'download': bool(job.artifact_path),
+            'download_name': job.artifact_name,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }
+        with self._lock:
+            live = self._live.get(job.id)
+            if live is not None and live.get('error'):
+                # Transição final não gravada na tabela
+                data.update(status=ERRO, error=live['error'], download=False,
+                            finished_at=live['finished_at'].isoformat())
+            elif live is not None and job.status in (PENDENTE, EXECUTANDO):
+                data.update(stage=live['stage'], percent=live['percent'], counters=dict(live['counters']))
+        return data
+
+    @staticmethod
+    def _remove(path):
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            pass
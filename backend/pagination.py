@@ -0,0 +1,150 @@
+# pagination.py
+"""Paginação por cursor (keyset) e filtros das listagens da API.
+
+Parâmetros aceitos em ``request.args``:
+
+- ``limit``: tamanho da página (até MAX_LIMIT). Sem ``limit`` a listagem
+  devolve todas as linhas, como antes;
+- ``cursor``: valor de ``next_cursor`` da página anterior;
+- filtros: ``ambiente_id``, ``area_id``, ``tipo``, ``vinculado`` e ``q``
+  (texto). Cada rota informa quais aceita e como viram condições SQL;
+- ``fields`` (ou ``include``): campos a devolver, separados por vírgula. As
+  rotas usam a seleção para carregar só as colunas e relacionamentos pedidos.
+
+O cursor guarda os valores das colunas de ordenação da última linha entregue;
+a página seguinte começa em ``(colunas) > (valores)``, então o custo não cresce
+com a posição da página como em OFFSET.
+"""
+import base64
+import binascii
+import json
+
+from sqlalchemy import func, literal, or_, select, tuple_
+
+MAX_LIMIT = 1000
+
+_TRUE = ("1", "true", "on", "sim")
+_FALSE = ("0", "false", "off", "nao", "não")
+
+
+class ListArgsError(ValueError):
+    """Parâmetro de listagem inválido; a mensagem vai para o cliente."""
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ListArgsError("Cursor inválido.")
+    if not isinstance(values, list) or len(values) != size:
+        raise ListArgsError("Cursor inválido.")
+    return values
+
+
+def _int_arg(args, name):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ListArgsError(f"'{name}' deve ser um número inteiro.")
+
+
+def parse_list_args(args, filters):
+    """Lê ``limit``, ``cursor`` e os filtros suportados (nomes em ``filters``).
+
+    Devolve ``(limit, cursor, valores)``; filtros não suportados pela rota são
+    rejeitados para não devolver uma lista "filtrada" que na verdade não foi.
+    """
+    limit = _int_arg(args, "limit")
+    if limit is not None and not 1 <= limit <= MAX_LIMIT:
+        raise ListArgsError(f"'limit' deve estar entre 1 e {MAX_LIMIT}.")
+    cursor = args.get("cursor") or None
+    if cursor and limit is None:
+        raise ListArgsError("'cursor' exige 'limit'.")
+
+    values = {}
+    for name in ("ambiente_id", "area_id", "tipo", "vinculado", "q"):
+        raw = args.get(name)
+        if raw in (None, ""):
+            continue
+        if name not in filters:
+            raise ListArgsError(f"Filtro '{name}' não suportado nesta listagem.")
+        if name in ("ambiente_id", "area_id"):
+            values[name] = _int_arg(args, name)
+        elif name == "vinculado":
+            if raw.lower() in _TRUE:
+                values[name] = True
+            elif raw.lower() in _FALSE:
+                values[name] = False
+            else:
+                raise ListArgsError("'vinculado' deve ser true ou false.")
+        else:
+            values[name] = raw.strip()
+    return limit, cursor, values
+
+
+def parse_fields(args, available):
+    """Campos pedidos em ``fields``/``include`` (``None`` = todos). ``id`` sempre vai."""
+    raw = ",".join(v for v in args.getlist("fields") + args.getlist("include") if v)
+    if not raw:
+        return None
+    fields = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = sorted(fields - set(available))
+    if unknown:
+        raise ListArgsError(f"Campos não disponíveis: {', '.join(unknown)}.")
+    return fields | {"id"}
+
+
+def load_only_columns(model, fields, *always):
+    """Colunas de ``model`` correspondentes aos campos pedidos, para ``load_only``."""
+    columns = model.__table__.columns
+    return [getattr(model, name) for name in sorted(fields) if name in columns] + list(always)
+
+
+def apply_filters(stmt, filters, values):
+    """Aplica ``filters[nome](valor)`` (uma condição SQL) para cada filtro informado."""
+    for name, value in values.items():
+        stmt = stmt.where(filters[name](value))
+    return stmt
+
+
+def text_match(*columns):
+    """Filtro ``q``: busca sem diferenciar maiúsculas em qualquer uma das colunas."""
+    def condition(value):
+        pattern = f"%{value}%"
+        return or_(*(column.ilike(pattern) for column in columns))
+    return condition
+
+
+def paginate(session, stmt, order_by, key_of, limit, cursor):
+    """Executa ``stmt`` (um select ORM) ordenado por ``order_by`` e paginado.
+
+    ``key_of(obj)`` devolve os valores de ``order_by`` de um objeto, usados no
+    próximo cursor. Com ``limit`` ``None`` devolve tudo. Retorna
+    ``(objetos, total, next_cursor)``; ``total`` vem de um único COUNT sobre a
+    consulta filtrada (sem o cursor) e só é calculado quando há paginação.
+    """
+    if limit is None:
+        return session.execute(stmt.order_by(*order_by)).unique().scalars().all(), None, None
+
+    total = session.execute(
+        select(func.count()).select_from(stmt.order_by(None).subquery())
+    ).scalar()
+    if cursor:
+        values = decode_cursor(cursor, len(order_by))
+        stmt = stmt.where(tuple_(*order_by) > tuple_(*(literal(v) for v in values)))
+
+    items = session.execute(stmt.order_by(*order_by).limit(limit + 1)).unique().scalars().all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(key_of(items[-1]))
+    return items, total, next_cursor
@@ -0,0 +1,391 @@
+# pdf_report.py
+"""Relatório PDF do projeto (/exportar-pdf).
+
+``build_project_report`` monta o relatório a partir do projeto já carregado
+(áreas → ambientes → circuitos → vinculação → módulo) e dos módulos com as
+vinculações; a rota cuida de acesso, cache e download.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch, mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
+
+PAGE_NUMBER_FONT = ("Helvetica", 8)
+
+
+class NumberedCanvas(canvas.Canvas):
+    """Canvas que escreve "Página X de Y" no rodapé de cada página.
+
+    O total de páginas só é conhecido no fim do documento. Cada página escreve
+    "Página X de " e referencia um form XObject com o total, que é definido uma
+    única vez em ``save()``; assim nenhuma página precisa ser guardada até o
+    fim (antes, o estado inteiro de cada página, com o conteúdo, ficava em
+    memória até o ``save()``).
+    """
+
+    TOTAL_PAGES_FORM = "total_paginas"
+
+    def showPage(self):
+        self.draw_page_number()
+        super().showPage()
+
+    def save(self):
+        if self._code:
+            self.showPage()
+        total_pages = self._pageNumber - 1
+        self.beginForm(self.TOTAL_PAGES_FORM)
+        self.setFont(*PAGE_NUMBER_FONT)
+        self.drawString(0, 0, str(total_pages))
+        self.endForm()
+        super().save()
+
+    def draw_page_number(self):
+        prefix = f"Página {self._pageNumber} de "
+        # O total ainda não existe: para centralizar, supõe-se que tenha tantos
+        # dígitos quanto o número da página (os dígitos da Helvetica têm a mesma largura)
+        width = stringWidth(prefix + str(self._pageNumber), *PAGE_NUMBER_FONT)
+        x = A4[0] / 2 - width / 2
+        y = 12 * mm
+        self.saveState()
+        self.setFont(*PAGE_NUMBER_FONT)
+        self.drawString(x, y, prefix)
+        self.translate(x + stringWidth(prefix, *PAGE_NUMBER_FONT), y)
+        self.doForm(self.TOTAL_PAGES_FORM)
+        self.restoreState()
+
+
+# ---------------------------------------------------------------------------
+# Estilos, logo e tabelas do relatório
+#
+# Estilos e o logo decodificado são montados uma vez por processo. Células de
+# tabela que cabem em uma linha e não têm marcação vão como texto simples (a
+# tabela desenha direto, sem o parser e a quebra de linha do Paragraph), com a
+# mesma fonte, tamanho e entrelinha dos estilos TableHeader/TableBody.
+# ---------------------------------------------------------------------------
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "images", "zafirologo.png")
+
+HEADER_BACKGROUND = colors.HexColor("#2c3e50")
+GRID_COLOR = colors.HexColor("#4d4f52")
+ZEBRA_BACKGROUNDS = [colors.white, colors.HexColor("#f1f3f5")]
+TIPO_BACKGROUNDS = {
+    "luz": colors.HexColor("#fff3cd"),
+    "persiana": colors.HexColor("#d1ecf1"),
+    "hvac": colors.HexColor("#d4edda"),
+}
+
+CIRCUITO_HEADER = ["Circuito", "Nome", "Tipo", "SAKs", "Módulo", "Canal", "Verificado"]
+CIRCUITO_COL_WIDTHS = [0.7*inch, 1.5*inch, 0.8*inch, 0.6*inch, 1.2*inch, 0.6*inch, 0.8*inch]
+CANAL_HEADER = ["Canal", "Circuito", "Nome", "A. Registrada", "A. Medida"]
+CANAL_COL_WIDTHS = [0.6*inch, 1.0*inch, 2.0*inch, 1.2*inch, 1.2*inch]
+
+# Texto simples nas células: corpo como TableBody (Helvetica 8), cabeçalho como
+# TableHeader (Helvetica-Bold 9); os dois com a entrelinha de 12 do estilo Normal
+_PLAIN_CELL_STYLE = [
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('LEADING', (0, 0), (-1, -1), 12),
+]
+
+CIRCUITO_TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_BACKGROUND),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'), # Vertical alignment
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), ZEBRA_BACKGROUNDS),
+] + _PLAIN_CELL_STYLE
+
+CANAL_TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_BACKGROUND),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), ZEBRA_BACKGROUNDS),
+] + _PLAIN_CELL_STYLE
+
+# Espaço útil de uma célula: largura menos o padding padrão (6 de cada lado)
+_CELL_PADDING = 12
+_MARKUP = re.compile(r"[<>&]")
+
+
+@lru_cache(maxsize=None)
+def report_styles():
+    """Folha de estilos do relatório (montada uma vez; só leitura depois)."""
+    styles = getSampleStyleSheet()
+    # Base Styles
+    styles.add(ParagraphStyle(name='RoehnTitle', parent=styles['Heading1'], fontSize=16, spaceAfter=30, alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='RoehnSubtitle', parent=styles['Heading2'], fontSize=12, spaceAfter=12, spaceBefore=12))
+    styles.add(ParagraphStyle(name='RoehnCenter', parent=styles['Normal'], alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='LeftNormal', parent=styles['Normal'], alignment=TA_LEFT))
+
+    # Styles for tables with word wrapping
+    styles.add(ParagraphStyle(name='TableHeader', parent=styles['Normal'], alignment=TA_CENTER, fontSize=9, textColor=colors.whitesmoke, fontName='Helvetica-Bold'))
+    styles.add(ParagraphStyle(name='TableBody', parent=styles['Normal'], alignment=TA_LEFT, fontSize=8))
+    styles.add(ParagraphStyle(name='TableBodyCenter', parent=styles['TableBody'], alignment=TA_CENTER))
+    return styles
+
+
+@lru_cache(maxsize=1)
+def _logo_reader():
+    return ImageReader(LOGO_PATH)
+
+
+class _CachedImage(Image):
+    """Image que reaproveita um ImageReader já decodificado."""
+
+    def __init__(self, reader, filename, **kwargs):
+        self._img = reader
+        super().__init__(filename, **kwargs)
+
+
+def _logo():
+    return _CachedImage(_logo_reader(), LOGO_PATH, width=2*inch, height=2*inch)
+
+
+@lru_cache(maxsize=8192)
+def _fits(text, font_name, font_size, width):
+    """``text`` cabe em uma linha de ``width`` sem precisar de Paragraph?"""
+    return (
+        not _MARKUP.search(text)
+        and text == " ".join(text.split())
+        and stringWidth(text, font_name, font_size) <= width
+    )
+
+
+class _TableRows:
+    """Linhas de uma tabela do relatório e os comandos de estilo por linha."""
+
+    def __init__(self, col_widths, header):
+        self.col_widths = col_widths
+        self.widths = [w - _CELL_PADDING for w in col_widths]
+        styles = report_styles()
+        self.body_style = styles['TableBodyCenter']
+        self.left_style = styles['TableBody']
+        self.rows = [[
+            h if _fits(h, 'Helvetica-Bold', 9, w) else Paragraph(h, styles['TableHeader'])
+            for h, w in zip(header, self.widths)
+        ]]
+        self.commands = []
+
+    def __len__(self):
+        return len(self.rows) - 1
+
+    def add(self, cells, background=None, left=()):
+        """Acrescenta uma linha; ``left`` são as colunas alinhadas à esquerda (TableBody)."""
+        i = len(self.rows)
+        row = []
+        for col, (text, width) in enumerate(zip(cells, self.widths)):
+            if _fits(text, 'Helvetica', 8, width):
+                row.append(text)
+                if col in left:
+                    self.commands.append(('ALIGN', (col, i), (col, i), 'LEFT'))
+            else:
+                row.append(Paragraph(text, self.left_style if col in left else self.body_style))
+        self.rows.append(row)
+        if background is not None:
+            self.commands.append(('BACKGROUND', (0, i), (-1, i), background))
+
+    def table(self, base_style):
+        table = Table(self.rows, colWidths=self.col_widths, repeatRows=1)
+        table.setStyle(TableStyle(base_style + self.commands))
+        return table
+
+
+def footer(canvas, doc):
+    canvas.saveState()
+    width, height = A4
+    margin = 30
+
+    y_line = 18 * mm
+    canvas.setLineWidth(0.5)
+    canvas.line(margin, y_line, width - margin, y_line)
+
+    timestamp_str = getattr(doc, 'client_timestamp', None)
+    tz_offset_str = getattr(doc, 'tz_offset', None)
+
+    if timestamp_str and tz_offset_str is not None:
+        try:
+            utc_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+            offset_minutes = int(tz_offset_str)
+            local_time = utc_time - timedelta(minutes=offset_minutes)
+            formatted_time = local_time.strftime('%d/%m/%Y %H:%M')
+        except (ValueError, TypeError):
+            formatted_time = datetime.now().strftime('%d/%m/%Y %H:%M')
+    else:
+        formatted_time = datetime.now().strftime('%d/%m/%Y %H:%M')
+
+    canvas.setFont("Helvetica", 8)
+    canvas.drawRightString(width - margin, 12 * mm, f"Zafiro - Luxury Technology • {doc.emitido_por} • {formatted_time}")
+
+    canvas.restoreState()
+
+
+def build_project_report(output, projeto, modulos_projeto, emitido_por, formatted_time,
+                         client_timestamp=None, tz_offset=None, canvasmaker=NumberedCanvas, on_page=None):
+    """Escreve o relatório do projeto em ``output`` (arquivo ou buffer binário).
+
+    ``on_page(numero)``, se informado, é chamado a cada página desenhada.
+    """
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=30,
+        title=f"Projeto {projeto.nome}"
+    )
+    doc.client_timestamp = client_timestamp
+    doc.tz_offset = tz_offset
+    doc.emitido_por = emitido_por
+
+    styles = report_styles()
+
+    elements = []
+    elements.append(_logo())
+    elements.append(Paragraph("RELATÓRIO DE PROJETO", styles['RoehnCenter']))
+    elements.append(Spacer(1, 0.2*inch))
+    elements.append(Paragraph(f"<b>Projeto:</b> {projeto.nome}", styles['LeftNormal']))
+    elements.append(Spacer(1, 0.1*inch))
+    elements.append(Paragraph(f"<b>Data de emissão:</b> {formatted_time}", styles['LeftNormal']))
+    elements.append(Spacer(1, 0.1*inch))
+    elements.append(Paragraph(f"<b>Emitido por:</b> {emitido_por}", styles['LeftNormal']))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Resumo por Área
+    for area in projeto.areas:
+        elements.append(Paragraph(f"ÁREA: {area.nome}", styles['Heading2']))
+        elements.append(Spacer(1, 0.1*inch))
+        
+        for ambiente in area.ambientes:
+            elements.append(Paragraph(f"Ambiente: {ambiente.nome}", styles['Heading3']))
+            
+            rows = _TableRows(CIRCUITO_COL_WIDTHS, CIRCUITO_HEADER)
+            for circuito in ambiente.circuitos:
+                modulo_nome = "Não vinculado"
+                canal = "-"
+                if circuito.vinculacao:
+                    modulo_nome = circuito.vinculacao.modulo.nome
+                    canal = str(circuito.vinculacao.canal)
+                tipo = circuito.tipo.upper()
+
+                if circuito.tipo == 'persiana':
+                    # Uma linha para subir e outra para descer
+                    rows.add([circuito.identificador, f"{circuito.nome} (sobe)", tipo, str(circuito.sak),
+                              modulo_nome, f"{canal}s", ""], background=TIPO_BACKGROUNDS['persiana'])
+                    rows.add([circuito.identificador, f"{circuito.nome} (desce)", tipo, str(circuito.sak + 1),
+                              modulo_nome, f"{canal}d", ""], background=TIPO_BACKGROUNDS['persiana'])
+                else:
+                    sak_value = "" if circuito.tipo == 'hvac' else str(circuito.sak)
+                    rows.add([circuito.identificador, circuito.nome, tipo, sak_value, modulo_nome, canal, ""],
+                             background=TIPO_BACKGROUNDS.get(circuito.tipo))
+
+            if rows:
+                elements.append(rows.table(CIRCUITO_TABLE_STYLE))
+            else:
+                elements.append(Paragraph("Nenhum circuito neste ambiente.", styles['Italic']))
+            
+            elements.append(Spacer(1, 0.2*inch))
+        
+        if area != projeto.areas[-1]:
+            elements.append(PageBreak())
+
+    # Resumo de Módulos
+    elements.append(PageBreak())
+    elements.append(Paragraph("RESUMO DE MÓDULOS", styles['Heading2']))
+    elements.append(Spacer(1, 0.2*inch))
+    
+    todos_circuitos = {c.id: c for area in projeto.areas for ambiente in area.ambientes for c in ambiente.circuitos}
+    
+    if modulos_projeto:
+        for modulo in modulos_projeto:
+            elements.append(Paragraph(f"Módulo: {modulo.nome} ({modulo.tipo})", styles['Heading3']))
+            
+            rows = _TableRows(CANAL_COL_WIDTHS, CANAL_HEADER)
+            canais_ocupados = {v.canal: v for v in modulo.vinculacoes}
+            
+            for canal_num in range(1, modulo.quantidade_canais + 1):
+                vinculacao = canais_ocupados.get(canal_num)
+                if vinculacao is None:
+                    rows.add([str(canal_num), "Livre", "-", "-", ""], left=(2,))
+                    continue
+                circuito = todos_circuitos.get(vinculacao.circuito_id)
+                if circuito:
+                    amperagem = f"{(circuito.potencia or 0) / 120:.2f}A" if circuito.potencia else "0.00A"
+                    rows.add([str(canal_num), circuito.identificador, circuito.nome, amperagem, ""],
+                             background=TIPO_BACKGROUNDS.get(circuito.tipo))
+                else:
+                    rows.add([str(canal_num), "ID Desconhecido", "Circuito não encontrado", "-", ""], left=(2,))
+
+            elements.append(rows.table(CANAL_TABLE_STYLE))
+            elements.append(Spacer(1, 0.3*inch))
+    else:
+        elements.append(Paragraph("Nenhum módulo configurado neste projeto.", styles['Italic']))
+
+    # Seção de Assinaturas
+    elements.append(PageBreak())
+    elements.append(Paragraph("REGISTRO DE VISITAS TÉCNICAS", styles['Heading2']))
+    elements.append(Spacer(1, 0.2*inch))
+
+    assinatura_data = [["Data", "Técnico Responsável", "Assinatura"]]
+    for i in range(10):
+        assinatura_data.append(["____/____/______", "", ""])
+    
+    assinatura_table = Table(assinatura_data, colWidths=[1.5*inch, 3*inch, 2.5*inch], rowHeights=0.5*inch)
+    assinatura_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(assinatura_table)
+
+    # Página de Observações
+    elements.append(PageBreak())
+    elements.append(Paragraph("OBSERVAÇÕES GERAIS", styles['Heading2']))
+    elements.append(Spacer(1, 0.2*inch))
+
+    obs_data = []
+    for i in range(1, 11):
+        obs_data.append([f"Dia {i}:", ""])
+    
+    obs_table = Table(obs_data, colWidths=[0.8*inch, 6.2*inch], rowHeights=1.5*inch)
+    obs_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP')
+    ]))
+    elements.append(obs_table)
+
+    page_callback = footer
+    if on_page is not None:
+        def footer_with_progress(canvas, doc):
+            footer(canvas, doc)
+            on_page(doc.page)
+
+        page_callback = footer_with_progress
+
+    doc.build(
+        elements,
+        onFirstPage=page_callback,
+        onLaterPages=page_callback,
+        canvasmaker=canvasmaker
+    )
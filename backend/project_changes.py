@@ -0,0 +1,212 @@
+# project_changes.py
+"""Detecta, pelos eventos da sessão do SQLAlchemy, quais projetos mudaram.
+
+Qualquer inclusão, alteração ou exclusão de um registro que pertence a um
+projeto (áreas, ambientes, quadros, circuitos, módulos, vinculações, keypads,
+botões, cenas, ações) é atribuída ao seu ``projeto_id``. A coluna
+``Projeto.revision`` é incrementada na mesma transação (uma vez por
+transação), e quando ela é confirmada os assinantes (ex.: o cache de
+artefatos) são avisados com os IDs dos projetos alterados.
+"""
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from database import Projeto, Area, Ambiente, QuadroEletrico, Circuito, Modulo, Vinculacao, Keypad, KeypadButton, Cena, Acao, CustomAcao
+
+# Modelos com a coluna projeto_id
+PROJECT_MODELS = (Area, Modulo, Keypad, QuadroEletrico)
+
+# Modelos ligados ao projeto por uma chave estrangeira: modelo -> (coluna, modelo pai)
+PARENT_KEYS = {
+    Ambiente: ("area_id", Area),
+    Circuito: ("ambiente_id", Ambiente),
+    Cena: ("ambiente_id", Ambiente),
+    Vinculacao: ("modulo_id", Modulo),
+    KeypadButton: ("keypad_id", Keypad),
+    Acao: ("cena_id", Cena),
+    CustomAcao: ("acao_id", Acao),
+}
+
+TRACKED_MODELS = (Projeto,) + PROJECT_MODELS + tuple(PARENT_KEYS)
+
+# Tamanho máximo das listas em "id IN (...)" ao resolver linhas em massa
+_IN_CHUNK = 500
+
+_PENDING_KEY = "projetos_alterados"
+_BUMPED_KEY = "projetos_revisados"
+
+
+class _Resolver:
+    """Resolve o projeto de objetos e linhas, com cache durante um flush."""
+
+    def __init__(self, session):
+        self.session = session
+        self.cache = {}
+
+    def projeto_id_of(self, obj):
+        model = type(obj)
+        if model is Projeto:
+            return obj.id
+        if model in PROJECT_MODELS:
+            return obj.projeto_id
+        column, parent = PARENT_KEYS[model]
+        return self.projeto_id_by_key(parent, getattr(obj, column))
+
+    @staticmethod
+    def _parent_key(model):
+        if model in PROJECT_MODELS:
+            return "projeto_id", Projeto
+        return PARENT_KEYS[model]
+
+    def projeto_map(self, model, row_ids):
+        """``{id: projeto_id}`` para vários IDs de ``model``, com uma consulta por nível."""
+        row_ids = {row_id for row_id in row_ids if row_id is not None}
+        if model is Projeto:
+            return {row_id: row_id for row_id in row_ids}
+        missing = sorted(row_id for row_id in row_ids if (model, row_id) not in self.cache)
+        if missing:
+            column, parent = self._parent_key(model)
+            parent_of = {}
+            for start in range(0, len(missing), _IN_CHUNK):
+                chunk = missing[start:start + _IN_CHUNK]
+                parent_of.update(self.session.connection().execute(
+                    select(model.id, getattr(model, column)).where(model.id.in_(chunk))
+                ).all())
+            parent_projects = self.projeto_map(parent, parent_of.values())
+            for row_id in missing:
+                self.cache[(model, row_id)] = parent_projects.get(parent_of.get(row_id))
+        return {row_id: self.cache[(model, row_id)] for row_id in row_ids}
+
+    def projeto_id_by_key(self, model, row_id):
+        if row_id is None:
+            return None
+        if model is Projeto:
+            return row_id
+        cache_key = (model, row_id)
+        if cache_key not in self.cache:
+            column, parent = self._parent_key(model)
+            value = self.session.connection().execute(
+                select(getattr(model, column)).where(model.id == row_id)
+            ).scalar()
+            self.cache[cache_key] = self.projeto_id_by_key(parent, value)
+        return self.cache[cache_key]
+
+
+def _mark(session, objects):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    resolver = _Resolver(session)
+    with session.no_autoflush:
+        for obj in objects:
+            if isinstance(obj, TRACKED_MODELS):
+                projeto_id = resolver.projeto_id_of(obj)
+                if projeto_id is not None:
+                    pending.add(projeto_id)
+
+
+def _bump_revisions(session):
+    """Incrementa ``Projeto.revision`` dos projetos marcados que ainda não foram
+    incrementados nesta transação."""
+    pending = session.info.get(_PENDING_KEY, set())
+    bumped = session.info.setdefault(_BUMPED_KEY, set())
+    projeto_ids = pending - bumped
+    if not projeto_ids:
+        return
+    session.connection().execute(
+        update(Projeto)
+        .where(Projeto.id.in_(sorted(projeto_ids)))
+        .values(revision=Projeto.revision + 1)
+    )
+    bumped.update(projeto_ids)
+    # Instâncias já carregadas passam a ler a revisão nova do banco
+    for projeto_id in projeto_ids:
+        obj = session.identity_map.get(session.identity_key(Projeto, projeto_id))
+        if obj is not None:
+            session.expire(obj, ["revision"])
+
+
+class ProjectChangeTracker:
+    """Mantém ``Projeto.revision`` e avisa os assinantes a cada commit.
+
+    ``token(session, projeto_id)`` muda sempre que o projeto é alterado; como
+    inclui a data de criação, um projeto recriado com o mesmo ID não reaproveita
+    tokens antigos.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def install(self, target=Session):
+        event.listen(target, "before_flush", self._before_flush)
+        event.listen(target, "after_flush", self._after_flush)
+        event.listen(target, "after_flush_postexec", self._after_flush_postexec)
+        event.listen(target, "do_orm_execute", self._do_orm_execute)
+        event.listen(target, "after_commit", self._after_commit)
+        event.listen(target, "after_soft_rollback", self._after_rollback)
+        return self
+
+    def subscribe(self, callback):
+        """Registra ``callback(projeto_id)``, chamado após o commit de cada projeto alterado."""
+        self._subscribers.append(callback)
+        return callback
+
+    def token(self, session, projeto_id):
+        row = session.execute(
+            select(Projeto.revision, Projeto.data_criacao).where(Projeto.id == projeto_id)
+        ).first()
+        if row is None:
+            return None
+        revision, data_criacao = row
+        return f"{revision}-{data_criacao.isoformat() if data_criacao else ''}"
+
+    def _before_flush(self, session, flush_context, instances):
+        # Alterações e exclusões são resolvidas antes do flush, enquanto as linhas
+        # (e seus pais) ainda existem no banco
+        _mark(session, list(session.dirty) + list(session.deleted))
+
+    def _after_flush(self, session, flush_context):
+        # Inclusões só têm as chaves estrangeiras preenchidas depois do flush
+        _mark(session, session.new)
+
+    def _after_flush_postexec(self, session, flush_context):
+        _bump_revisions(session)
+
+    def _do_orm_execute(self, orm_execute_state):
+        # INSERT/UPDATE/DELETE em massa (session.execute(insert(...), [...]),
+        # Query.update/Query.delete) não passam pelo flush
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        model = mapper.class_ if mapper is not None else None
+        if model not in TRACKED_MODELS:
+            return
+        session = orm_execute_state.session
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        resolver = _Resolver(session)
+
+        params = orm_execute_state.parameters
+        if orm_execute_state.is_insert:
+            rows = [params] if isinstance(params, dict) else (params or [])
+            column, parent = ("id", Projeto) if model is Projeto else resolver._parent_key(model)
+            projetos = resolver.projeto_map(parent, (row.get(column) for row in rows))
+        elif orm_execute_state.is_update and isinstance(params, list) and params:
+            # UPDATE em massa por chave primária: session.execute(update(Model), [{"id": ...}, ...])
+            projetos = resolver.projeto_map(model, (row.get("id") for row in params))
+        else:
+            stmt = select(model.id)
+            if orm_execute_state.statement.whereclause is not None:
+                stmt = stmt.where(orm_execute_state.statement.whereclause)
+            projetos = resolver.projeto_map(model, session.connection().execute(stmt).scalars())
+        pending.update(projeto_id for projeto_id in projetos.values() if projeto_id is not None)
+        _bump_revisions(session)
+
+    def _after_commit(self, session):
+        changed = session.info.pop(_PENDING_KEY, set())
+        session.info.pop(_BUMPED_KEY, None)
+        for projeto_id in changed:
+            for callback in self._subscribers:
+                callback(projeto_id)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(_PENDING_KEY, None)
+            session.info.pop(_BUMPED_KEY, None)
@@ -0,0 +1,318 @@
+# project_import.py
+"""Importação do JSON gerado por /exportar-projeto (/api/importar-projeto).
+
+Cada tabela é gravada com um único INSERT em lote (executemany). Os IDs novos
+são atribuídos em memória a partir do maior ID da tabela, e o mapa ``id antigo
+-> id novo`` resolve as chaves estrangeiras das tabelas seguintes e as
+referências cruzadas: os botões dos keypads são gravados depois das cenas, já
+com ``cena_id``, e os controladores dos módulos vão em um único UPDATE em lote.
+"""
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+
+from database import Projeto, Area, Ambiente, QuadroEletrico, Circuito, Modulo, Vinculacao, Keypad, KeypadButton, Cena, Acao, CustomAcao
+from jobs import NULL_PROGRESS
+
+ZERO_GUID = "00000000-0000-0000-0000-000000000000"
+
+
+def parse_iso_date(date_string):
+    if not date_string:
+        return None
+    try:
+        # Handle both Z and +00:00 timezones
+        if date_string.endswith('Z'):
+            return datetime.fromisoformat(date_string[:-1] + '+00:00')
+        return datetime.fromisoformat(date_string)
+    except (ValueError, TypeError):
+        return None
+
+
+def remap_numeric_guid(value, mapping):
+    if value is None:
+        return None
+    value_str = str(value).strip()
+    try:
+        original_id = int(value_str)
+    except (ValueError, TypeError):
+        return value_str
+    mapped_id = mapping.get(original_id)
+    return str(mapped_id) if mapped_id is not None else value_str
+
+
+def parse_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ("true", "1", "yes", "y")
+    return bool(value)
+
+
+def insert_rows(session, model, rows):
+    """INSERT em lote de ``rows``.
+
+    Com ``render_nulls`` os valores ``None`` são gravados como NULL (como no
+    ``session.add``), em vez de omitidos, o que dividiria o lote por conjunto de
+    colunas e aplicaria os defaults das colunas. Linhas com colunas diferentes
+    (ex.: datas ausentes no arquivo) são agrupadas, um lote por conjunto.
+    """
+    if rows:
+        rows = sorted(rows, key=lambda row: sorted(row))
+        session.execute(insert(model).execution_options(render_nulls=True), rows)
+
+
+def next_ids(session, model, count):
+    """``count`` IDs livres para ``model``, a partir do maior ID da tabela.
+
+    Só é seguro com a escrita do banco travada pela transação atual: no SQLite,
+    a partir do primeiro INSERT (o do projeto), nenhuma outra conexão grava até
+    o commit.
+    """
+    start = (session.scalar(select(func.max(model.id))) or 0) + 1
+    return range(start, start + count)
+
+
+def map_inserted(session, model, pending):
+    """Grava ``pending`` (pares ``(id antigo, linha)``) e devolve ``{id antigo: id novo}``."""
+    rows = []
+    id_map = {}
+    for (old_id, row), new_id in zip(pending, next_ids(session, model, len(pending))):
+        rows.append(dict(row, id=new_id))
+        id_map[old_id] = new_id
+    insert_rows(session, model, rows)
+    return id_map
+
+
+def unique_project_name(session, original_nome, user_id):
+    """Primeiro nome livre entre ``original_nome``, ``original_nome (cópia 1)``, ..."""
+    existentes = set(session.scalars(
+        select(Projeto.nome).where(
+            Projeto.user_id == user_id,
+            Projeto.nome.startswith(original_nome, autoescape=True),
+        )
+    ))
+    novo_nome = original_nome
+    count = 1
+    while novo_nome in existentes:
+        novo_nome = f"{original_nome} (cópia {count})"
+        count += 1
+    return novo_nome
+
+
+def _with_timestamps(row, source):
+    # Sem data no arquivo, vale o server_default (agora)
+    created_at = parse_iso_date(source.get('created_at'))
+    updated_at = parse_iso_date(source.get('updated_at'))
+    if created_at:
+        row['created_at'] = created_at
+    if updated_at:
+        row['updated_at'] = updated_at
+    return row
+
+
+def import_project(session, data, user_id, progress=NULL_PROGRESS):
+    """Cria o projeto de ``data`` para ``user_id`` e devolve o ``Projeto`` novo.
+
+    Não faz commit: a rota controla a transação.
+    """
+    # 1. Criar Projeto
+    novo_nome = unique_project_name(session, data['projeto']['nome'], user_id)
+    projeto_data = data['projeto']
+    novo_projeto = Projeto(
+        nome=novo_nome,
+        status=projeto_data.get('status', 'ATIVO'),
+        user_id=user_id,
+        data_criacao=parse_iso_date(projeto_data.get('data_criacao')) or datetime.utcnow(),
+        data_ativo=parse_iso_date(projeto_data.get('data_ativo')),
+        data_inativo=parse_iso_date(projeto_data.get('data_inativo')),
+        data_concluido=parse_iso_date(projeto_data.get('data_concluido')),
+    )
+    session.add(novo_projeto)
+    session.flush()
+    projeto_id = novo_projeto.id
+
+    # 2. Criar Áreas
+    progress.update(stage='Áreas', percent=5)
+    areas = map_inserted(session, Area, [
+        (area_data['id'], {'nome': area_data['nome'], 'projeto_id': projeto_id})
+        for area_data in data.get('areas', [])
+    ])
+
+    # 3. Criar Ambientes
+    progress.update(stage='Ambientes', percent=15, areas=len(areas))
+    ambientes = map_inserted(session, Ambiente, [
+        (ambiente_data['id'], {'nome': ambiente_data['nome'], 'area_id': areas[ambiente_data['area_id']]})
+        for ambiente_data in data.get('ambientes', [])
+        if areas.get(ambiente_data['area_id'])
+    ])
+
+    # 4. Criar Quadros Elétricos
+    progress.update(stage='Quadros elétricos', percent=25, ambientes=len(ambientes))
+    quadros = map_inserted(session, QuadroEletrico, [
+        (quadro_data['id'], {
+            'nome': quadro_data['nome'],
+            'notes': quadro_data.get('notes'),
+            'ambiente_id': ambientes[quadro_data['ambiente_id']],
+            'projeto_id': projeto_id,
+        })
+        for quadro_data in data.get('quadros_eletricos', [])
+        if ambientes.get(quadro_data['ambiente_id'])
+    ])
+
+    # 5. Criar Módulos (os controladores são ligados depois, quando todos tiverem ID)
+    progress.update(stage='Módulos', percent=30, quadros_eletricos=len(quadros))
+    modulos = map_inserted(session, Modulo, [
+        (modulo_data['id'], {
+            'nome': modulo_data['nome'],
+            'tipo': modulo_data['tipo'],
+            'quantidade_canais': modulo_data['quantidade_canais'],
+            'hsnet': modulo_data.get('hsnet'),
+            'dev_id': modulo_data.get('dev_id'),
+            'is_controller': modulo_data.get('is_controller', False),
+            'is_logic_server': modulo_data.get('is_logic_server', False),
+            'ip_address': modulo_data.get('ip_address'),
+            'quadro_eletrico_id': quadros.get(modulo_data.get('quadro_eletrico_id')),
+            'projeto_id': projeto_id,
+        })
+        for modulo_data in data.get('modulos', [])
+    ])
+    parents = {}
+    for modulo_data in data.get('modulos', []):
+        if modulo_data.get('parent_controller_id'):
+            novo_modulo_id = modulos.get(modulo_data['id'])
+            novo_parent_id = modulos.get(modulo_data['parent_controller_id'])
+            if novo_modulo_id and novo_parent_id:
+                parents[novo_modulo_id] = novo_parent_id
+    if parents:
+        session.execute(update(Modulo), [
+            {'id': modulo_id, 'parent_controller_id': parent_id} for modulo_id, parent_id in parents.items()
+        ])
+
+    # 6. Criar Circuitos
+    progress.update(stage='Circuitos', percent=40, modulos=len(modulos))
+    circuitos = map_inserted(session, Circuito, [
+        (circuito_data['id'], {
+            'identificador': circuito_data['identificador'],
+            'nome': circuito_data['nome'],
+            'tipo': circuito_data['tipo'],
+            'dimerizavel': circuito_data.get('dimerizavel', False),
+            'potencia': circuito_data.get('potencia', 0.0),
+            'sak': circuito_data.get('sak'),
+            'quantidade_saks': circuito_data.get('quantidade_saks', 1),
+            'ambiente_id': ambientes[circuito_data['ambiente_id']],
+        })
+        for circuito_data in data.get('circuitos', [])
+        if ambientes.get(circuito_data['ambiente_id'])
+    ])
+
+    # 7. Criar Vinculações
+    progress.update(stage='Vinculações', percent=55, circuitos=len(circuitos))
+    insert_rows(session, Vinculacao, [
+        {
+            'circuito_id': circuitos[vinc_data['circuito_id']],
+            'modulo_id': modulos[vinc_data['modulo_id']],
+            'canal': vinc_data['canal'],
+        }
+        for vinc_data in data.get('vinculacoes', [])
+        if circuitos.get(vinc_data['circuito_id']) and modulos.get(vinc_data['modulo_id'])
+    ])
+
+    # 8. Criar Keypads
+    progress.update(stage='Keypads', percent=65)
+    keypads = map_inserted(session, Keypad, [
+        (keypad_data['id'], _with_timestamps({
+            'nome': keypad_data['nome'],
+            'modelo': keypad_data.get('modelo', 'RQR-K'),
+            'color': keypad_data.get('color', 'WHITE'),
+            'button_color': keypad_data.get('button_color', 'WHITE'),
+            'button_count': keypad_data.get('button_count', 4),
+            'hsnet': keypad_data['hsnet'],
+            'dev_id': keypad_data.get('dev_id'),
+            'notes': keypad_data.get('notes'),
+            'ambiente_id': ambientes[keypad_data['ambiente_id']],
+            'projeto_id': projeto_id,
+        }, keypad_data))
+        for keypad_data in data.get('keypads', [])
+        if ambientes.get(keypad_data['ambiente_id'])
+    ])
+
+    # 9. Criar Cenas, Ações e CustomAcoes
+    progress.update(stage='Cenas', percent=75, keypads=len(keypads))
+    cenas = map_inserted(session, Cena, [
+        (cena_data['id'], {
+            'guid': cena_data.get('guid', str(uuid.uuid4())),
+            'nome': cena_data['nome'],
+            'scene_movers': cena_data.get('scene_movers', False),
+            'ambiente_id': ambientes[cena_data['ambiente_id']],
+        })
+        for cena_data in data.get('cenas', [])
+        if ambientes.get(cena_data['ambiente_id'])
+    ])
+
+    pending_acoes = []
+    for acao_data in data.get('acoes', []):
+        nova_cena_id = cenas.get(acao_data['cena_id'])
+        if not nova_cena_id:
+            continue
+        action_type = acao_data.get('action_type', 0)
+        old_target = acao_data.get('target_guid')
+        if action_type == 0:
+            new_target = remap_numeric_guid(old_target, circuitos)
+        elif action_type == 7:
+            new_target = remap_numeric_guid(old_target, ambientes)
+        else:
+            new_target = old_target
+        pending_acoes.append((acao_data['id'], {
+            'cena_id': nova_cena_id,
+            'level': acao_data.get('level', 100),
+            'action_type': action_type,
+            'target_guid': new_target,
+        }))
+    acoes = map_inserted(session, Acao, pending_acoes)
+
+    progress.update(acoes=len(acoes))
+    insert_rows(session, CustomAcao, [
+        {
+            'acao_id': acoes[custom_acao_data['acao_id']],
+            'target_guid': remap_numeric_guid(custom_acao_data.get('target_guid'), circuitos),
+            'enable': custom_acao_data.get('enable', True),
+            'level': custom_acao_data.get('level', 50),
+        }
+        for custom_acao_data in data.get('custom_acoes', [])
+        if acoes.get(custom_acao_data['acao_id'])
+    ])
+
+    # 10. Botões dos keypads, já com a cena (gravada acima)
+    progress.update(stage='Botões', percent=90)
+    botoes = []
+    for btn_data in data.get('keypad_buttons', []):
+        novo_keypad_id = keypads.get(btn_data['keypad_id'])
+        if not novo_keypad_id:
+            continue
+        original_target_object = btn_data.get('target_object_guid')
+        mapped_target_object = remap_numeric_guid(original_target_object, circuitos)
+        if mapped_target_object is None:
+            mapped_target_object = original_target_object or ZERO_GUID
+        botoes.append(_with_timestamps({
+            'keypad_id': novo_keypad_id,
+            'ordem': btn_data['ordem'],
+            'guid': btn_data.get('guid', str(uuid.uuid4())),
+            'engraver_text': btn_data.get('engraver_text'),
+            'icon': btn_data.get('icon'),
+            'rocker_style': btn_data.get('rocker_style'),
+            'is_rocker': parse_bool(btn_data.get('is_rocker', False)),
+            'circuito_id': circuitos.get(btn_data['circuito_id']),
+            'cena_id': cenas.get(btn_data['cena_id']) if btn_data.get('cena_id') else None,
+            'modo': btn_data.get('modo', 3),
+            'command_on': btn_data.get('command_on', 0),
+            'command_off': btn_data.get('command_off', 0),
+            'can_hold': btn_data.get('can_hold', False),
+            'modo_double_press': btn_data.get('modo_double_press', 3),
+            'command_double_press': btn_data.get('command_double_press', 0),
+            'target_object_guid': mapped_target_object,
+            'notes': btn_data.get('notes'),
+        }, btn_data))
+    insert_rows(session, KeypadButton, botoes)
+    progress.update(botoes=len(botoes))
+
+    return novo_projeto
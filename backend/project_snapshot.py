@@ -0,0 +1,257 @@
+# project_snapshot.py
+"""Snapshot imutável de um projeto, carregado em um número fixo de consultas.
+
+O conversor ROEHN percorre áreas → ambientes → circuitos/keypads/cenas e os
+módulos do projeto. Percorrer esses relacionamentos lazy dispara uma consulta
+por objeto; aqui cada tabela é lida uma única vez (sempre filtrada pelo
+projeto) e os objetos são montados em memória como namedtuples, com os mesmos
+nomes de atributos dos modelos.
+"""
+from collections import namedtuple
+
+from sqlalchemy import event, select
+
+from database import db, Projeto, Area, Ambiente, QuadroEletrico, Circuito, Modulo, Vinculacao, Keypad, KeypadButton, Cena, Acao, CustomAcao
+
+
+def _snapshot_type(model, *relations):
+    columns = [column.key for column in model.__table__.columns]
+    return namedtuple(f"{model.__name__}Snapshot", columns + list(relations))
+
+
+ProjetoSnapshot = _snapshot_type(Projeto, "areas", "modulos", "keypads")
+AreaSnapshot = _snapshot_type(Area, "ambientes")
+AmbienteSnapshot = _snapshot_type(Ambiente, "circuitos", "keypads", "quadros_eletricos", "cenas")
+QuadroEletricoSnapshot = _snapshot_type(QuadroEletrico)
+ModuloSnapshot = _snapshot_type(Modulo, "quadro_eletrico")
+CircuitoSnapshot = _snapshot_type(Circuito, "vinculacao")
+VinculacaoSnapshot = _snapshot_type(Vinculacao, "modulo")
+KeypadSnapshot = _snapshot_type(Keypad, "buttons")
+KeypadButtonSnapshot = _snapshot_type(KeypadButton, "circuito", "cena")
+CenaSnapshot = _snapshot_type(Cena, "acoes")
+AcaoSnapshot = _snapshot_type(Acao, "custom_acoes")
+CustomAcaoSnapshot = _snapshot_type(CustomAcao)
+
+# Número de consultas feitas por load_project_snapshot, independente do tamanho do projeto
+SNAPSHOT_QUERY_COUNT = 12
+
+# Partes que podem ser omitidas do snapshot (e as tabelas que deixam de ser lidas)
+SNAPSHOT_PARTS = {
+    "circuitos": (Circuito,),
+    "vinculacoes": (Vinculacao,),
+    "keypads": (Keypad, KeypadButton),
+    "cenas": (Cena,),
+    "acoes": (Acao, CustomAcao),
+}
+
+
+class QueryCounter:
+    """Conta os comandos SQL executados pela conexão de uma sessão.
+
+    Escuta só a conexão que a sessão usa no bloco, e não o engine: com o
+    servidor em threads, as consultas das outras requisições não entram na
+    contagem.
+
+    Uso::
+
+        with QueryCounter(db.session) as counter:
+            load_project_snapshot(db.session, projeto_id)
+        counter.assert_at_most(SNAPSHOT_QUERY_COUNT)
+    """
+
+    def __init__(self, session=None):
+        self.session = session
+        self.connection = None
+        self.count = 0
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        if self.session is None:
+            self.session = db.session
+        self.connection = self.session.connection()
+        event.listen(self.connection, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.connection, "before_cursor_execute", self._on_execute)
+        return False
+
+    def assert_at_most(self, limit):
+        if self.count > limit:
+            raise AssertionError(f"{self.count} consultas executadas (limite: {limit})")
+
+
+def _rows(session, model, stmt):
+    return [row._asdict() for row in session.execute(stmt.order_by(model.id))]
+
+
+def _in_project(stmt, projeto_id, *joins):
+    """Aplica a cadeia de joins até Area e filtra pelo projeto."""
+    for target, onclause in joins:
+        stmt = stmt.join(target, onclause)
+    return stmt.where(Area.projeto_id == projeto_id)
+
+
+def load_project_snapshot(session, projeto_id, skip=()):
+    """Carrega o projeto ``projeto_id`` inteiro em SNAPSHOT_QUERY_COUNT consultas.
+
+    Retorna um ``ProjetoSnapshot`` (ou ``None`` se o projeto não existir). As
+    coleções são tuplas ordenadas por ID, a mesma ordem dos relacionamentos lazy.
+    ``skip`` lista partes de SNAPSHOT_PARTS que não serão lidas: as coleções
+    correspondentes ficam vazias e as referências a elas, ``None``.
+    """
+    skipped = {model for part in skip for model in SNAPSHOT_PARTS[part]}
+
+    def rows(model, stmt):
+        return [] if model in skipped else _rows(session, model, stmt)
+
+    projeto_row = session.execute(select(Projeto.__table__).where(Projeto.id == projeto_id)).first()
+    if projeto_row is None:
+        return None
+
+    area_rows = _rows(session, Area, select(Area.__table__).where(Area.projeto_id == projeto_id))
+    ambiente_rows = _rows(session, Ambiente, _in_project(
+        select(Ambiente.__table__), projeto_id, (Area, Ambiente.area_id == Area.id)))
+    quadro_rows = _rows(session, QuadroEletrico, _in_project(
+        select(QuadroEletrico.__table__), projeto_id,
+        (Ambiente, QuadroEletrico.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+    modulo_rows = _rows(session, Modulo, select(Modulo.__table__).where(Modulo.projeto_id == projeto_id))
+    circuito_rows = rows(Circuito, _in_project(
+        select(Circuito.__table__), projeto_id,
+        (Ambiente, Circuito.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+    vinculacao_rows = rows(Vinculacao, _in_project(
+        select(Vinculacao.__table__), projeto_id,
+        (Circuito, Vinculacao.circuito_id == Circuito.id),
+        (Ambiente, Circuito.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+    keypad_rows = rows(Keypad, _in_project(
+        select(Keypad.__table__), projeto_id,
+        (Ambiente, Keypad.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+    button_rows = rows(KeypadButton, _in_project(
+        select(KeypadButton.__table__), projeto_id,
+        (Keypad, KeypadButton.keypad_id == Keypad.id),
+        (Ambiente, Keypad.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+    cena_rows = rows(Cena, _in_project(
+        select(Cena.__table__), projeto_id,
+        (Ambiente, Cena.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+    acao_rows = rows(Acao, _in_project(
+        select(Acao.__table__), projeto_id,
+        (Cena, Acao.cena_id == Cena.id),
+        (Ambiente, Cena.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+    custom_rows = rows(CustomAcao, _in_project(
+        select(CustomAcao.__table__), projeto_id,
+        (Acao, CustomAcao.acao_id == Acao.id), (Cena, Acao.cena_id == Cena.id),
+        (Ambiente, Cena.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id)))
+
+    def group(items, key):
+        grouped = {}
+        for item in items:
+            grouped.setdefault(getattr(item, key), []).append(item)
+        return grouped
+
+    quadros = {row["id"]: QuadroEletricoSnapshot(**row) for row in quadro_rows}
+    modulos = {
+        row["id"]: ModuloSnapshot(**row, quadro_eletrico=quadros.get(row["quadro_eletrico_id"]))
+        for row in modulo_rows
+    }
+    vinculacoes = {
+        row["circuito_id"]: VinculacaoSnapshot(**row, modulo=modulos.get(row["modulo_id"]))
+        for row in vinculacao_rows
+    }
+    circuitos = {
+        row["id"]: CircuitoSnapshot(**row, vinculacao=vinculacoes.get(row["id"]))
+        for row in circuito_rows
+    }
+
+    customs_by_acao = group((CustomAcaoSnapshot(**row) for row in custom_rows), "acao_id")
+    acoes_by_cena = group(
+        (AcaoSnapshot(**row, custom_acoes=tuple(customs_by_acao.get(row["id"], ()))) for row in acao_rows),
+        "cena_id",
+    )
+    cenas = {
+        row["id"]: CenaSnapshot(**row, acoes=tuple(acoes_by_cena.get(row["id"], ())))
+        for row in cena_rows
+    }
+
+    buttons_by_keypad = group(
+        (
+            KeypadButtonSnapshot(**row, circuito=circuitos.get(row["circuito_id"]), cena=cenas.get(row["cena_id"]))
+            for row in button_rows
+        ),
+        "keypad_id",
+    )
+    keypads = [
+        KeypadSnapshot(**row, buttons=tuple(buttons_by_keypad.get(row["id"], ())))
+        for row in keypad_rows
+    ]
+
+    circuitos_by_ambiente = group(circuitos.values(), "ambiente_id")
+    keypads_by_ambiente = group(keypads, "ambiente_id")
+    quadros_by_ambiente = group(quadros.values(), "ambiente_id")
+    cenas_by_ambiente = group(cenas.values(), "ambiente_id")
+    ambientes_by_area = group(
+        (
+            AmbienteSnapshot(
+                **row,
+                circuitos=tuple(circuitos_by_ambiente.get(row["id"], ())),
+                keypads=tuple(keypads_by_ambiente.get(row["id"], ())),
+                quadros_eletricos=tuple(quadros_by_ambiente.get(row["id"], ())),
+                cenas=tuple(cenas_by_ambiente.get(row["id"], ())),
+            )
+            for row in ambiente_rows
+        ),
+        "area_id",
+    )
+    areas = tuple(
+        AreaSnapshot(**row, ambientes=tuple(ambientes_by_area.get(row["id"], ())))
+        for row in area_rows
+    )
+
+    return ProjetoSnapshot(
+        **projeto_row._asdict(),
+        areas=areas,
+        modulos=tuple(modulos.values()),
+        keypads=tuple(keypads),
+    )
+
+
+class RoomCircuitIndex:
+    """Índice ambiente → circuitos (e circuito por ID) de um projeto.
+
+    Usado para resolver ações de grupo ("All Lights", ``action_type == 7``), cujo
+    alvo é o ID do ambiente, sem consultar o banco a cada ação.
+    """
+
+    def __init__(self, circuitos):
+        self.by_id = {}
+        self.by_ambiente = {}
+        for circuito in circuitos:
+            self.by_id[circuito.id] = circuito
+            self.by_ambiente.setdefault(circuito.ambiente_id, []).append(circuito)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(
+            circuito
+            for area in snapshot.areas
+            for ambiente in area.ambientes
+            for circuito in ambiente.circuitos
+        )
+
+    @classmethod
+    def load(cls, session, projeto_id):
+        """Carrega id, tipo e ambiente de todos os circuitos do projeto em uma consulta."""
+        stmt = _in_project(
+            select(Circuito.id, Circuito.tipo, Circuito.ambiente_id), projeto_id,
+            (Ambiente, Circuito.ambiente_id == Ambiente.id), (Area, Ambiente.area_id == Area.id),
+        ).order_by(Circuito.id)
+        return cls(session.execute(stmt))
+
+    def circuits_in(self, ambiente_id):
+        return self.by_ambiente.get(ambiente_id, [])
+
+    def get(self, circuito_id):
+        return self.by_id.get(circuito_id)
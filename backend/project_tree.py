@@ -0,0 +1,210 @@
+# project_tree.py
+"""Árvore do projeto usada por /api/projeto_tree.
+
+Os dados vêm de ``load_project_snapshot`` (uma consulta por tabela). Os
+joinedload encadeados de ramos irmãos (cenas, circuitos, keypads, quadros a
+partir de ``Area.ambientes``) faziam o SQLite devolver o produto cartesiano
+dos ramos, e a serialização de keypads e cenas ainda disparava lazy loads por
+objeto.
+
+Há dois formatos:
+
+- ``build_project_tree``: o formato aninhado original (áreas → ambientes →
+  circuitos/keypads/quadros/cenas);
+- ``build_project_tree_normalized``: entidades indexadas por ID, mais as
+  listas de IDs filhos de cada pai em ``relationships``.
+
+Os dois aceitam ``fields``, um subconjunto de TREE_FIELDS (as partes de cada
+ambiente); as tabelas das partes não pedidas não são lidas.
+"""
+from project_snapshot import load_project_snapshot
+from serializers import serialize_keypad, serialize_cena, serialize_keypad_button
+
+TREE_FIELDS = ("circuitos", "keypads", "quadros_eletricos", "cenas")
+
+# Chaves de ``entities`` e ``relationships`` de cada parte no formato normalizado
+NORMALIZED_KEYS = {
+    "circuitos": (("circuitos", "vinculacoes"), ("ambiente_circuitos",)),
+    "keypads": (("keypads", "keypad_buttons"), ("ambiente_keypads", "keypad_buttons")),
+    "quadros_eletricos": (("quadros_eletricos",), ("ambiente_quadros_eletricos",)),
+    "cenas": (("cenas",), ("ambiente_cenas",)),
+}
+
+KEYPAD_FIELDS = ("id", "nome", "modelo", "color", "button_color", "button_count", "hsnet", "dev_id", "notes", "ambiente_id")
+
+
+def _snapshot_skip(fields):
+    """Partes do snapshot dispensáveis para os campos pedidos (botões de keypad
+    apontam para circuitos e cenas, então esses só saem sem keypads)."""
+    if fields is None:
+        return ()
+    skip = set()
+    if "keypads" not in fields:
+        skip.add("keypads")
+    if "circuitos" not in fields:
+        skip.add("vinculacoes")
+        if "keypads" not in fields:
+            skip.add("circuitos")
+    if "cenas" not in fields:
+        skip.add("acoes")
+        if "keypads" not in fields:
+            skip.add("cenas")
+    return skip
+
+
+def _modulos_by_quadro(snapshot):
+    grouped = {}
+    for m in snapshot.modulos:
+        if m.quadro_eletrico_id is not None:
+            grouped.setdefault(m.quadro_eletrico_id, []).append(m)
+    return grouped
+
+
+def _sorted_keypads(ambiente):
+    return sorted(ambiente.keypads, key=lambda kp: (kp.nome or "").lower())
+
+
+def build_project_tree(session, projeto_id, fields=None):
+    """Devolve ``(areas, modulos)`` no formato aninhado de /api/projeto_tree."""
+    snapshot = load_project_snapshot(session, projeto_id, skip=_snapshot_skip(fields))
+    if snapshot is None:
+        return [], []
+    want = lambda part: fields is None or part in fields
+
+    modulos_by_quadro = _modulos_by_quadro(snapshot)
+    out_areas = []
+    for a in snapshot.areas:
+        ambs = []
+        for amb in a.ambientes:
+            amb_out = {"id": amb.id, "nome": amb.nome}
+            if want("circuitos"):
+                amb_out["circuitos"] = [
+                    {
+                        "id": c.id,
+                        "tipo": c.tipo,
+                        "identificador": c.identificador,
+                        "nome": c.nome,
+                        "vinculacao": {
+                            "modulo_nome": c.vinculacao.modulo.nome if c.vinculacao.modulo else None,
+                            "canal": c.vinculacao.canal,
+                        } if c.vinculacao else None,
+                    }
+                    for c in amb.circuitos
+                ]
+            if want("keypads"):
+                amb_out["keypads"] = [serialize_keypad(k, ambiente=amb, area=a) for k in _sorted_keypads(amb)]
+            if want("quadros_eletricos"):
+                amb_out["quadros_eletricos"] = [
+                    {
+                        "id": q.id,
+                        "nome": q.nome,
+                        "modulos": [
+                            {
+                                "id": m.id,
+                                "nome": m.nome,
+                                "tipo": m.tipo,
+                                "quantidade_canais": m.quantidade_canais,
+                            }
+                            for m in modulos_by_quadro.get(q.id, ())
+                        ],
+                    }
+                    for q in amb.quadros_eletricos
+                ]
+            if want("cenas"):
+                amb_out["cenas"] = [serialize_cena(c) for c in amb.cenas]
+            ambs.append(amb_out)
+        out_areas.append({"id": a.id, "nome": a.nome, "ambientes": ambs})
+
+    modulos_out = [{"id": m.id, "nome": m.nome, "tipo": m.tipo} for m in snapshot.modulos]
+    return out_areas, modulos_out
+
+
+def build_project_tree_normalized(session, projeto_id, fields=None):
+    """Devolve ``(entities, relationships)``: cada entidade uma única vez, por ID.
+
+    As entidades trazem só as chaves estrangeiras (``ambiente_id``,
+    ``circuito_id``...), e ``relationships`` guarda a ordem dos filhos de cada
+    pai, a mesma do formato aninhado.
+    """
+    entities = {
+        "areas": {}, "ambientes": {}, "circuitos": {}, "vinculacoes": {}, "quadros_eletricos": {},
+        "modulos": {}, "keypads": {}, "keypad_buttons": {}, "cenas": {},
+    }
+    relationships = {
+        "areas": [], "area_ambientes": {}, "ambiente_circuitos": {}, "ambiente_keypads": {},
+        "ambiente_quadros_eletricos": {}, "ambiente_cenas": {}, "quadro_modulos": {}, "keypad_buttons": {},
+    }
+    for part, (entity_keys, relationship_keys) in NORMALIZED_KEYS.items():
+        if fields is not None and part not in fields:
+            for key in entity_keys:
+                entities.pop(key)
+            for key in relationship_keys:
+                relationships.pop(key)
+    want = lambda part: fields is None or part in fields
+
+    snapshot = load_project_snapshot(session, projeto_id, skip=_snapshot_skip(fields))
+    if snapshot is None:
+        return entities, relationships
+
+    for m in snapshot.modulos:
+        entities["modulos"][m.id] = {
+            "id": m.id,
+            "nome": m.nome,
+            "tipo": m.tipo,
+            "quantidade_canais": m.quantidade_canais,
+            "quadro_eletrico_id": m.quadro_eletrico_id,
+        }
+    for quadro_id, modulos in _modulos_by_quadro(snapshot).items():
+        relationships["quadro_modulos"][quadro_id] = [m.id for m in modulos]
+
+    for a in snapshot.areas:
+        relationships["areas"].append(a.id)
+        entities["areas"][a.id] = {"id": a.id, "nome": a.nome}
+        relationships["area_ambientes"][a.id] = [amb.id for amb in a.ambientes]
+
+        for amb in a.ambientes:
+            entities["ambientes"][amb.id] = {"id": amb.id, "nome": amb.nome, "area_id": amb.area_id}
+
+            if want("circuitos"):
+                relationships["ambiente_circuitos"][amb.id] = [c.id for c in amb.circuitos]
+                for c in amb.circuitos:
+                    entities["circuitos"][c.id] = {
+                        "id": c.id,
+                        "tipo": c.tipo,
+                        "identificador": c.identificador,
+                        "nome": c.nome,
+                        "ambiente_id": c.ambiente_id,
+                    }
+                    vinc = c.vinculacao
+                    if vinc:
+                        entities["vinculacoes"][vinc.id] = {
+                            "id": vinc.id,
+                            "circuito_id": vinc.circuito_id,
+                            "modulo_id": vinc.modulo_id,
+                            "canal": vinc.canal,
+                        }
+
+            if want("keypads"):
+                keypads = _sorted_keypads(amb)
+                relationships["ambiente_keypads"][amb.id] = [k.id for k in keypads]
+                for k in keypads:
+                    entities["keypads"][k.id] = {field: getattr(k, field) for field in KEYPAD_FIELDS}
+                    buttons = sorted(k.buttons, key=lambda b: b.ordem)
+                    for b in buttons:
+                        button = serialize_keypad_button(b)
+                        del button["circuito"], button["cena"]
+                        button["keypad_id"] = b.keypad_id
+                        entities["keypad_buttons"][b.id] = button
+                    relationships["keypad_buttons"][k.id] = [b.id for b in buttons]
+
+            if want("quadros_eletricos"):
+                relationships["ambiente_quadros_eletricos"][amb.id] = [q.id for q in amb.quadros_eletricos]
+                for q in amb.quadros_eletricos:
+                    entities["quadros_eletricos"][q.id] = {"id": q.id, "nome": q.nome, "ambiente_id": q.ambiente_id}
+
+            if want("cenas"):
+                relationships["ambiente_cenas"][amb.id] = [c.id for c in amb.cenas]
+                for c in amb.cenas:
+                    entities["cenas"][c.id] = serialize_cena(c)
+
+    return entities, relationships
@@ -3,23 +3,866 @@ import json
 import csv
 import uuid
 import io
+import heapq
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from types import MappingProxyType
 from datetime import datetime
 from database import db, User, Projeto, Area, Ambiente, Circuito, Modulo, Vinculacao, Keypad, KeypadButton, Cena, Acao, CustomAcao
+from project_snapshot import ProjetoSnapshot, QueryCounter, RoomCircuitIndex, load_project_snapshot
+
+
+ZERO_GUID = "00000000-0000-0000-0000-000000000000"
+
+
+def _freeze(value):
+    """Congela um template JSON (dicts viram MappingProxyType e listas viram tuplas)."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _clone_unit_composer(template):
+    composer = dict(template)
+    composer["Unit"] = dict(template["Unit"])
+    return composer
+
+
+def _clone_slot(template):
+    slot = dict(template)
+    slot["SubItemsGuid"] = list(template["SubItemsGuid"])
+    return slot
+
+
+def _clone_module(template):
+    """Cópia de um template de módulo; só as partes mutáveis são duplicadas."""
+    module = dict(template)
+    module["Slots"] = [_clone_slot(slot) for slot in template["Slots"]]
+    if template.get("UnitComposers"):
+        module["UnitComposers"] = [_clone_unit_composer(c) for c in template["UnitComposers"]]
+    if "SubItemComposers" in template:
+        module["SubItemComposers"] = [
+            [_clone_unit_composer(c) for c in group] for group in template["SubItemComposers"]
+        ]
+        module["GTWItemComposers"] = []
+    return module
+
+
+def _module_unit_composers(module):
+    if "SubItemComposers" in module:
+        return [c for group in module["SubItemComposers"] for c in group]
+    return module.get("UnitComposers") or []
+
+
+UNIT_TEMPLATE = _freeze({
+    "$type": "Unit",
+    "Id": 0,
+    "Event": 0,
+    "Scene": 0,
+    "Disabled": False,
+    "Logged": False,
+    "Memo": False,
+    "Increment": False,
+})
+
+
+def _new_unit(unit_id):
+    unit = dict(UNIT_TEMPLATE)
+    unit["Id"] = unit_id
+    return unit
+
+
+def _unit_composer(name, port_number, port_type, kind, io_dir, not_programmable=False):
+    return {
+        "$type": "UnitComposer",
+        "Name": name,
+        "Unit": dict(UNIT_TEMPLATE),
+        "PortNumber": port_number,
+        "PortType": port_type,
+        "NotProgrammable": not_programmable,
+        "Kind": kind,
+        "IO": io_dir,
+        "Value": 0,
+    }
+
+
+def _slot(capacity, slot_type, io_dir, name, sub_items=None):
+    return {
+        "$type": "Slot",
+        "SlotCapacity": capacity,
+        "SlotType": slot_type,
+        "InitialPort": 1,
+        "IO": io_dir,
+        "UnitComposers": None,
+        "SubItemsGuid": sub_items if sub_items is not None else [ZERO_GUID] * capacity,
+        "Name": name,
+    }
+
+
+def _module(driver_guid, slots, unit_composers=None):
+    return {
+        "$type": "Module",
+        "Name": None,
+        "DriverGuid": driver_guid,
+        "Guid": None,
+        "IpAddress": "",
+        "HsnetAddress": None,
+        "PollTiming": 0,
+        "Disabled": False,
+        "RemotePort": 0,
+        "RemoteIpAddress": "",
+        "Notes": None,
+        "Logicserver": False,
+        "DevID": None,
+        "DevIDSlave": 0,
+        "UnitComposers": unit_composers,
+        "Slots": slots,
+        "SmartGroup": 1,
+        "UserInterfaceGuid": ZERO_GUID,
+        "PIRSensorReportEnable": False,
+        "PIRSensorReportID": 0,
+    }
+
+
+# Templates imutáveis dos módulos; cada instância é criada com _clone_module e
+# só recebe os campos próprios (Name, Guid, HsnetAddress, DevID e Unit IDs).
+MODULE_TEMPLATES = MappingProxyType({
+    "RL12": _freeze(_module("80000000-0000-0000-0000-000000000006", [
+        _slot(12, 1, 1, "Load ON/OFF"),
+        _slot(6, 6, 1, "PNET"),
+    ])),
+    "RL4": _freeze(_module("80000000-0000-0000-0000-000000000010", [
+        _slot(4, 1, 1, "Load ON/OFF"),
+    ])),
+    "LX4": _freeze(_module("80000000-0000-0000-0000-000000000003", [
+        _slot(4, 7, 1, "Shade"),
+        _slot(6, 6, 0, "PNET"),
+    ], [
+        _unit_composer(f"Opening Percentage {i+1} {j+1}", 1 if j % 2 == 0 else 5, 6, 1, 1 if j % 2 == 0 else 0)
+        for i in range(4)
+        for j in range(4)
+    ])),
+    "DIM8": _freeze(_module("80000000-0000-0000-0000-000000000001", [
+        _slot(8, 2, 1, "Load Dim"),
+        _slot(6, 6, 1, "PNET"),
+    ])),
+    "SA1": _freeze({
+        "$type": "ModuleHVAC",
+        "SubItemComposers": [[
+            _unit_composer("Power", 1, 600, 1, 1),
+            _unit_composer("Mode", 2, 600, 1, 1),
+            _unit_composer("Fan Speed", 4, 600, 1, 1),
+            _unit_composer("Swing", 5, 600, 1, 1),
+            _unit_composer("Temp Up", 11, 600, 1, 1),
+            _unit_composer("Temp Down", 12, 600, 1, 1),
+            _unit_composer("Display/Light", 3, 100, 0, 1),
+        ]],
+        "GTWItemComposers": [],
+        **{key: value for key, value in _module("80000000-0000-0000-0000-000000000013", [
+            _slot(1, 4, 1, "IR"),
+        ]).items() if key not in ("$type", "UnitComposers")},
+    }),
+})
+
+# Quantidade de Unit IDs que cada tipo de módulo consome
+MODULE_UNIT_COUNTS = MappingProxyType({
+    key: len(_module_unit_composers(template)) for key, template in MODULE_TEMPLATES.items()
+})
+
+
+CONTROLLER_CONFIGS = MappingProxyType({
+    "AQL-GV-M4": _freeze({
+        "Name": "AQL-GV-M4",
+        "DriverGuid": "80000000-0000-0000-0000-000000000016",
+        "DevID": 1,
+        "ACNET_SlotCapacity": 24,
+        "Scene_SlotCapacity": 96,
+        "UnitIds": list(range(39, 58)),
+    }),
+    "ADP-M8": _freeze({
+        "Name": "ADP-M8",
+        "DriverGuid": "80000000-0000-0000-0000-000000000018",
+        "DevID": 3,
+        "ACNET_SlotCapacity": 250,
+        "Scene_SlotCapacity": 256,
+        "UnitIds": list(range(59, 78)),
+    }),
+    "ADP-M16": _freeze({
+        "Name": "ADP-M16",
+        "DriverGuid": "80000000-0000-0000-0000-000000000004",
+        "DevID": 5,
+        "ACNET_SlotCapacity": 250,
+        "Scene_SlotCapacity": 256,
+        "UnitIds": list(range(104, 123)),
+    }),
+})
+
+CONTROLLER_UNIT_COMPOSERS = (
+    # Name, PortNumber, PortType, IO, Kind, NotProgrammable
+    ("Ativo", 1, 0, 0, 0, False),
+    ("Modulos HSNET ativos", 1, 600, 0, 1, False),
+    ("Modulos HSNET registrados", 2, 600, 0, 1, False),
+    ("Data", 3, 600, 1, 1, True),
+    ("Hora", 4, 600, 1, 1, True),
+    ("DST", 2, 0, 0, 0, False),
+    ("Nascer do Sol", 5, 600, 1, 1, True),
+    ("Por do sol", 6, 600, 1, 1, True),
+    ("Posição Solar", 7, 600, 0, 1, False),
+    ("Flag RTC", 8, 600, 0, 1, False),
+    ("Flag SNTP", 9, 600, 0, 1, False),
+    ("Flag MYIP", 10, 600, 0, 1, False),
+    ("Flag DDNS", 11, 600, 0, 1, False),
+    ("Web IP", 1, 1100, 0, 1, False),
+    ("Ultima inicializacao", 2, 1100, 0, 1, False),
+    ("Tensao", 12, 600, 0, 1, False),
+    ("Corrente", 13, 600, 0, 1, False),
+    ("Power", 14, 600, 0, 1, False),
+    ("Temperatura", 15, 600, 0, 1, False),
+)
+
+
+def _controller_template(config):
+    unit_composers = []
+    for (name, port_number, port_type, io_dir, kind, not_programmable), unit_id in zip(
+        CONTROLLER_UNIT_COMPOSERS, config["UnitIds"]
+    ):
+        unit = dict(UNIT_TEMPLATE)
+        unit["Id"] = unit_id
+        unit_composers.append({
+            "$type": "UnitComposer",
+            "Name": name,
+            "PortNumber": port_number,
+            "PortType": port_type,
+            "IO": io_dir,
+            "Kind": kind,
+            "NotProgrammable": not_programmable,
+            "Unit": unit,
+            "Value": 0,
+        })
+
+    module = _module(config["DriverGuid"], [
+        _slot(config["ACNET_SlotCapacity"], 0, 0, "ACNET/RNET", [ZERO_GUID]),
+        _slot(config["Scene_SlotCapacity"], 8, 1, "Scene"),
+    ], unit_composers)
+    module["Name"] = config["Name"]
+    module["Logicserver"] = True
+    module["DevID"] = config["DevID"]
+    return _freeze(module)
+
+
+CONTROLLER_TEMPLATES = MappingProxyType({
+    controller_type: _controller_template(config) for controller_type, config in CONTROLLER_CONFIGS.items()
+})
+
+
+MODULES_INFO = _freeze({
+    'ADP-RL12': {'driver_guid': '80000000-0000-0000-0000-000000000006', 'slots': {'Load ON/OFF': 12}},
+    'RL4': {'driver_guid': '80000000-0000-0000-0000-000000000010', 'slots': {'Load ON/OFF': 4}},
+    'LX4': {'driver_guid': '80000000-0000-0000-0000-000000000003', 'slots': {'Shade': 4}},
+    'SA1': {'driver_guid': '80000000-0000-0000-0000-000000000013', 'slots': {'IR': 1}},
+    'DIM8': {'driver_guid': '80000000-0000-0000-0000-000000000001', 'slots': {'Load Dim': 8}}
+})
+
+# Ícones dos botões de keypad (KeypadButton.icon → GUID do ícone no ROEHN)
+ICON_GUIDS = MappingProxyType({
+    "abajour": "11000000-0000-0000-0000-000000000026",
+    "arandela": "11000000-0000-0000-0000-000000000028",
+    "bright": "11000000-0000-0000-0000-000000000019",
+    "cascata": "11000000-0000-0000-0000-000000000054",
+    "churrasco": "11000000-0000-0000-0000-000000000057",
+    "clean room": "11000000-0000-0000-0000-000000000045",
+    "concierge": "11000000-0000-0000-0000-000000000046",
+    "curtains": "11000000-0000-0000-0000-000000000036",
+    "curtains preset 1": "11000000-0000-0000-0000-000000000038",
+    "curtains preset 2": "11000000-0000-0000-0000-000000000037",
+    "day": "11000000-0000-0000-0000-000000000013",
+    "dim penumbra": "11000000-0000-0000-0000-000000000021",
+    "dinner": "11000000-0000-0000-0000-000000000010",
+    "do not disturb": "11000000-0000-0000-0000-000000000044",
+    "door": "11000000-0000-0000-0000-000000000049",
+    "doorbell": "11000000-0000-0000-0000-000000000043",
+    "fan": "11000000-0000-0000-0000-000000000005",
+    "fireplace": "11000000-0000-0000-0000-000000000050",
+    "garage": "11000000-0000-0000-0000-000000000059",
+    "gate": "11000000-0000-0000-0000-000000000055",
+    "good night": "11000000-0000-0000-0000-000000000015",
+    "gym1": "11000000-0000-0000-0000-000000000063",
+    "gym2": "11000000-0000-0000-0000-000000000064",
+    "gym3": "11000000-0000-0000-0000-000000000065",
+    "hvac": "11000000-0000-0000-0000-000000000004",
+    "irrigação": "11000000-0000-0000-0000-000000000062",
+    "jardim1": "11000000-0000-0000-0000-000000000052",
+    "jardim2": "11000000-0000-0000-0000-000000000053",
+    "lampada": "11000000-0000-0000-0000-000000000030",
+    "laundry": "11000000-0000-0000-0000-000000000047",
+    "leaving": "11000000-0000-0000-0000-000000000016",
+    "light preset 1": "11000000-0000-0000-0000-000000000023",
+    "light preset 2": "11000000-0000-0000-0000-000000000024",
+    "lower shades": "11000000-0000-0000-0000-000000000032",
+    "luminaria de piso": "11000000-0000-0000-0000-000000000027",
+    "medium": "11000000-0000-0000-0000-000000000020",
+    "meeting": "11000000-0000-0000-0000-000000000066",
+    "movie": "11000000-0000-0000-0000-000000000008",
+    "music": "11000000-0000-0000-0000-000000000018",
+    "night": "11000000-0000-0000-0000-000000000014",
+    "onoff": "11000000-0000-0000-0000-000000000017",
+    "padlock": "11000000-0000-0000-0000-000000000048",
+    "party": "11000000-0000-0000-0000-000000000011",
+    "pendant": "11000000-0000-0000-0000-000000000025",
+    "piscina 1": "11000000-0000-0000-0000-000000000058",
+    "piscina 2": "11000000-0000-0000-0000-000000000061",
+    "pizza": "11000000-0000-0000-0000-000000000056",
+    "raise shades": "11000000-0000-0000-0000-000000000033",
+    "reading": "11000000-0000-0000-0000-000000000007",
+    "shades": "11000000-0000-0000-0000-000000000031",
+    "shades preset 1": "11000000-0000-0000-0000-000000000034",
+    "shades preset 2": "11000000-0000-0000-0000-000000000035",
+    "spot": "11000000-0000-0000-0000-000000000029",
+    "steam room": "11000000-0000-0000-0000-000000000067",
+    "turned off": "11000000-0000-0000-0000-000000000022",
+    "tv": "11000000-0000-0000-0000-000000000040",
+    "volume": "11000000-0000-0000-0000-000000000041",
+    "welcome": "11000000-0000-0000-0000-000000000006",
+    "wine": "11000000-0000-0000-0000-000000000012",
+})
+
+# UnitComposers fixos do keypad: chave no payload, PortNumber, PortType, Kind, IO
+KEYPAD_UNIT_COMPOSERS = (
+    ("UnitEntradaDigital1", 1, 0, 0, 0),
+    ("UnitEntradaDigital2", 2, 0, 0, 0),
+    ("UnitAnyKey", 3, 0, 0, 0),
+    ("UnitBrightnessColor1", 1, 600, 1, 1),
+    ("UnitBrightnessColor2", 2, 600, 1, 1),
+    ("UnitBeepProfile", 3, 600, 1, 1),
+    ("UnitVolumeProfile", 4, 600, 1, 1),
+    ("UnitVolumeKey", 5, 0, 0, 0),
+    ("UnitBlockedKeypad", 1, 100, 0, 1),
+    ("UnitPIN32", 1, 1100, 1, 0),
+)
+
+# UnitComposers de cada botão: chave no payload, PortType, Kind, IO (porta primária/secundária)
+KEYPAD_BUTTON_UNIT_COMPOSERS = (
+    ("UnitKey", False, 300, 0, 0),
+    ("UnitLed", False, 200, 1, 1),
+    ("UnitSecondaryKey", True, 300, 0, 0),
+    ("UnitSecondaryLed", True, 200, 1, 1),
+)
+
+KEYPAD_TEMPLATE = _freeze({
+    "$type": "Keypad",
+    "DriverGuid": "90000000-0000-0000-0000-000000000004",
+    "ModuleInterface": False,
+    "Keypad4x4": False,
+    "HsnetAddress": None,
+    "TipoEntrada1ChaveLD": 0,
+    "TipoEntrada2ChaveLD": 0,
+    "UnitEntradaDigital1": None,
+    "UnitEntradaDigital2": None,
+    "UnitAnyKey": None,
+    "BrightUnit": 0,
+    "UnitBrightnessColor1": None,
+    "UnitBrightnessColor2": None,
+    "UnitBeepProfile": None,
+    "UnitVolumeProfile": None,
+    "UnitVolumeKey": None,
+    "UnitBlockedKeypad": None,
+    "UnitPIN32": None,
+    "NightModeGroup": 0,
+    "LightSensorMode": 0,
+    "LightSensorMasterID": 0,
+    "DevID": None,
+    "ListKeypadButtons": None,
+    "ListKeypadButtonsLayout2": None,
+    "ProfileGuid": "40000000-0000-0000-0000-000000000001",
+    "ButtonCountLayout2": 0,
+    "ButtonLayout2": 0,
+    "Slots": None,
+    "hold": 0,
+    "ButtonLayout1": None,
+    "ModelName": None,
+    "Color": None,
+    "ButtonColor": None,
+    "Name": None,
+    "Notes": None,
+    "Guid": None,
+    "ButtonCount": None,
+})
+
+KEYPAD_BUTTON_TEMPLATE = _freeze({
+    "$type": "RockerKeypadButton",
+    "StylePropertiesSerializable": None,
+    "DoublePressDelay": False,
+    "TargetDoubleObjectGuid": ZERO_GUID,
+    "ModoDoublePress": None,
+    "CommandDoublePress": None,
+    "PortNumberDoublePress": 0,
+    "CanHold": None,
+    "Guid": None,
+    "TargetObjectGuid": None,
+    "Modo": None,
+    "CommandOn": None,
+    "CommandOff": None,
+    "PortNumber": 0,
+    "UnitControleLed": 0,
+    "LedColor": 0,
+    "Vincled": False,
+    "TimeFeedBack": 0,
+    "UnitKey": None,
+    "UnitLed": None,
+    "UnitSecondaryKey": None,
+    "UnitSecondaryLed": None,
+    "ButtonStyleGuid": None,
+    "EngraverText": None,
+    "Automode": True,
+})
+
+
+class UnitIdAllocator:
+    """Distribui Unit IDs de forma incremental, sem varrer o projeto a cada item.
+
+    O alocador é semeado uma única vez com o maior Unit ID do template e passa a
+    entregar IDs (ou blocos contíguos de IDs) monotonicamente crescentes. IDs fixos
+    criados fora dele (ex.: controladores) devem ser informados via ``observe``.
+    Com ``scan`` definido (modo debug), cada reserva é conferida contra uma
+    varredura completa do projeto.
+    """
+
+    def __init__(self, next_id=1, scan=None):
+        self._next = next_id
+        self._scan = scan
+        self.allocated = 0
+
+    @property
+    def last(self):
+        return self._next - 1
+
+    def observe(self, unit_id):
+        """Registra um Unit ID criado fora do alocador."""
+        if unit_id is not None and unit_id >= self._next:
+            self._next = unit_id + 1
+
+    def reserve(self, count=1):
+        """Reserva ``count`` IDs contíguos e retorna o primeiro."""
+        if self._scan is not None:
+            expected = self._scan() + 1
+            if expected != self._next:
+                raise RuntimeError(
+                    f"UnitIdAllocator divergente: próximo ID {self._next}, varredura indica {expected}"
+                )
+        first = self._next
+        self._next += count
+        self.allocated += count
+        return first
+
+    def next(self):
+        return self.reserve(1)
+
+
+class ProjectIndex:
+    """Índices em memória sobre Areas → SubItems → AutomationBoards → ModulesList.
+
+    Mantém dicionários de área por nome, ambiente por (área, ambiente), quadro por
+    GUID e por nome, módulo por nome (com o quadro onde está) e objeto por GUID.
+    O conversor atualiza os índices a cada inclusão ou movimentação, então as
+    buscas não precisam mais percorrer a árvore do projeto.
+    """
+
+    def __init__(self, project_data=None):
+        self.areas = {}
+        self.rooms = {}
+        self.boards = {}
+        self.boards_by_name = {}
+        self.modules = {}
+        self.by_guid = {}
+        # Buscas feitas pelo conversor (métrica de ConversionStats)
+        self.lookups = 0
+        if project_data:
+            self.rebuild(project_data)
+
+    def rebuild(self, project_data):
+        """Reconstrói todos os índices a partir da árvore do projeto."""
+        self.areas.clear()
+        self.rooms.clear()
+        self.boards.clear()
+        self.boards_by_name.clear()
+        self.modules.clear()
+        self.by_guid.clear()
+        for area in project_data.get("Areas", []):
+            self.add_area(area)
+            for room in area.get("SubItems", []):
+                self.add_room(area, room)
+                for board in room.get("AutomationBoards", []):
+                    self.add_board(area, room, board)
+                    for module in board.get("ModulesList", []):
+                        self.add_module(module, board)
+                for item in room.get("LoadOutputs", []):
+                    self.add_guid(item)
+                for ui in room.get("UserInterfaces", []):
+                    self.add_guid(ui)
+
+    def add_guid(self, obj):
+        guid = obj.get("Guid")
+        if guid:
+            self.by_guid.setdefault(guid, obj)
+
+    def add_area(self, area):
+        self.areas.setdefault(area.get("Name"), area)
+        self.add_guid(area)
+
+    def add_room(self, area, room):
+        self.rooms.setdefault((area.get("Name"), room.get("Name")), room)
+        self.add_guid(room)
+
+    def add_board(self, area, room, board):
+        self.boards_by_name.setdefault((area.get("Name"), room.get("Name"), board.get("Name")), board)
+        if board.get("Guid"):
+            self.boards.setdefault(board["Guid"], board)
+        self.add_guid(board)
+
+    def add_module(self, module, board):
+        self.modules.setdefault(module.get("Name"), (module, board))
+        self.add_guid(module)
+
+    def move_module(self, module, board):
+        self.modules[module.get("Name")] = (module, board)
+
+    def remove_module(self, module):
+        indexed, _ = self.modules.get(module.get("Name"), (None, None))
+        if indexed is module:
+            del self.modules[module.get("Name")]
+        if self.by_guid.get(module.get("Guid")) is module:
+            del self.by_guid[module["Guid"]]
+
+    def area(self, area_name):
+        self.lookups += 1
+        return self.areas.get(area_name)
+
+    def room(self, area_name, room_name):
+        self.lookups += 1
+        return self.rooms.get((area_name, room_name))
+
+    def board(self, guid):
+        self.lookups += 1
+        return self.boards.get(guid)
+
+    def board_by_name(self, area_name, room_name, board_name):
+        self.lookups += 1
+        return self.boards_by_name.get((area_name, room_name, board_name))
+
+    def module(self, module_name):
+        self.lookups += 1
+        return self.modules.get(module_name, (None, None))
+
+    def get(self, guid):
+        self.lookups += 1
+        return self.by_guid.get(guid)
+
+
+class AddressSpace:
+    """Endereços HSNET e DevID em uso durante uma conversão.
+
+    Os endereços ficam em contadores (um mesmo endereço pode aparecer em mais de
+    um objeto), com o maior valor em cache. O HSNET vale para todo o projeto
+    (módulos e keypads), com piso 100; o DevID considera apenas os módulos do
+    quadro padrão, como na varredura original. ``allocations`` guarda o endereço
+    pedido e o atribuído a cada módulo/keypad, para o relatório pós-conversão.
+    """
+
+    HSNET_FLOOR = 100
+
+    def __init__(self, default_board=None):
+        self.default_board = default_board
+        self._hsnet = Counter()
+        self._dev_ids = Counter()
+        self._max_hsnet = None
+        self._max_dev_id = None
+        self.allocations = {}
+
+    @classmethod
+    def from_project(cls, project_data):
+        try:
+            default_board = project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]
+        except (KeyError, IndexError, TypeError):
+            default_board = None
+        space = cls(default_board)
+        for area in (project_data or {}).get("Areas", []):
+            for room in area.get("SubItems", []):
+                for board in room.get("AutomationBoards", []):
+                    for module in board.get("ModulesList", []):
+                        space.claim(module, board)
+                for ui in room.get("UserInterfaces", []):
+                    space.claim(ui)
+        return space
+
+    def _count(self, counter, value, delta):
+        if value is None:
+            return
+        counter[value] += delta
+        if counter[value] <= 0:
+            del counter[value]
+        # Cache do máximo: invalida só quando o maior valor pode ter saído
+        if counter is self._hsnet:
+            if delta > 0 and self._max_hsnet is not None:
+                self._max_hsnet = max(self._max_hsnet, value)
+            elif delta < 0 and value == self._max_hsnet:
+                self._max_hsnet = None
+        else:
+            if delta > 0 and self._max_dev_id is not None:
+                self._max_dev_id = max(self._max_dev_id, value)
+            elif delta < 0 and value == self._max_dev_id:
+                self._max_dev_id = None
+
+    def claim(self, obj, board=None):
+        """Registra os endereços de um módulo (no quadro ``board``) ou keypad."""
+        self._count(self._hsnet, obj.get("HsnetAddress"), 1)
+        if board is not None and board is self.default_board:
+            self._count(self._dev_ids, obj.get("DevID"), 1)
+
+    def release(self, obj, board=None):
+        self._count(self._hsnet, obj.get("HsnetAddress"), -1)
+        if board is not None and board is self.default_board:
+            self._count(self._dev_ids, obj.get("DevID"), -1)
+
+    def move(self, obj, from_board, to_board):
+        if from_board is self.default_board and to_board is not self.default_board:
+            self._count(self._dev_ids, obj.get("DevID"), -1)
+        elif to_board is self.default_board and from_board is not self.default_board:
+            self._count(self._dev_ids, obj.get("DevID"), 1)
+
+    def set_hsnet(self, obj, hsnet):
+        self._count(self._hsnet, obj.get("HsnetAddress"), -1)
+        obj["HsnetAddress"] = hsnet
+        self._count(self._hsnet, hsnet, 1)
+
+    def set_dev_id(self, obj, board, dev_id):
+        if board is self.default_board:
+            self._count(self._dev_ids, obj.get("DevID"), -1)
+            self._count(self._dev_ids, dev_id, 1)
+        obj["DevID"] = dev_id
+
+    def is_hsnet_used(self, hsnet):
+        return hsnet in self._hsnet
+
+    def max_hsnet(self):
+        if self._max_hsnet is None:
+            self._max_hsnet = max(self._hsnet, default=self.HSNET_FLOOR)
+        return max(self._max_hsnet, self.HSNET_FLOOR)
+
+    def max_dev_id(self):
+        if self._max_dev_id is None:
+            self._max_dev_id = max(self._dev_ids, default=0)
+        return max(self._max_dev_id, 0)
+
+    def next_hsnet(self, desired=None):
+        """Retorna ``desired`` se estiver livre, senão o próximo HSNET livre."""
+        if desired is not None and not self.is_hsnet_used(desired):
+            return desired
+        hsnet = self.max_hsnet() + 1
+        while self.is_hsnet_used(hsnet):
+            hsnet += 1
+        return hsnet
+
+    def record(self, name, kind, requested_hsnet, hsnet, requested_dev_id, dev_id):
+        self.allocations[name] = {
+            "tipo": kind,
+            "hsnet_solicitado": requested_hsnet,
+            "hsnet": hsnet,
+            "dev_id_solicitado": requested_dev_id,
+            "dev_id": dev_id,
+            "reatribuido": (
+                (requested_hsnet is not None and requested_hsnet != hsnet)
+                or (requested_dev_id is not None and requested_dev_id != dev_id)
+            ),
+        }
+
+    def reassigned(self):
+        return {name: info for name, info in self.allocations.items() if info["reatribuido"]}
+
+
+CONTROLLER_DRIVER_GUIDS = (
+    "80000000-0000-0000-0000-000000000016",  # AQL-GV-M4
+    "80000000-0000-0000-0000-000000000018",  # ADP-M8
+    "80000000-0000-0000-0000-000000000004",  # ADP-M16
+)
+
+
+class AcnetRegistry:
+    """Registro dos GUIDs nos slots ACNET dos controladores.
+
+    Guarda, por controlador, o slot ``ACNET/RNET`` e, por slot, o conjunto de
+    GUIDs já registrados e um heap com as posições livres (zero GUID), para que
+    registrar um GUID seja O(log n) em vez de varrer ``SubItemsGuid``. A lista
+    termina sempre com um zero GUID, como o ROEHN Wizard espera.
+    """
+
+    SLOT_NAME = "ACNET/RNET"
+
+    def __init__(self, zero_guid):
+        self.zero_guid = zero_guid
+        self._controllers = {}
+        self._slots = {}
+
+    @classmethod
+    def from_project(cls, project_data, zero_guid):
+        registry = cls(zero_guid)
+        for area in (project_data or {}).get("Areas", []):
+            for room in area.get("SubItems", []):
+                for board in room.get("AutomationBoards", []):
+                    for module in board.get("ModulesList", []):
+                        registry.add_controller(module)
+        return registry
+
+    def add_controller(self, module):
+        """Registra um módulo se ele for um controlador (M4/M8/M16)."""
+        if module.get("DriverGuid") not in CONTROLLER_DRIVER_GUIDS:
+            return
+        slot = next((s for s in module.get("Slots", []) if s.get("Name") == self.SLOT_NAME), None)
+        self._controllers[id(module)] = (module, slot)
+
+    def remove_controller(self, module):
+        self._controllers.pop(id(module), None)
+
+    def controllers(self):
+        """Lista de (controlador, slot ACNET/RNET) na ordem de inclusão."""
+        return list(self._controllers.values())
+
+    def _entry(self, slot):
+        subitems = slot.setdefault("SubItemsGuid", [])
+        entry = self._slots.get(id(slot))
+        if entry is None or entry["subitems"] is not subitems:
+            free = [i for i, guid in enumerate(subitems) if guid == self.zero_guid]
+            heapq.heapify(free)
+            entry = {
+                "subitems": subitems,
+                "guids": {guid for guid in subitems if guid != self.zero_guid},
+                "free": free,
+            }
+            self._slots[id(slot)] = entry
+        return entry
+
+    def register(self, slot, guid):
+        """Registra ``guid`` na primeira posição livre do slot."""
+        if not slot or not guid or guid == self.zero_guid:
+            return False
+        entry = self._entry(slot)
+        if guid in entry["guids"]:
+            return False
+        subitems = entry["subitems"]
+        if entry["free"]:
+            subitems[heapq.heappop(entry["free"])] = guid
+        else:
+            subitems.append(guid)
+        entry["guids"].add(guid)
+        if subitems[-1] != self.zero_guid:
+            subitems.append(self.zero_guid)
+            heapq.heappush(entry["free"], len(subitems) - 1)
+        return True
+
+    def assign(self, slot, guids):
+        """Substitui o conteúdo do slot por ``guids`` seguido do zero GUID."""
+        slot["SubItemsGuid"] = list(guids)
+        slot["SubItemsGuid"].append(self.zero_guid)
+        self._slots.pop(id(slot), None)
+
+    def used(self, slot):
+        return len(self._entry(slot)["guids"])
+
+    def capacity(self, slot):
+        return slot.get("SlotCapacity")
+
+
+# Níveis do log do conversor: "debug" imprime uma linha por item (circuito,
+# keypad, módulo, entrada do ACNET); "info" só o resumo de cada etapa
+LOG_LEVELS = MappingProxyType({"debug": 10, "info": 20, "warning": 30, "error": 40, "quiet": 100})
+
+
+def _log_level_value(level):
+    if isinstance(level, int):
+        return level
+    try:
+        return LOG_LEVELS[str(level).lower()]
+    except KeyError:
+        raise ValueError(f"Nível de log inválido: {level!r} (use {', '.join(LOG_LEVELS)})")
+
+
+class ConversionStats:
+    """Tempo por etapa e contadores de uma conversão.
+
+    As etapas acumulam tempo (uma mesma etapa pode ser medida em vários trechos,
+    como keypads e cenas, processados ambiente a ambiente). ``begin`` encerra a
+    etapa em andamento e inicia a próxima; ``stage`` mede um bloco ``with``.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = Counter()
+        self._current = None
+        self._started_at = None
+
+    def begin(self, name):
+        self.end()
+        self._current = name
+        self._started_at = time.perf_counter()
+
+    def end(self):
+        if self._current is not None:
+            self.add(self._current, time.perf_counter() - self._started_at)
+            self._current = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def as_dict(self):
+        return {
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            "total_ms": round(sum(self.stages.values()) * 1000, 3),
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def server_timing(self):
+        """Etapas no formato do cabeçalho HTTP ``Server-Timing``."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()
+        )
+
 
 class RoehnProjectConverter:
     # --- AQUI ESTÁ A CORREÇÃO ---
     # O construtor agora aceita o ID do usuário logado
-    def __init__(self, projeto_data, db_session, user_id):
+    def __init__(self, projeto_data, db_session, user_id, unit_id_debug=False, log_level="debug"):
         self.project_data = projeto_data
         self.db_session = db_session
         self.user_id = user_id # Armazena o ID do usuário
-        self.modules_info = {
-            'ADP-RL12': {'driver_guid': '80000000-0000-0000-0000-000000000006', 'slots': {'Load ON/OFF': 12}},
-            'RL4': {'driver_guid': '80000000-0000-0000-0000-000000000010', 'slots': {'Load ON/OFF': 4}},
-            'LX4': {'driver_guid': '80000000-0000-0000-0000-000000000003', 'slots': {'Shade': 4}},
-            'SA1': {'driver_guid': '80000000-0000-0000-0000-000000000013', 'slots': {'IR': 1}},
-            'DIM8': {'driver_guid': '80000000-0000-0000-0000-000000000001', 'slots': {'Load Dim': 8}}
-        }
+        # Saída no stdout (LOG_LEVELS) e métricas da conversão
+        self.log_level = _log_level_value(log_level)
+        self.stats = ConversionStats()
+        # Alocador de Unit IDs (semeado em create_project); em modo debug confere
+        # cada reserva com _find_max_unit_id()
+        self.unit_id_debug = unit_id_debug
+        self._unit_ids = None
+        # Índices da árvore do projeto e endereços HSNET/DevID (reconstruídos em create_project)
+        self._index = None
+        self._address_space = None
+        self._acnet_registry = None
+        # Snapshot do projeto usado por process_db_project
+        self._snapshot = None
+        self._room_circuits = None
+        self.modules_info = MODULES_INFO
         self.zero_guid = "00000000-0000-0000-0000-000000000000"
         self.m4_target_quadro_id = None
         self.keypad_driver_guid = "90000000-0000-0000-0000-000000000004"
@@ -28,183 +871,33 @@ class RoehnProjectConverter:
         self.rocker_icon_guid_left_right = "11000000-0000-0000-0000-000000000002"
         self.rocker_icon_guid_previous_next = "11000000-0000-0000-0000-000000000003"
         self.keypad_button_layouts = {1: 1, 2: 6, 4: 7}
-        self.icon_guids = {
-            "abajour": "11000000-0000-0000-0000-000000000026",
-            "arandela": "11000000-0000-0000-0000-000000000028",
-            "bright": "11000000-0000-0000-0000-000000000019",
-            "cascata": "11000000-0000-0000-0000-000000000054",
-            "churrasco": "11000000-0000-0000-0000-000000000057",
-            "clean room": "11000000-0000-0000-0000-000000000045",
-            "concierge": "11000000-0000-0000-0000-000000000046",
-            "curtains": "11000000-0000-0000-0000-000000000036",
-            "curtains preset 1": "11000000-0000-0000-0000-000000000038",
-            "curtains preset 2": "11000000-0000-0000-0000-000000000037",
-            "day": "11000000-0000-0000-0000-000000000013",
-            "dim penumbra": "11000000-0000-0000-0000-000000000021",
-            "dinner": "11000000-0000-0000-0000-000000000010",
-            "do not disturb": "11000000-0000-0000-0000-000000000044",
-            "door": "11000000-0000-0000-0000-000000000049",
-            "doorbell": "11000000-0000-0000-0000-000000000043",
-            "fan": "11000000-0000-0000-0000-000000000005",
-            "fireplace": "11000000-0000-0000-0000-000000000050",
-            "garage": "11000000-0000-0000-0000-000000000059",
-            "gate": "11000000-0000-0000-0000-000000000055",
-            "good night": "11000000-0000-0000-0000-000000000015",
-            "gym1": "11000000-0000-0000-0000-000000000063",
-            "gym2": "11000000-0000-0000-0000-000000000064",
-            "gym3": "11000000-0000-0000-0000-000000000065",
-            "hvac": "11000000-0000-0000-0000-000000000004",
-            "irrigação": "11000000-0000-0000-0000-000000000062",
-            "jardim1": "11000000-0000-0000-0000-000000000052",
-            "jardim2": "11000000-0000-0000-0000-000000000053",
-            "lampada": "11000000-0000-0000-0000-000000000030",
-            "laundry": "11000000-0000-0000-0000-000000000047",
-            "leaving": "11000000-0000-0000-0000-000000000016",
-            "light preset 1": "11000000-0000-0000-0000-000000000023",
-            "light preset 2": "11000000-0000-0000-0000-000000000024",
-            "lower shades": "11000000-0000-0000-0000-000000000032",
-            "luminaria de piso": "11000000-0000-0000-0000-000000000027",
-            "medium": "11000000-0000-0000-0000-000000000020",
-            "meeting": "11000000-0000-0000-0000-000000000066",
-            "movie": "11000000-0000-0000-0000-000000000008",
-            "music": "11000000-0000-0000-0000-000000000018",
-            "night": "11000000-0000-0000-0000-000000000014",
-            "onoff": "11000000-0000-0000-0000-000000000017",
-            "padlock": "11000000-0000-0000-0000-000000000048",
-            "party": "11000000-0000-0000-0000-000000000011",
-            "pendant": "11000000-0000-0000-0000-000000000025",
-            "piscina 1": "11000000-0000-0000-0000-000000000058",
-            "piscina 2": "11000000-0000-0000-0000-000000000061",
-            "pizza": "11000000-0000-0000-0000-000000000056",
-            "raise shades": "11000000-0000-0000-0000-000000000033",
-            "reading": "11000000-0000-0000-0000-000000000007",
-            "shades": "11000000-0000-0000-0000-000000000031",
-            "shades preset 1": "11000000-0000-0000-0000-000000000034",
-            "shades preset 2": "11000000-0000-0000-0000-000000000035",
-            "spot": "11000000-0000-0000-0000-000000000029",
-            "steam room": "11000000-0000-0000-0000-000000000067",
-            "turned off": "11000000-0000-0000-0000-000000000022",
-            "tv": "11000000-0000-0000-0000-000000000040",
-            "volume": "11000000-0000-0000-0000-000000000041",
-            "welcome": "11000000-0000-0000-0000-000000000006",
-            "wine": "11000000-0000-0000-0000-000000000012",
-        }
+        self.icon_guids = ICON_GUIDS
         self._quadro_guid_map = {}
 
-    def _create_controller_module(self, controller_type, project_info):
-        """Creates the main controller module based on its type."""
+    def _log_enabled(self, level):
+        return LOG_LEVELS[level] >= self.log_level
 
-        controller_configs = {
-            "AQL-GV-M4": {
-                "Name": "AQL-GV-M4",
-                "DriverGuid": "80000000-0000-0000-0000-000000000016",
-                "DevID": 1,
-                "ACNET_SlotCapacity": 24,
-                "Scene_SlotCapacity": 96,
-                "UnitIds": [39, 40, 41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56, 57]
-            },
-            "ADP-M8": {
-                "Name": "ADP-M8",
-                "DriverGuid": "80000000-0000-0000-0000-000000000018",
-                "DevID": 3,
-                "ACNET_SlotCapacity": 250,
-                "Scene_SlotCapacity": 256,
-                "UnitIds": [59, 60, 61, 62, 63, 64, 65, 66, 67, 68, 69, 70, 71, 72, 73, 74, 75, 76, 77]
-            },
-            "ADP-M16": {
-                "Name": "ADP-M16",
-                "DriverGuid": "80000000-0000-0000-0000-000000000004",
-                "DevID": 5,
-                "ACNET_SlotCapacity": 250,
-                "Scene_SlotCapacity": 256,
-                "UnitIds": [104, 105, 106, 107, 108, 109, 110, 111, 112, 113, 114, 115, 116, 117, 118, 119, 120, 121, 122]
-            }
-        }
+    def _log(self, level, message):
+        """Imprime ``message`` se ``level`` estiver habilitado em ``log_level``."""
+        if LOG_LEVELS[level] >= self.log_level:
+            print(message)
 
-        config = controller_configs.get(controller_type, controller_configs["AQL-GV-M4"])
-
-        unit_composers_data = [
-            {"Name": "Ativo", "PortNumber": 1, "PortType": 0, "IO": 0, "Kind": 0, "NotProgrammable": False},
-            {"Name": "Modulos HSNET ativos", "PortNumber": 1, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Modulos HSNET registrados", "PortNumber": 2, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Data", "PortNumber": 3, "PortType": 600, "IO": 1, "Kind": 1, "NotProgrammable": True},
-            {"Name": "Hora", "PortNumber": 4, "PortType": 600, "IO": 1, "Kind": 1, "NotProgrammable": True},
-            {"Name": "DST", "PortNumber": 2, "PortType": 0, "IO": 0, "Kind": 0, "NotProgrammable": False},
-            {"Name": "Nascer do Sol", "PortNumber": 5, "PortType": 600, "IO": 1, "Kind": 1, "NotProgrammable": True},
-            {"Name": "Por do sol", "PortNumber": 6, "PortType": 600, "IO": 1, "Kind": 1, "NotProgrammable": True},
-            {"Name": "Posição Solar", "PortNumber": 7, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Flag RTC", "PortNumber": 8, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Flag SNTP", "PortNumber": 9, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Flag MYIP", "PortNumber": 10, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Flag DDNS", "PortNumber": 11, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Web IP", "PortNumber": 1, "PortType": 1100, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Ultima inicializacao", "PortNumber": 2, "PortType": 1100, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Tensao", "PortNumber": 12, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Corrente", "PortNumber": 13, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Power", "PortNumber": 14, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-            {"Name": "Temperatura", "PortNumber": 15, "PortType": 600, "IO": 0, "Kind": 1, "NotProgrammable": False},
-        ]
+    def _log_traceback(self):
+        if self._log_enabled("error"):
+            traceback.print_exc()
 
-        unit_composers = []
-        for i, composer_data in enumerate(unit_composers_data):
-            unit_composers.append({
-                "$type": "UnitComposer",
-                "Name": composer_data["Name"],
-                "PortNumber": composer_data["PortNumber"],
-                "PortType": composer_data["PortType"],
-                "IO": composer_data["IO"],
-                "Kind": composer_data["Kind"],
-                "NotProgrammable": composer_data["NotProgrammable"],
-                "Unit": {
-                    "$type": "Unit", "Id": config["UnitIds"][i], "Event": 0, "Scene": 0,
-                    "Disabled": False, "Logged": False, "Memo": False, "Increment": False
-                },
-                "Value": 0
-            })
+    def _create_controller_module(self, controller_type, project_info):
+        """Creates the main controller module based on its type."""
+        template = CONTROLLER_TEMPLATES.get(controller_type, CONTROLLER_TEMPLATES["AQL-GV-M4"])
 
-        controller_module = {
-            "$type": "Module",
-            "Name": config["Name"],
-            "DriverGuid": config["DriverGuid"],
-            "Guid": str(uuid.uuid4()),
-            "IpAddress": project_info.get('m4_ip'),
-            "HsnetAddress": int(project_info.get('m4_hsnet') or 245),
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": project_info.get('m4_ip'),
-            "Notes": None,
-            "Logicserver": True,
-            "DevID": config["DevID"],
-            "DevIDSlave": 0,
-            "UnitComposers": unit_composers,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": config["ACNET_SlotCapacity"],
-                    "SlotType": 0,
-                    "InitialPort": 1,
-                    "IO": 0,
-                    "UnitComposers": None,
-                    "SubItemsGuid": [self.zero_guid],
-                    "Name": "ACNET/RNET",
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": config["Scene_SlotCapacity"],
-                    "SlotType": 8,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": [self.zero_guid] * config["Scene_SlotCapacity"],
-                    "Name": "Scene",
-                },
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": self.zero_guid,
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0,
-        }
+        if self._unit_ids is not None:
+            self._unit_ids.observe(template["UnitComposers"][-1]["Unit"]["Id"])
+
+        controller_module = _clone_module(template)
+        controller_module["Guid"] = str(uuid.uuid4())
+        controller_module["IpAddress"] = project_info.get('m4_ip')
+        controller_module["HsnetAddress"] = int(project_info.get('m4_hsnet') or 245)
+        controller_module["RemoteIpAddress"] = project_info.get('m4_ip')
         return controller_module
 
     def process_json_project(self):
@@ -266,7 +959,7 @@ class RoehnProjectConverter:
                 pass # ou adicione sua lógica aqui
 
             self.db_session.commit()
-            print("Importação concluída com sucesso!")
+            self._log("info", "Importação concluída com sucesso!")
 
         except Exception as e:
             self.db_session.rollback()
@@ -276,51 +969,35 @@ class RoehnProjectConverter:
         """Adiciona um módulo existente a um quadro elétrico específico e atualiza o ACNET"""
         try:
             # Encontrar o módulo pelo nome em todo o projeto
-            target_module = None
-            current_board = None
-            
-            # Procurar em todos os quadros
-            for area in self.project_data["Areas"]:
-                for room in area.get("SubItems", []):
-                    for board in room.get("AutomationBoards", []):
-                        for module in board.get("ModulesList", []):
-                            if module.get("Name") == module_name:
-                                target_module = module
-                                current_board = board
-                                break
-                        if target_module:
-                            break
-                    if target_module:
-                        break
-                if target_module:
-                    break
+            target_module, current_board = self._find_module_in_any_board(module_name)
             
             if not target_module:
-                print(f"Módulo {module_name} não encontrado para mover para o quadro específico")
+                self._log("warning", f"Módulo {module_name} não encontrado para mover para o quadro específico")
                 return False
             
             # Encontrar o quadro de destino
             target_board = self._find_automation_board_by_guid(automation_board_guid)
             if not target_board:
-                print(f"Quadro {automation_board_guid} não encontrado")
+                self._log("warning", f"Quadro {automation_board_guid} não encontrado")
                 return False
             
             # Se o módulo já está no quadro de destino, não faz nada
             if current_board == target_board:
-                print(f"Módulo {module_name} já está no quadro de destino")
+                self._log("debug", f"Módulo {module_name} já está no quadro de destino")
                 return True
             
             # Remover o módulo do quadro atual (se não estiver no quadro de destino)
             if current_board:
                 current_board["ModulesList"] = [m for m in current_board.get("ModulesList", []) if m.get("Name") != module_name]
-                print(f"Módulo {module_name} removido do quadro {current_board.get('Name')}")
+                self._log("debug", f"Módulo {module_name} removido do quadro {current_board.get('Name')}")
             
             # Adicionar ao quadro de destino (garantindo estrutura)
             module_guid = target_module.get("Guid")
             target_board.setdefault("ModulesList", [])
             if not any(m.get("Guid") == module_guid for m in target_board["ModulesList"]):
                 target_board["ModulesList"].append(target_module)
-                print(f"Módulo {module_name} movido para o quadro {target_board.get('Name')}")
+                self._track_module_move(target_module, current_board, target_board)
+                self._log("debug", f"Módulo {module_name} movido para o quadro {target_board.get('Name')}")
             
             # Garantir que o módulo esteja registrado no ACNET do M4
             self._ensure_module_guid_registered_in_acnet(module_guid)
@@ -328,15 +1005,32 @@ class RoehnProjectConverter:
             return True
             
         except Exception as e:
-            print(f"Erro ao mover módulo para quadro específico: {e}")
-            import traceback
-            traceback.print_exc()
+            self._log("error", f"Erro ao mover módulo para quadro específico: {e}")
+            self._log_traceback()
             return False
 
     def process_db_project(self, projeto):
-        """Processa os dados do projeto do banco de dados para o formato Roehn"""
-        print(f"Processando projeto: {projeto.nome}")
-        print(f"Numero de areas: {len(projeto.areas)}")
+        """Processa os dados do projeto do banco de dados para o formato Roehn
+
+        Aceita um ``ProjetoSnapshot`` ou um ``Projeto``; neste caso o snapshot é
+        carregado aqui, em um número fixo de consultas.
+        """
+        stats = self.stats
+        if not isinstance(projeto, ProjetoSnapshot):
+            stats.begin("snapshot")
+            with QueryCounter(self.db_session) as counter:
+                snapshot = load_project_snapshot(self.db_session, projeto.id)
+            if snapshot is None:
+                raise ValueError(f"Projeto {projeto.id} não encontrado")
+            self._log("info", f"Snapshot do projeto carregado em {counter.count} consultas")
+            stats.count("queries", counter.count)
+            projeto = snapshot
+        self._snapshot = projeto
+        # Circuitos por ambiente, para resolver as ações de grupo das cenas
+        self._room_circuits = RoomCircuitIndex.from_snapshot(projeto)
+
+        self._log("info", f"Processando projeto: {projeto.nome}")
+        self._log("info", f"Numero de areas: {len(projeto.areas)}")
 
         self._circuit_guid_map = {}
         self._quadro_guid_map = {}
@@ -346,6 +1040,7 @@ class RoehnProjectConverter:
 
         # Etapa PRE-1: Criar toda a estrutura de Areas, Ambientes e Quadros primeiro
         # para que possamos encontrar o quadro da controladora pelo seu GUID.
+        stats.begin("structure")
         for area in projeto.areas:
             self._ensure_area_exists(area.nome)
             for ambiente in area.ambientes:
@@ -355,13 +1050,11 @@ class RoehnProjectConverter:
                     self._quadro_guid_map[quadro.id] = quadro_guid
 
         # Etapa 1: Encontrar o controlador "Logic Server" e colocá-lo no quadro correto
-        logic_server_module_db = self.db_session.query(Modulo).filter_by(
-            projeto_id=projeto.id,
-            is_logic_server=True
-        ).first()
+        stats.begin("modules")
+        logic_server_module_db = next((m for m in projeto.modulos if m.is_logic_server), None)
 
         if logic_server_module_db:
-            print(f"Logic Server encontrado: {logic_server_module_db.nome} ({logic_server_module_db.tipo})")
+            self._log("info", f"Logic Server encontrado: {logic_server_module_db.nome} ({logic_server_module_db.tipo})")
             main_controller_id = logic_server_module_db.id
             controller_info = {
                 'm4_ip': logic_server_module_db.ip_address,
@@ -371,10 +1064,16 @@ class RoehnProjectConverter:
             controller_module_json = self._create_controller_module(logic_server_module_db.tipo, controller_info)
 
             # Remover a controladora padrão que vem na criação do projeto
-            default_board_modules = self.project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]["ModulesList"]
-            self.project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]["ModulesList"] = [
+            default_board = self.project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]
+            default_board_modules = default_board["ModulesList"]
+            default_board["ModulesList"] = [
                 m for m in default_board_modules if m.get("Logicserver") is not True
             ]
+            for removed in default_board_modules:
+                if removed.get("Logicserver") is True:
+                    self._graph().remove_module(removed)
+                    self._addresses().release(removed, default_board)
+                    self._acnet().remove_controller(removed)
 
             # Encontrar o quadro elétrico associado ao controlador
             target_board_db = logic_server_module_db.quadro_eletrico
@@ -382,31 +1081,37 @@ class RoehnProjectConverter:
                 target_board_guid = self._quadro_guid_map[target_board_db.id]
                 target_board_json = self._find_automation_board_by_guid(target_board_guid)
                 if target_board_json:
-                    print(f"Logic Server alocado no quadro: {target_board_db.nome}")
+                    self._log("info", f"Logic Server alocado no quadro: {target_board_db.nome}")
                     target_board_json.setdefault("ModulesList", []).insert(0, controller_module_json)
+                    self._track_module(controller_module_json, target_board_json)
                 else:
-                    print(f"AVISO: Quadro com GUID {target_board_guid} não encontrado. Alocando no quadro padrão.")
-                    self.project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]["ModulesList"].insert(0, controller_module_json)
+                    self._log("warning", f"AVISO: Quadro com GUID {target_board_guid} não encontrado. Alocando no quadro padrão.")
+                    default_board["ModulesList"].insert(0, controller_module_json)
+                    self._track_module(controller_module_json, default_board)
             else:
-                print("Logic Server não associado a um quadro. Alocando no quadro padrão.")
-                self.project_data["Areas"][0]["SubItems"][0]["AutomationBoards"][0]["ModulesList"].insert(0, controller_module_json)
+                self._log("info", "Logic Server não associado a um quadro. Alocando no quadro padrão.")
+                default_board["ModulesList"].insert(0, controller_module_json)
+                self._track_module(controller_module_json, default_board)
         else:
             # Se nenhum logic server for encontrado, o que não deveria acontecer, loga um erro.
             # A controladora padrão M4 do template inicial será usada.
-            print("ERRO CRÍTICO: Nenhum Logic Server encontrado no projeto. O arquivo RWP pode estar incompleto.")
+            self._log("error", "ERRO CRÍTICO: Nenhum Logic Server encontrado no projeto. O arquivo RWP pode estar incompleto.")
 
         # Etapa 2: Processar todos os outros módulos (controladores ou não)
-        all_modules_db = self.db_session.query(Modulo).filter(Modulo.id != main_controller_id).all()
+        # (somente os módulos deste projeto)
+        all_modules_db = [m for m in projeto.modulos if m.id != main_controller_id]
 
         for modulo_db in all_modules_db:
             quadro_guid = self._quadro_guid_map.get(modulo_db.quadro_eletrico_id)
             self._ensure_module_exists(modulo_db, automation_board_guid=quadro_guid)
 
         # Etapa 3: Processar todos os circuitos e criar seus GUIDs e links físicos
+        stats.begin("circuits")
         for area in projeto.areas:
             for ambiente in area.ambientes:
                 for circuito in ambiente.circuitos:
-                    print(f"Processando circuito: {circuito.identificador} ({circuito.tipo})")
+                    self._log("debug", f"Processando circuito: {circuito.identificador} ({circuito.tipo})")
+                    stats.count("circuits")
                     guid = None
                     try:
                         # Criar o objeto Roehn para CADA circuito e mapear seu GUID
@@ -425,7 +1130,7 @@ class RoehnProjectConverter:
                         elif circuito.tipo == 'hvac':
                             guid = self._add_hvac(area.nome, ambiente.nome, circuito.nome or circuito.identificador)
                         else:
-                            print(f"Tipo de circuito nao suportado: {circuito.tipo}")
+                            self._log("warning", f"Tipo de circuito nao suportado: {circuito.tipo}")
 
                         if guid:
                             self._circuit_guid_map[circuito.id] = guid
@@ -446,53 +1151,63 @@ class RoehnProjectConverter:
                                 elif circuito.tipo == 'hvac':
                                     self._link_hvac_to_module(guid, modulo_nome, canal)
                             elif not modulo_nome:
-                                print(f"Circuito {circuito.identificador} com vinculação, mas sem módulo associado.")
+                                self._log("warning", f"Circuito {circuito.identificador} com vinculação, mas sem módulo associado.")
                         
                     except Exception as exc:
-                        print(f"Erro ao processar circuito {circuito.id}: {exc}")
-                        import traceback
-                        traceback.print_exc()
+                        self._log("error", f"Erro ao processar circuito {circuito.id}: {exc}")
+                        self._log_traceback()
                         continue
         
         # Etapa 2: Processar Keypads e Cenas, agora com o mapa de GUIDs completo
+        stats.end()
         for area in projeto.areas:
             for ambiente in area.ambientes:
-                self._add_keypads_for_room(area.nome, ambiente)
-                self._add_scenes_for_room(area.nome, ambiente)
+                with stats.stage("keypads"):
+                    self._add_keypads_for_room(area.nome, ambiente)
+                with stats.stage("scenes"):
+                    self._add_scenes_for_room(area.nome, ambiente)
 
         # ⭐⭐⭐ NOVO: Verificação final do ACNET
-        print("Realizando verificação final do ACNET...")
+        stats.begin("acnet")
+        self._log("info", "Realizando verificação final do ACNET...")
         self._verify_and_fix_acnet()
         
         # ⭐⭐⭐ NOVO: Log do estado final do ACNET
         self._log_acnet_status()
-        
-        print("✅ Processamento do projeto concluído!")
+        self._log_address_report()
+        stats.end()
+
+        stats.count("unit_ids", self._unit_id_allocator().allocated)
+        stats.count("index_lookups", self._graph().lookups)
+        self._log("info", "✅ Processamento do projeto concluído!")
 
     def _log_acnet_status(self):
         """Log do estado atual do ACNET para debugging"""
         try:
-            _, _, acnet_slot = self._get_m4_module_components()
-            if not acnet_slot:
-                return
-            
-            acnet_guids = [guid for guid in acnet_slot.get("SubItemsGuid", []) if guid != self.zero_guid]
-            print(f"📊 Status do ACNET: {len(acnet_guids)} módulos registrados")
-            
-            # Mapear GUIDs para nomes de módulos
-            for i, guid in enumerate(acnet_slot.get("SubItemsGuid", [])):
-                if guid != self.zero_guid:
-                    module_name = "Desconhecido"
-                    for area in self.project_data["Areas"]:
-                        for room in area.get("SubItems", []):
-                            for board in room.get("AutomationBoards", []):
-                                for module in board.get("ModulesList", []):
-                                    if module.get("Guid") == guid:
-                                        module_name = module.get("Name", "Sem nome")
-                                        break
-                    print(f"  {i+1}. {guid} -> {module_name}")
+            registry = self._acnet()
+            for controller_json, acnet_slot in registry.controllers():
+                if not acnet_slot:
+                    continue
+
+                used = registry.used(acnet_slot)
+                capacity = registry.capacity(acnet_slot)
+                self._log("info", f"📊 Status do ACNET de {controller_json.get('Name')}: {used}/{capacity} módulos registrados")
+                if capacity is not None and used > capacity:
+                    self._log("warning", f"  ⚠️ ACNET de {controller_json.get('Name')} excede a capacidade do slot ({capacity}).")
+
+                # Mapear GUIDs para nomes de módulos
+                if not self._log_enabled("debug"):
+                    continue
+                # Lê o índice direto: as buscas do log não entram em index_lookups,
+                # que assim não muda com o nível de log
+                by_guid = self._graph().by_guid
+                for i, guid in enumerate(acnet_slot.get("SubItemsGuid", [])):
+                    if guid != self.zero_guid:
+                        module = by_guid.get(guid)
+                        module_name = module.get("Name", "Sem nome") if module else "Desconhecido"
+                        self._log("debug", f"  {i+1}. {guid} -> {module_name}")
         except Exception as e:
-            print(f"Erro ao logar status do ACNET: {e}")
+            self._log("error", f"Erro ao logar status do ACNET: {e}")
 
     def _ensure_automation_board_exists(self, area_name, room_name, board_name):
         """Garante que um AutomationBoard existe em um ambiente"""
@@ -500,9 +1215,9 @@ class RoehnProjectConverter:
         room = self._ensure_room_exists(area_name, room_name)
         
         # Verificar se o quadro já existe
-        for board in room.get("AutomationBoards", []):
-            if board["Name"] == board_name:
-                return board["Guid"]
+        board = self._graph().board_by_name(area_name, room_name, board_name)
+        if board is not None:
+            return board["Guid"]
         
         # Criar novo quadro elétrico
         new_board_guid = str(uuid.uuid4())
@@ -517,59 +1232,67 @@ class RoehnProjectConverter:
         if "AutomationBoards" not in room:
             room["AutomationBoards"] = []
         room["AutomationBoards"].append(new_board)
+        self._graph().add_board(area, room, new_board)
         
         return new_board_guid
 
     def _verify_and_fix_acnet(self):
         """Verifica e corrige o ACNET de cada controlador para incluir seus módulos filhos."""
         try:
-            # Encontrar todos os controladores no projeto JSON
-            controllers_json = []
-            for area in self.project_data["Areas"]:
-                for room in area.get("SubItems", []):
-                    for board in room.get("AutomationBoards", []):
-                        for module in board.get("ModulesList", []):
-                            if module.get("DriverGuid") in ["80000000-0000-0000-0000-000000000016", "80000000-0000-0000-0000-000000000018", "80000000-0000-0000-0000-000000000004"]:
-                                controllers_json.append(module)
-            
-            # Mapear Nomes para GUIDs JSON
-            module_name_to_guid = {m.get("Name"): m.get("Guid") for area in self.project_data["Areas"] for room in area.get("SubItems", []) for board in room.get("AutomationBoards", []) for m in board.get("ModulesList", [])}
+            registry = self._acnet()
+            modules_index = self._graph().modules
 
-            for controller_json in controllers_json:
+            # Módulos do projeto e seus filhos (do snapshot ou em uma única consulta)
+            if self._snapshot is not None:
+                modulos_db = self._snapshot.modulos
+            else:
+                modulos_db = (
+                    self.db_session.query(Modulo)
+                    .filter_by(projeto_id=self.projeto_id_db)
+                    .order_by(Modulo.id)
+                    .all()
+                )
+            modulos_by_nome = {}
+            children_by_parent = {}
+            for modulo_db in modulos_db:
+                modulos_by_nome.setdefault(modulo_db.nome, modulo_db)
+                if modulo_db.parent_controller_id is not None:
+                    children_by_parent.setdefault(modulo_db.parent_controller_id, []).append(modulo_db)
+
+            for controller_json, acnet_slot in registry.controllers():
                 controller_name = controller_json.get("Name")
-                print(f"🔧 Verificando ACNET para o controlador: {controller_name}")
+                self._log("debug", f"🔧 Verificando ACNET para o controlador: {controller_name}")
                 
                 # Encontrar o controlador no DB para pegar os filhos
-                controller_db = self.db_session.query(Modulo).filter_by(nome=controller_name, projeto_id=self.projeto_id_db).first()
+                controller_db = modulos_by_nome.get(controller_name)
                 if not controller_db:
-                    print(f"  AVISO: Controlador '{controller_name}' não encontrado no DB.")
+                    self._log("warning", f"  AVISO: Controlador '{controller_name}' não encontrado no DB.")
                     continue
 
                 # Coletar GUIDs dos módulos filhos
                 child_module_guids = set()
-                for child_db in controller_db.child_modules:
-                    child_guid = module_name_to_guid.get(child_db.nome)
+                for child_db in children_by_parent.get(controller_db.id, []):
+                    child_json, _ = modules_index.get(child_db.nome, (None, None))
+                    child_guid = child_json.get("Guid") if child_json else None
                     if child_guid:
                         child_module_guids.add(child_guid)
 
-                acnet_slot = next((s for s in controller_json.get("Slots", []) if s.get("Name") == "ACNET/RNET"), None)
                 if not acnet_slot:
-                    print(f"  ERRO: Slot ACNET/RNET não encontrado para {controller_name}.")
+                    self._log("error", f"  ERRO: Slot ACNET/RNET não encontrado para {controller_name}.")
                     continue
 
                 # Limpar e preencher o ACNET
-                acnet_slot["SubItemsGuid"] = list(child_module_guids)
-                acnet_slot["SubItemsGuid"].append(self.zero_guid)
+                registry.assign(acnet_slot, child_module_guids)
                 
-                print(f"  ✅ ACNET para '{controller_name}' atualizado com {len(child_module_guids)} módulos.")
+                self._log("debug", f"  ✅ ACNET para '{controller_name}' atualizado com {len(child_module_guids)} módulos.")
 
         except Exception as e:
-            print(f"❌ Erro ao verificar/corrigir ACNET: {e}")
-            import traceback
-            traceback.print_exc()
+            self._log("error", f"❌ Erro ao verificar/corrigir ACNET: {e}")
+            self._log_traceback()
 
     def create_project(self, project_info):
         """Cria um projeto base compatível com o ROEHN Wizard"""
+        self.stats.begin("create_project")
         project_guid = str(uuid.uuid4())
         now_iso = datetime.now().isoformat()
         raw_target_board = project_info.get('m4_quadro_id')
@@ -688,7 +1411,15 @@ class RoehnProjectConverter:
             "Notes": None,
             "RoehnAppExport": False,
         }
-        
+
+        # Semeia o alocador de Unit IDs e os índices uma única vez a partir do template
+        self._unit_ids = None
+        self._unit_id_allocator()
+        self._index = ProjectIndex(self.project_data)
+        self._address_space = AddressSpace.from_project(self.project_data)
+        self._acnet_registry = AcnetRegistry.from_project(self.project_data, self.zero_guid)
+        self.stats.end()
+
         return self.project_data
 
     def process_csv(self, csv_content):
@@ -746,9 +1477,9 @@ class RoehnProjectConverter:
 
     def _ensure_area_exists(self, area_name):
         """Garante que uma área existe no projeto Roehn"""
-        for area in self.project_data["Areas"]:
-            if area["Name"] == area_name:
-                return area
+        area = self._graph().area(area_name)
+        if area is not None:
+            return area
         
         # Se a área não existe, cria uma nova
         new_area = {
@@ -770,17 +1501,18 @@ class RoehnProjectConverter:
             "SubItems": []
         }
         self.project_data["Areas"].append(new_area)
+        self._graph().add_area(new_area)
         return new_area
 
     def _ensure_room_exists(self, area_name, room_name, room_id=None):
         """Garante que um ambiente existe em uma área"""
         area = self._ensure_area_exists(area_name)
         
-        for room in area["SubItems"]:
-            if room["Name"] == room_name:
-                if room_id and room_id not in self._room_guid_map:
-                    self._room_guid_map[room_id] = room["Guid"]
-                return room
+        room = self._graph().room(area_name, room_name)
+        if room is not None:
+            if room_id and room_id not in self._room_guid_map:
+                self._room_guid_map[room_id] = room["Guid"]
+            return room
         
         # Se o ambiente não existe, cria um novo
         new_room_guid = str(uuid.uuid4())
@@ -805,18 +1537,43 @@ class RoehnProjectConverter:
             "Guid": new_room_guid
         }
         area["SubItems"].append(new_room)
+        self._graph().add_room(area, new_room)
         if room_id:
             self._room_guid_map[room_id] = new_room_guid
         return new_room
 
     def _find_automation_board_by_guid(self, guid):
         """Encontra um AutomationBoard pelo GUID em todo o projeto"""
-        for area in self.project_data["Areas"]:
-            for room in area.get("SubItems", []):
-                for board in room.get("AutomationBoards", []):
-                    if board.get("Guid") == guid:
-                        return board
-        return None
+        return self._graph().board(guid)
+
+    def _graph(self):
+        """Retorna os índices do projeto, construindo-os se necessário"""
+        if self._index is None:
+            self._index = ProjectIndex(self.project_data)
+        return self._index
+
+    def _addresses(self):
+        """Retorna o espaço de endereços HSNET/DevID, construindo-o se necessário"""
+        if self._address_space is None:
+            self._address_space = AddressSpace.from_project(self.project_data)
+        return self._address_space
+
+    def _acnet(self):
+        """Retorna o registro de ACNET dos controladores, construindo-o se necessário"""
+        if self._acnet_registry is None:
+            self._acnet_registry = AcnetRegistry.from_project(self.project_data, self.zero_guid)
+        return self._acnet_registry
+
+    def _track_module(self, module, board):
+        """Registra um módulo recém-incluído em um quadro nos índices, endereços e ACNET"""
+        self.stats.count("modules")
+        self._graph().add_module(module, board)
+        self._addresses().claim(module, board)
+        self._acnet().add_controller(module)
+
+    def _track_module_move(self, module, from_board, to_board):
+        self._graph().move_module(module, to_board)
+        self._addresses().move(module, from_board, to_board)
 
     def _ensure_module_exists(self, model, module_name=None, automation_board_guid=None):
         """Garantir que um modulo existe no projeto Roehn, opcionalmente em um quadro específico"""
@@ -826,7 +1583,7 @@ class RoehnProjectConverter:
             # Encontrar o AutomationBoard específico
             target_board = self._find_automation_board_by_guid(automation_board_guid)
             if not target_board:
-                print(f"Quadro elétrico {automation_board_guid} não encontrado, usando quadro padrão")
+                self._log("warning", f"Quadro elétrico {automation_board_guid} não encontrado, usando quadro padrão")
                 automation_board_guid = None
         
         if not automation_board_guid:
@@ -853,33 +1610,29 @@ class RoehnProjectConverter:
         if not module_name:
             module_name = "Modulo"
 
+        existing_module, existing_board = self._find_module_in_any_board(module_name)
+
         # Verificar se o módulo já existe NO QUADRO ESPECÍFICO
-        for module in modules_list:
-            if module.get("Name") == module_name:
-                if modulo_obj:
-                    if desired_hsnet is not None:
-                        module["HsnetAddress"] = desired_hsnet
-                    if desired_dev_id is not None:
-                        module["DevID"] = desired_dev_id
-                return module_name
+        if existing_module and existing_board is target_board:
+            if modulo_obj:
+                if desired_hsnet is not None:
+                    self._addresses().set_hsnet(existing_module, desired_hsnet)
+                if desired_dev_id is not None:
+                    self._addresses().set_dev_id(existing_module, target_board, desired_dev_id)
+            return module_name
 
         # ⭐⭐⭐ CORREÇÃO: Se o módulo existe em outro quadro, movê-lo para este quadro
-        existing_module, existing_board = self._find_module_in_any_board(module_name)
         if existing_module and existing_board != target_board:
             # Remover do quadro antigo
             existing_board["ModulesList"] = [m for m in existing_board.get("ModulesList", []) if m.get("Name") != module_name]
             # Adicionar ao novo quadro
             modules_list.append(existing_module)
-            print(f"Módulo {module_name} movido de {existing_board.get('Name')} para {target_board.get('Name')}")
+            self._track_module_move(existing_module, existing_board, target_board)
+            self._log("debug", f"Módulo {module_name} movido de {existing_board.get('Name')} para {target_board.get('Name')}")
             return module_name
 
         # Encontrar HSNET disponível
-        if desired_hsnet is not None and not self._is_hsnet_duplicate(desired_hsnet):
-            hsnet = desired_hsnet
-        else:
-            hsnet = self._find_max_hsnet() + 1
-            while self._is_hsnet_duplicate(hsnet):
-                hsnet += 1
+        hsnet = self._addresses().next_hsnet(desired_hsnet)
 
         if desired_dev_id is not None:
             dev_id = desired_dev_id
@@ -905,9 +1658,17 @@ class RoehnProjectConverter:
         elif "ADP-M16" in key:
             self._create_controller_as_module("ADP-M16", module_name, hsnet, dev_id, target_board, ip_address=modulo_obj.ip_address if modulo_obj else '0.0.0.0')
         else:
-            print(f"Tipo de módulo desconhecido '{key}', criando como ADP-RL12 por padrão.")
+            self._log("warning", f"Tipo de módulo desconhecido '{key}', criando como ADP-RL12 por padrão.")
             self._create_rl12_module(module_name, hsnet, dev_id, target_board)
 
+        # Controladores usam HSNET/DevID próprios; registra o que foi de fato emitido
+        created_module, _ = self._find_module_in_any_board(module_name)
+        if created_module:
+            self._addresses().record(
+                module_name, key, desired_hsnet, created_module.get("HsnetAddress"),
+                desired_dev_id, created_module.get("DevID"),
+            )
+
         return module_name
 
     def _create_controller_as_module(self, controller_type, name, hsnet_address, dev_id, target_board=None, ip_address='0.0.0.0'):
@@ -926,303 +1687,51 @@ class RoehnProjectConverter:
 
         self._add_module_to_project(module_json, module_json["Guid"], target_board)
 
+    def _new_module(self, kind, name, hsnet_address, dev_id, first_unit_id=None):
+        """Instancia o template MODULE_TEMPLATES[kind] preenchendo só os campos da instância."""
+        new_module = _clone_module(MODULE_TEMPLATES[kind])
+        new_module["Name"] = name
+        new_module["Guid"] = str(uuid.uuid4())
+        new_module["HsnetAddress"] = hsnet_address
+        new_module["DevID"] = dev_id
+        if first_unit_id is not None:
+            for offset, composer in enumerate(_module_unit_composers(new_module)):
+                composer["Unit"]["Id"] = first_unit_id + offset
+        return new_module
+
     def _create_rl4_module(self, name, hsnet_address, dev_id, target_board=None):
         """Cria um módulo RL4"""
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000010",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": None,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 4,
-                    "SlotType": 1,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 4,
-                    "Name": "Load ON/OFF"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-        self._add_module_to_project(new_module, new_module_guid, target_board)
+        new_module = self._new_module("RL4", name, hsnet_address, dev_id)
+        self._add_module_to_project(new_module, new_module["Guid"], target_board)
 
     def _create_lx4_module(self, name, hsnet_address, dev_id, target_board=None):
         """Cria um módulo LX4"""
-        next_unit_id = self._find_max_unit_id() + 1
-        unit_composers = []
-        for i in range(4):
-            for j in range(4):
-                unit_composers.append({
-                    "$type": "UnitComposer",
-                    "Name": f"Opening Percentage {i+1} {j+1}",
-                    "Unit": {
-                        "$type": "Unit",
-                        "Id": next_unit_id,
-                        "Event": 0,
-                        "Scene": 0,
-                        "Disabled": False,
-                        "Logged": False,
-                        "Memo": False,
-                        "Increment": False
-                    },
-                    "PortNumber": 1 if j % 2 == 0 else 5,
-                    "PortType": 6,
-                    "NotProgrammable": False,
-                    "Kind": 1,
-                    "IO": 1 if j % 2 == 0 else 0,
-                    "Value": 0
-                })
-                next_unit_id += 1
-
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000003",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": unit_composers,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 4,
-                    "SlotType": 7,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 4,
-                    "Name": "Shade"
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 6,
-                    "SlotType": 6,
-                    "InitialPort": 1,
-                    "IO": 0,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 6,
-                    "Name": "PNET"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-        self._add_module_to_project(new_module, new_module_guid, target_board)
+        next_unit_id = self._unit_id_allocator().reserve(MODULE_UNIT_COUNTS["LX4"])
+        new_module = self._new_module("LX4", name, hsnet_address, dev_id, next_unit_id)
+        self._add_module_to_project(new_module, new_module["Guid"], target_board)
 
     def _create_sa1_module(self, name, hsnet_address, dev_id, target_board=None):
         """Cria um módulo SA1"""
-        next_unit_id = self._find_max_unit_id() + 1
-        unit_composers = []
-        composers_data = [
-            {"Name": "Power", "PortNumber": 1, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Mode", "PortNumber": 2, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Fan Speed", "PortNumber": 4, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Swing", "PortNumber": 5, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Temp Up", "PortNumber": 11, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Temp Down", "PortNumber": 12, "PortType": 600, "NotProgrammable": False, "Kind": 1, "IO": 1},
-            {"Name": "Display/Light", "PortNumber": 3, "PortType": 100, "NotProgrammable": False, "Kind": 0, "IO": 1},
-        ]
-        for composer in composers_data:
-            unit_composers.append({
-                "$type": "UnitComposer",
-                "Name": composer["Name"],
-                "Unit": {
-                    "$type": "Unit",
-                    "Id": next_unit_id,
-                    "Event": 0,
-                    "Scene": 0,
-                    "Disabled": False,
-                    "Logged": False,
-                    "Memo": False,
-                    "Increment": False
-                },
-                "PortNumber": composer["PortNumber"],
-                "PortType": composer["PortType"],
-                "NotProgrammable": composer["NotProgrammable"],
-                "Kind": composer["Kind"],
-                "IO": composer["IO"],
-                "Value": 0
-            })
-            next_unit_id += 1
-
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "ModuleHVAC",
-            "SubItemComposers": [unit_composers],
-            "GTWItemComposers": [],
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000013",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 1,
-                    "SlotType": 4,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"],
-                    "Name": "IR"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-
-        self._add_module_to_project(new_module, new_module_guid, target_board)
+        next_unit_id = self._unit_id_allocator().reserve(MODULE_UNIT_COUNTS["SA1"])
+        new_module = self._new_module("SA1", name, hsnet_address, dev_id, next_unit_id)
+        self._add_module_to_project(new_module, new_module["Guid"], target_board)
 
     def _create_dim8_module(self, name, hsnet_address, dev_id, target_board=None):
         """Cria um módulo DIM8"""
-        new_module_guid = str(uuid.uuid4())
-        zero = "00000000-0000-0000-0000-000000000000"
-
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000001",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": None,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 8,
-                    "SlotType": 2,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": [zero] * 8,
-                    "Name": "Load Dim"
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 6,
-                    "SlotType": 6,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": [zero] * 6,
-                    "Name": "PNET"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-
-        self._add_module_to_project(new_module, new_module_guid, target_board)
+        new_module = self._new_module("DIM8", name, hsnet_address, dev_id)
+        self._add_module_to_project(new_module, new_module["Guid"], target_board)
 
     def _create_rl12_module(self, name, hsnet_address, dev_id, target_board=None):
         """Cria um módulo RL12"""
-        new_module_guid = str(uuid.uuid4())
-        new_module = {
-            "$type": "Module",
-            "Name": name,
-            "DriverGuid": "80000000-0000-0000-0000-000000000006",
-            "Guid": new_module_guid,
-            "IpAddress": "",
-            "HsnetAddress": hsnet_address,
-            "PollTiming": 0,
-            "Disabled": False,
-            "RemotePort": 0,
-            "RemoteIpAddress": "",
-            "Notes": None,
-            "Logicserver": False,
-            "DevID": dev_id,
-            "DevIDSlave": 0,
-            "UnitComposers": None,
-            "Slots": [
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 12,
-                    "SlotType": 1,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 12,
-                    "Name": "Load ON/OFF"
-                },
-                {
-                    "$type": "Slot",
-                    "SlotCapacity": 6,
-                    "SlotType": 6,
-                    "InitialPort": 1,
-                    "IO": 1,
-                    "UnitComposers": None,
-                    "SubItemsGuid": ["00000000-0000-0000-0000-000000000000"] * 6,
-                    "Name": "PNET"
-                }
-            ],
-            "SmartGroup": 1,
-            "UserInterfaceGuid": "00000000-0000-0000-0000-000000000000",
-            "PIRSensorReportEnable": False,
-            "PIRSensorReportID": 0
-        }
-        self._add_module_to_project(new_module, new_module_guid, target_board)
+        new_module = self._new_module("RL12", name, hsnet_address, dev_id)
+        self._add_module_to_project(new_module, new_module["Guid"], target_board)
 
     # Implementar métodos similares para outros tipos de módulos:
     # _create_rl4_module, _create_lx4_module, _create_sa1_module, _create_dim8_module
 
     def _find_module_in_any_board(self, module_name):
         """Procura um módulo pelo nome em todos os quadros elétricos do projeto"""
-        for area in self.project_data["Areas"]:
-            for room in area.get("SubItems", []):
-                for board in room.get("AutomationBoards", []):
-                    for module in board.get("ModulesList", []):
-                        if module.get("Name") == module_name:
-                            return module, board
-        return None, None
+        return self._graph().module(module_name)
 
     def _get_m4_module_components(self):
         """Retorna o módulo M4, o quadro em que ele está e o slot ACNET associado."""
@@ -1249,16 +1758,7 @@ class RoehnProjectConverter:
         _, _, acnet_slot = self._get_m4_module_components()
         if not acnet_slot:
             return
-        subitems = acnet_slot.setdefault("SubItemsGuid", [])
-        if module_guid in subitems:
-            return
-        for idx, guid in enumerate(subitems):
-            if guid == self.zero_guid:
-                subitems[idx] = module_guid
-                return
-        subitems.append(module_guid)
-        if subitems[-1] != self.zero_guid:
-            subitems.append(self.zero_guid)
+        self._acnet().register(acnet_slot, module_guid)
 
     def _move_m4_to_selected_board(self):
         """Move o módulo M4 para o quadro elétrico selecionado, caso indicado pelo usuário."""
@@ -1267,15 +1767,15 @@ class RoehnProjectConverter:
             return
         board_guid = self._quadro_guid_map.get(target_id)
         if not board_guid:
-            print(f"⚠️  Quadro selecionado para o M4 (ID {target_id}) não encontrado no mapa de GUIDs.")
+            self._log("warning", f"⚠️  Quadro selecionado para o M4 (ID {target_id}) não encontrado no mapa de GUIDs.")
             return
         target_board = self._find_automation_board_by_guid(board_guid)
         if not target_board:
-            print(f"⚠️  Quadro GUID {board_guid} não encontrado na estrutura do projeto.")
+            self._log("warning", f"⚠️  Quadro GUID {board_guid} não encontrado na estrutura do projeto.")
             return
         m4_module, current_board, _ = self._get_m4_module_components()
         if not m4_module:
-            print("⚠️  Módulo M4 não encontrado no projeto Roehn.")
+            self._log("warning", "⚠️  Módulo M4 não encontrado no projeto Roehn.")
             return
         if current_board == target_board:
             return
@@ -1291,7 +1791,8 @@ class RoehnProjectConverter:
         target_board.setdefault("ModulesList", [])
         if not any(m.get("Guid") == m4_module.get("Guid") for m in target_board["ModulesList"]):
             target_board["ModulesList"].insert(0, m4_module)
-            print(f"✅ Módulo M4 movido para o quadro {target_board.get('Name')}")
+            self._track_module_move(m4_module, current_board, target_board)
+            self._log("info", f"✅ Módulo M4 movido para o quadro {target_board.get('Name')}")
 
     def _add_module_to_project(self, new_module, new_module_guid, target_board=None):
         """Adiciona um módulo ao AutomationBoard especificado e ao ACNET do M4"""
@@ -1302,6 +1803,7 @@ class RoehnProjectConverter:
         target_board.setdefault("ModulesList", [])
         modules_list = target_board["ModulesList"]
         modules_list.append(new_module)
+        self._track_module(new_module, target_board)
 
         # Garantir que o módulo esteja registrado no ACNET do M4
         self._ensure_module_guid_registered_in_acnet(new_module_guid)
@@ -1311,65 +1813,30 @@ class RoehnProjectConverter:
         if not keypads:
             return
         
-        print(f"Processing keypads for room: {ambiente.nome} (ID: {ambiente.id})")
+        self._log("debug", f"Processing keypads for room: {ambiente.nome} (ID: {ambiente.id})")
 
-        try:
-            area_idx = next(i for i, area in enumerate(self.project_data["Areas"]) if area.get("Name") == area_name)
-        except StopIteration:
+        room = self._graph().room(area_name, ambiente.nome)
+        if room is None:
             return
 
-        subitems = self.project_data["Areas"][area_idx].get("SubItems", [])
-        try:
-            room_idx = next(i for i, room in enumerate(subitems) if room.get("Name") == ambiente.nome)
-        except StopIteration:
-            return
-
-        room = subitems[room_idx]
         user_interfaces = room.setdefault("UserInterfaces", [])
         for keypad in keypads:
-            print(f"  - Building payload for keypad: {keypad.nome} (ID: {keypad.id})")
-            payload = self._build_keypad_payload(area_idx, room_idx, keypad)
+            self._log("debug", f"  - Building payload for keypad: {keypad.nome} (ID: {keypad.id})")
+            payload = self._build_keypad_payload(keypad)
             user_interfaces.append(payload)
+            self.stats.count("keypads")
+            self._graph().add_guid(payload)
+            self._addresses().claim(payload)
+            self._addresses().record(
+                payload["Name"], "keypad", keypad.hsnet, payload["HsnetAddress"], keypad.dev_id, payload["DevID"]
+            )
             self._register_user_interface_guid(payload["Guid"])
 
-    def _build_keypad_payload(self, area_idx, room_idx, keypad):
+    def _build_keypad_payload(self, keypad):
         zero_guid = self.zero_guid
         keypad_guid = str(uuid.uuid4())
         
-        print(f"    - Building keypad payload for: {keypad.nome}")
-
-        base_unit_id = self._find_max_unit_id() + 1
-
-        def next_unit_id():
-            nonlocal base_unit_id
-            unit_id = base_unit_id
-            base_unit_id += 1
-            return unit_id
-
-        def make_unit(unit_id):
-            return {
-                "$type": "Unit",
-                "Id": unit_id,
-                "Event": 0,
-                "Scene": 0,
-                "Disabled": False,
-                "Logged": False,
-                "Memo": False,
-                "Increment": False,
-            }
-
-        def make_composer(name, port_number, port_type, kind, io):
-            return {
-                "$type": "UnitComposer",
-                "Name": name,
-                "Unit": make_unit(next_unit_id()),
-                "PortNumber": port_number,
-                "PortType": port_type,
-                "NotProgrammable": False,
-                "Kind": kind,
-                "IO": io,
-                "Value": 0,
-            }
+        self._log("debug", f"    - Building keypad payload for: {keypad.nome}")
 
         color_value = (keypad.color or "WHITE").upper()
         button_color_value = (keypad.button_color or "WHITE").upper()
@@ -1378,60 +1845,51 @@ class RoehnProjectConverter:
         hsnet_address = keypad.hsnet if keypad.hsnet is not None else 0
         dev_id = keypad.dev_id if keypad.dev_id is not None else hsnet_address
 
-        payload = {
-            "$type": "Keypad",
-            "DriverGuid": self.keypad_driver_guid,
-            "ModuleInterface": False,
-            "Keypad4x4": False,
-            "HsnetAddress": hsnet_address,
-            "TipoEntrada1ChaveLD": 0,
-            "TipoEntrada2ChaveLD": 0,
-            "UnitEntradaDigital1": make_composer("UnitEntradaDigital1", 1, 0, 0, 0),
-            "UnitEntradaDigital2": make_composer("UnitEntradaDigital2", 2, 0, 0, 0),
-            "UnitAnyKey": make_composer("UnitAnyKey", 3, 0, 0, 0),
-            "BrightUnit": 0,
-            "UnitBrightnessColor1": make_composer("UnitBrightnessColor1", 1, 600, 1, 1),
-            "UnitBrightnessColor2": make_composer("UnitBrightnessColor2", 2, 600, 1, 1),
-            "UnitBeepProfile": make_composer("UnitBeepProfile", 3, 600, 1, 1),
-            "UnitVolumeProfile": make_composer("UnitVolumeProfile", 4, 600, 1, 1),
-            "UnitVolumeKey": make_composer("UnitVolumeKey", 5, 0, 0, 0),
-            "UnitBlockedKeypad": make_composer("UnitBlockedKeypad", 1, 100, 0, 1),
-            "UnitPIN32": make_composer("UnitPIN32", 1, 1100, 1, 0),
-            "NightModeGroup": 0,
-            "LightSensorMode": 0,
-            "LightSensorMasterID": 0,
-            "DevID": dev_id,
-            "ListKeypadButtons": [],
-            "ListKeypadButtonsLayout2": [],
-            "ProfileGuid": self.keypad_profile_guid,
-            "ButtonCountLayout2": 0,
-            "ButtonLayout2": 0,
-            "Slots": [],
-            "hold": 0,
-            "ButtonLayout1": button_layout,
-            "ModelName": keypad.modelo or "RQR-K",
-            "Color": color_value,
-            "ButtonColor": button_color_value,
-            "Name": keypad.nome or "RQR-K",
-            "Notes": keypad.notes,
-            "Guid": keypad_guid,
-            "ButtonCount": button_count,
-        }
+        buttons = [
+            button for button in sorted(keypad.buttons, key=lambda b: b.ordem or 0)
+            if not (button.ordem and button.ordem > button_count)
+        ]
+        # 10 UnitComposers fixos do keypad + 4 por botão, em um bloco contíguo
+        base_unit_id = self._unit_id_allocator().reserve(
+            len(KEYPAD_UNIT_COMPOSERS) + len(KEYPAD_BUTTON_UNIT_COMPOSERS) * len(buttons)
+        )
+
+        def make_composer(name, port_number, port_type, kind, io_dir):
+            nonlocal base_unit_id
+            composer = _unit_composer(name, port_number, port_type, kind, io_dir)
+            composer["Unit"]["Id"] = base_unit_id
+            base_unit_id += 1
+            return composer
+
+        payload = dict(KEYPAD_TEMPLATE)
+        payload["HsnetAddress"] = hsnet_address
+        for name, port_number, port_type, kind, io_dir in KEYPAD_UNIT_COMPOSERS:
+            payload[name] = make_composer(name, port_number, port_type, kind, io_dir)
+        payload["DevID"] = dev_id
+        payload["ListKeypadButtons"] = []
+        payload["ListKeypadButtonsLayout2"] = []
+        payload["Slots"] = []
+        payload["ButtonLayout1"] = button_layout
+        payload["ModelName"] = keypad.modelo or "RQR-K"
+        payload["Color"] = color_value
+        payload["ButtonColor"] = button_color_value
+        payload["Name"] = keypad.nome or "RQR-K"
+        payload["Notes"] = keypad.notes
+        payload["Guid"] = keypad_guid
+        payload["ButtonCount"] = button_count
 
         primary_ports = [1, 2, 3, 4]
         secondary_ports = [5, 6, 7, 8]
 
-        for button in sorted(keypad.buttons, key=lambda b: b.ordem or 0):
-            if button.ordem and button.ordem > button_count:
-                continue
+        for button in buttons:
             index = (button.ordem - 1) if button.ordem else 0
             primary_port = primary_ports[index % len(primary_ports)]
             secondary_port = secondary_ports[index % len(secondary_ports)]
 
-            unit_key = make_composer("UnitKey", primary_port, 300, 0, 0)
-            unit_led = make_composer("UnitLed", primary_port, 200, 1, 1)
-            unit_secondary_key = make_composer("UnitSecondaryKey", secondary_port, 300, 0, 0)
-            unit_secondary_led = make_composer("UnitSecondaryLed", secondary_port, 200, 1, 1)
+            unit_composers = [
+                (name, make_composer(name, secondary_port if secondary else primary_port, port_type, kind, io_dir))
+                for name, secondary, port_type, kind, io_dir in KEYPAD_BUTTON_UNIT_COMPOSERS
+            ]
 
             target_guid = zero_guid
             circuito = button.circuito
@@ -1439,15 +1897,15 @@ class RoehnProjectConverter:
 
             if cena:
                 target_guid = cena.guid
-                print(f"      - Button {button.ordem}: Linked to scene '{cena.nome}' (ID: {cena.id}) -> GUID: {target_guid}")
+                self._log("debug", f"      - Button {button.ordem}: Linked to scene '{cena.nome}' (ID: {cena.id}) -> GUID: {target_guid}")
             elif circuito and circuito.id in self._circuit_guid_map:
                 target_guid = self._circuit_guid_map[circuito.id]
-                print(f"      - Button {button.ordem}: Linked to circuit '{circuito.nome}' (ID: {circuito.id}) -> GUID: {target_guid}")
+                self._log("debug", f"      - Button {button.ordem}: Linked to circuit '{circuito.nome}' (ID: {circuito.id}) -> GUID: {target_guid}")
             else:
                 if circuito:
-                    print(f"      - Button {button.ordem}: WARNING - Circuit '{circuito.nome}' (ID: {circuito.id}) found but its GUID is not in the map.")
+                    self._log("warning", f"      - Button {button.ordem}: WARNING - Circuit '{circuito.nome}' (ID: {circuito.id}) found but its GUID is not in the map.")
                 else:
-                    print(f"      - Button {button.ordem}: Not linked.")
+                    self._log("debug", f"      - Button {button.ordem}: Not linked.")
 
             style_properties = None
             button_style_guid = zero_guid
@@ -1489,34 +1947,21 @@ class RoehnProjectConverter:
                     "STYLE_PROP_ROCKER_ICON": None,
                 }
 
-            button_payload = {
-                "$type": "RockerKeypadButton",
-                "StylePropertiesSerializable": style_properties,
-                "DoublePressDelay": False,
-                "TargetDoubleObjectGuid": zero_guid,
-                "ModoDoublePress": button.modo_double_press or 3,
-                "CommandDoublePress": button.command_double_press or 0,
-                "PortNumberDoublePress": 0,
-                "CanHold": bool(button.can_hold),
-                "Guid": button.guid or str(uuid.uuid4()),
-                "TargetObjectGuid": target_guid,
-                "Modo": button.modo,
-                "CommandOn": button.command_on,
-                "CommandOff": button.command_off,
-                "PortNumber": 0,
-                "UnitControleLed": 0,
-                "LedColor": 0,
-                "Vincled": False,
-                "TimeFeedBack": 0,
-                "UnitKey": unit_key,
-                "UnitLed": unit_led,
-                "UnitSecondaryKey": unit_secondary_key,
-                "UnitSecondaryLed": unit_secondary_led,
-                "ButtonStyleGuid": button_style_guid,
-                "EngraverText": button.engraver_text,
-                "Automode": True,
-            }
+            button_payload = dict(KEYPAD_BUTTON_TEMPLATE)
+            button_payload["StylePropertiesSerializable"] = style_properties
+            button_payload["ModoDoublePress"] = button.modo_double_press or 3
+            button_payload["CommandDoublePress"] = button.command_double_press or 0
+            button_payload["CanHold"] = bool(button.can_hold)
+            button_payload["Guid"] = button.guid or str(uuid.uuid4())
+            button_payload["TargetObjectGuid"] = target_guid
+            button_payload["Modo"] = button.modo
+            button_payload["CommandOn"] = button.command_on
+            button_payload["CommandOff"] = button.command_off
+            button_payload.update(unit_composers)
+            button_payload["ButtonStyleGuid"] = button_style_guid
+            button_payload["EngraverText"] = button.engraver_text
             payload["ListKeypadButtons"].append(button_payload)
+            self.stats.count("keypad_buttons")
 
         return payload
 
@@ -1536,81 +1981,40 @@ class RoehnProjectConverter:
         if acnet_slot is None:
             return
 
-        subitems = acnet_slot.setdefault("SubItemsGuid", [])
-        if ui_guid in subitems:
-            return
-
-        for index, guid in enumerate(subitems):
-            if guid == self.zero_guid:
-                subitems[index] = ui_guid
-                break
-        else:
-            subitems.append(ui_guid)
-
-        if subitems and subitems[-1] != self.zero_guid:
-            subitems.append(self.zero_guid)
+        self._acnet().register(acnet_slot, ui_guid)
 
     def _find_max_dev_id(self):
-        """Encontra o maior DevID atual"""
-        max_id = 0
+        """Encontra o maior DevID atual (módulos do quadro padrão)"""
         if not self.project_data:
-            return max_id
-            
-        try:
-            modules = self.project_data['Areas'][0]['SubItems'][0]['AutomationBoards'][0]['ModulesList']
-            for module in modules:
-                if 'DevID' in module and module['DevID'] > max_id:
-                    max_id = module['DevID']
-        except (KeyError, IndexError):
-            pass
-            
-        return max_id
+            return 0
+        return self._addresses().max_dev_id()
 
     def _find_max_hsnet(self):
         """Encontra o maior HSNET em TODO o projeto"""
-        max_addr = 100
-        
-        for area in self.project_data["Areas"]:
-            for room in area.get("SubItems", []):
-                # Verificar módulos nos quadros elétricos
-                for board in room.get("AutomationBoards", []):
-                    for module in board.get("ModulesList", []):
-                        addr = module.get("HsnetAddress", 0)
-                        if addr > max_addr:
-                            max_addr = addr
-                
-                # Verificar keypads no ambiente
-                for ui in room.get("UserInterfaces", []):
-                    addr = ui.get("HsnetAddress", 0)
-                    if addr > max_addr:
-                        max_addr = addr
-        
-        return max_addr
+        return self._addresses().max_hsnet()
 
     def _is_hsnet_duplicate(self, hsnet_address):
         """Verifica se um endereço HSNET já está em uso em TODO o projeto"""
-        # Verificar em todos os quadros elétricos
-        for area in self.project_data["Areas"]:
-            for room in area.get("SubItems", []):
-                # Verificar módulos nos quadros elétricos
-                for board in room.get("AutomationBoards", []):
-                    for module in board.get("ModulesList", []):
-                        if module.get("HsnetAddress") == hsnet_address:
-                            return True
-                
-                # Verificar keypads no ambiente
-                for ui in room.get("UserInterfaces", []):
-                    if ui.get("HsnetAddress") == hsnet_address:
-                        return True
-        
-        return False
+        return self._addresses().is_hsnet_used(hsnet_address)
+
+    def _log_address_report(self):
+        """Loga os módulos e keypads cujo HSNET/DevID foi reatribuído"""
+        reassigned = self._addresses().reassigned()
+        if not reassigned:
+            return
+        self._log("info", f"📊 Endereços reatribuídos: {len(reassigned)}")
+        for name, info in reassigned.items():
+            self._log(
+                "debug",
+                f"  {name}: HSNET {info['hsnet_solicitado']} -> {info['hsnet']}, "
+                f"DevID {info['dev_id_solicitado']} -> {info['dev_id']}"
+            )
 
     def _add_shade(self, area, ambiente, name, description="Persiana"):
         """Adiciona uma persiana ao projeto"""
-        area_idx = next(i for i, a in enumerate(self.project_data["Areas"]) if a["Name"] == area)
-        room_idx = next(i for i, r in enumerate(self.project_data["Areas"][area_idx]["SubItems"]) if r["Name"] == ambiente)
+        room = self._graph().rooms[(area, ambiente)]
 
-        next_unit_id = self._find_max_unit_id() + 1
+        next_unit_id = self._unit_id_allocator().reserve(3)
 
         new_shade = {
             "$type": "Shade",
@@ -1651,13 +2055,14 @@ class RoehnProjectConverter:
             "Guid": str(uuid.uuid4()),
             "Description": description
         }
-        self.project_data["Areas"][area_idx]["SubItems"][room_idx]["LoadOutputs"].append(new_shade)
+        room["LoadOutputs"].append(new_shade)
+        self.stats.count("shades")
+        self._graph().add_guid(new_shade)
         return new_shade["Guid"]
 
     def _add_hvac(self, area, ambiente, name, description="HVAC"):
         """Adiciona um HVAC ao projeto"""
-        area_idx = next(i for i, a in enumerate(self.project_data["Areas"]) if a["Name"] == area)
-        room_idx = next(i for i, r in enumerate(self.project_data["Areas"][area_idx]["SubItems"]) if r["Name"] == ambiente)
+        room = self._graph().rooms[(area, ambiente)]
 
         new_hvac = {
             "$type": "HVAC",
@@ -1669,14 +2074,16 @@ class RoehnProjectConverter:
             "Description": description
         }
 
-        self.project_data["Areas"][area_idx]["SubItems"][room_idx]["LoadOutputs"].append(new_hvac)
+        room["LoadOutputs"].append(new_hvac)
+        self.stats.count("hvacs")
+        self._graph().add_guid(new_hvac)
         return new_hvac["Guid"]
 
     def _link_shade_to_module(self, shade_guid, module_name, canal):
         """Vincula uma persiana a um módulo (em qualquer quadro)"""
         module, board = self._find_module_in_any_board(module_name)
         if not module:
-            print(f"Módulo {module_name} não encontrado para vinculação de persiana")
+            self._log("warning", f"Módulo {module_name} não encontrado para vinculação de persiana")
             return False
 
         try:
@@ -1692,27 +2099,27 @@ class RoehnProjectConverter:
                         
                         # Verificar se o canal é válido
                         if canal < 1 or canal > len(slot['SubItemsGuid']):
-                            print(f"Canal {canal} inválido para slot {wanted_slot} (capacidade: {len(slot['SubItemsGuid'])})")
+                            self._log("warning", f"Canal {canal} inválido para slot {wanted_slot} (capacidade: {len(slot['SubItemsGuid'])})")
                             continue
                         
                         # Vincular a persiana ao canal
                         slot['SubItemsGuid'][canal-1] = shade_guid
-                        print(f"Persiana vinculada ao módulo {module_name}, slot: {wanted_slot}, canal: {canal}")
+                        self._log("debug", f"Persiana vinculada ao módulo {module_name}, slot: {wanted_slot}, canal: {canal}")
                         return True
             
             # Se não encontrou slot compatível, tentar fallback genérico
-            print(f"Nenhum slot compatível encontrado para persiana no módulo {module_name}")
+            self._log("warning", f"Nenhum slot compatível encontrado para persiana no módulo {module_name}")
             return False
             
         except Exception as e:
-            print(f"Erro ao linkar persiana: {e}")
+            self._log("error", f"Erro ao linkar persiana: {e}")
             return False
 
     def _link_hvac_to_module(self, hvac_guid, module_name, canal):
         """Vincula um HVAC a um módulo (em qualquer quadro)"""
         module, board = self._find_module_in_any_board(module_name)
         if not module:
-            print(f"Módulo {module_name} não encontrado para vinculação de HVAC")
+            self._log("warning", f"Módulo {module_name} não encontrado para vinculação de HVAC")
             return False
 
         try:
@@ -1728,29 +2135,28 @@ class RoehnProjectConverter:
                         
                         # Verificar se o canal é válido
                         if canal < 1 or canal > len(slot['SubItemsGuid']):
-                            print(f"Canal {canal} inválido para slot {wanted_slot} (capacidade: {len(slot['SubItemsGuid'])})")
+                            self._log("warning", f"Canal {canal} inválido para slot {wanted_slot} (capacidade: {len(slot['SubItemsGuid'])})")
                             continue
                         
                         # Vincular o HVAC ao canal
                         slot['SubItemsGuid'][canal-1] = hvac_guid
-                        print(f"HVAC vinculado ao módulo {module_name}, slot: {wanted_slot}, canal: {canal}")
+                        self._log("debug", f"HVAC vinculado ao módulo {module_name}, slot: {wanted_slot}, canal: {canal}")
                         return True
             
             # Se não encontrou slot compatível, tentar fallback genérico
-            print(f"Nenhum slot compatível encontrado para HVAC no módulo {module_name}")
+            self._log("warning", f"Nenhum slot compatível encontrado para HVAC no módulo {module_name}")
             return False
             
         except Exception as e:
-            print(f"Erro ao linkar HVAC: {e}")
+            self._log("error", f"Erro ao linkar HVAC: {e}")
             return False
 
 
     def _add_load(self, area, ambiente, name, power=0.0, description="ON/OFF", dimerizavel=False):
         """Adiciona um circuito de iluminação"""
-        area_idx = next(i for i, a in enumerate(self.project_data["Areas"]) if a["Name"] == area)
-        room_idx = next(i for i, r in enumerate(self.project_data["Areas"][area_idx]["SubItems"]) if r["Name"] == ambiente)
+        room = self._graph().rooms[(area, ambiente)]
 
-        next_unit_id = self._find_max_unit_id() + 1
+        next_unit_id = self._unit_id_allocator().next()
 
         if dimerizavel:
             load_type = 2
@@ -1781,10 +2187,21 @@ class RoehnProjectConverter:
             "Guid": str(uuid.uuid4()),
             "Description": description
         }
-        self.project_data["Areas"][area_idx]["SubItems"][room_idx]["LoadOutputs"].append(new_load)
+        room["LoadOutputs"].append(new_load)
+        self.stats.count("loads")
+        self._graph().add_guid(new_load)
         return new_load["Guid"]
 
 
+    def _unit_id_allocator(self):
+        """Retorna o alocador de Unit IDs, semeando-o pela varredura se necessário"""
+        if self._unit_ids is None:
+            self._unit_ids = UnitIdAllocator(
+                self._find_max_unit_id() + 1,
+                scan=self._find_max_unit_id if self.unit_id_debug else None,
+            )
+        return self._unit_ids
+
     def _find_max_unit_id(self):
         """Encontra o maior Unit ID atual, considerando UnitComposers"""
         max_id = 0
@@ -1815,7 +2232,7 @@ class RoehnProjectConverter:
         """Vincula um circuito de iluminação a um módulo (em qualquer quadro)"""
         module, board = self._find_module_in_any_board(module_name)
         if not module:
-            print(f"Módulo {module_name} não encontrado para vinculação")
+            self._log("warning", f"Módulo {module_name} não encontrado para vinculação")
             return False
 
         try:
@@ -1831,10 +2248,10 @@ class RoehnProjectConverter:
                         while len(slot['SubItemsGuid']) < slot.get('SlotCapacity', 0):
                             slot['SubItemsGuid'].append("00000000-0000-0000-0000-000000000000")
                         slot['SubItemsGuid'][canal-1] = load_guid
-                        print(f"Circuito vinculado ao módulo {module_name}, slot: {wanted_slot}, canal: {canal}")
+                        self._log("debug", f"Circuito vinculado ao módulo {module_name}, slot: {wanted_slot}, canal: {canal}")
                         return True
         except Exception as e:
-            print(f"Erro ao linkar load: {e}")
+            self._log("error", f"Erro ao linkar load: {e}")
         return False
 
     def _add_scenes_for_room(self, area_name, ambiente):
@@ -1842,17 +2259,15 @@ class RoehnProjectConverter:
         if not hasattr(ambiente, "cenas") or not ambiente.cenas:
             return
 
-        try:
-            area_json = next(a for a in self.project_data["Areas"] if a.get("Name") == area_name)
-            room_json = next(r for r in area_json["SubItems"] if r.get("Name") == ambiente.nome)
-        except StopIteration:
-            print(f"⚠️  Aviso: Não foi possível encontrar a área '{area_name}' ou o ambiente '{ambiente.nome}' no JSON para adicionar cenas.")
+        room_json = self._graph().room(area_name, ambiente.nome)
+        if room_json is None:
+            self._log("warning", f"⚠️  Aviso: Não foi possível encontrar a área '{area_name}' ou o ambiente '{ambiente.nome}' no JSON para adicionar cenas.")
             return
 
         scenes_list = room_json.setdefault("Scenes", [])
 
         for cena_db in ambiente.cenas:
-            next_unit_id = self._find_max_unit_id() + 1
+            next_unit_id = self._unit_id_allocator().next()
 
             scene_payload = {
                 "$type": "Scene",
@@ -1893,22 +2308,22 @@ class RoehnProjectConverter:
                         circuito_id = int(acao_db.target_guid)
                         target_guid_resolved = self._circuit_guid_map.get(circuito_id)
                         if not target_guid_resolved:
-                            print(f"⚠️ Aviso: GUID para o circuito ID {circuito_id} não encontrado no mapa.")
+                            self._log("warning", f"⚠️ Aviso: GUID para o circuito ID {circuito_id} não encontrado no mapa.")
                             continue
                         action_payload["TargetGuid"] = target_guid_resolved
                     except (ValueError, TypeError):
-                        print(f"⚠️ Aviso: target_guid de circuito inválido para Acao ID {acao_db.id}: {acao_db.target_guid}")
+                        self._log("warning", f"⚠️ Aviso: target_guid de circuito inválido para Acao ID {acao_db.id}: {acao_db.target_guid}")
                         continue
                 elif acao_db.action_type == 7: # Group (Room)
                     try:
                         ambiente_id = int(acao_db.target_guid)
                         target_guid_resolved = self._room_guid_map.get(ambiente_id)
                         if not target_guid_resolved:
-                             print(f"⚠️ Aviso: GUID para o ambiente ID {ambiente_id} não encontrado no mapa.")
+                             self._log("warning", f"⚠️ Aviso: GUID para o ambiente ID {ambiente_id} não encontrado no mapa.")
                              continue
                         action_payload["TargetGuid"] = target_guid_resolved
                     except (ValueError, TypeError):
-                        print(f"⚠️ Aviso: target_guid de ambiente inválido para Acao ID {acao_db.id}: {acao_db.target_guid}")
+                        self._log("warning", f"⚠️ Aviso: target_guid de ambiente inválido para Acao ID {acao_db.id}: {acao_db.target_guid}")
                         continue
                 else: # Other types, assume GUID is direct
                     action_payload["TargetGuid"] = acao_db.target_guid
@@ -1918,7 +2333,7 @@ class RoehnProjectConverter:
                 if acao_db.action_type == 7: # Group (All Lights) Action
                     try:
                         target_ambiente_id = int(acao_db.target_guid)
-                        all_circuits_in_room = Circuito.query.filter_by(ambiente_id=target_ambiente_id).all()
+                        all_circuits_in_room = self._room_circuits.circuits_in(target_ambiente_id)
 
                         custom_actions_map = {
                             int(ca.target_guid): ca for ca in acao_db.custom_acoes if ca.target_guid.isdigit()
@@ -1967,13 +2382,60 @@ class RoehnProjectConverter:
                     action_payload["CustomActionValuesSerialized"] = custom_values
 
                 scene_payload["Actions"].append(action_payload)
+                self.stats.count("scene_actions")
 
             scenes_list.append(scene_payload)
-        print(f"✅ Cenas adicionadas para o ambiente: {ambiente.nome}")
+            self.stats.count("scenes")
+        self._log("debug", f"✅ Cenas adicionadas para o ambiente: {ambiente.nome}")
 
     def export_project(self):
         """Exporta o projeto como JSON (formato Roehn Wizard)"""
         if not self.project_data:
             raise ValueError("Nenhum projeto para exportar")
-            
-        return json.dumps(self.project_data, indent=2, ensure_ascii=False)
+
+        with self.stats.stage("serialization"):
+            output = json.dumps(self.project_data, indent=2, ensure_ascii=False)
+        self.stats.count("output_bytes", len(output.encode("utf-8")))
+        return output
+
+    def iter_export(self, indent=2, chunk_size=64 * 1024, on_complete=None):
+        """Exporta o projeto em blocos de bytes UTF-8, sem montar o documento inteiro.
+
+        Com ``indent=2`` a saída é idêntica à de ``export_project``; com
+        ``indent=None`` o JSON sai compacto (sem indentação nem espaços).
+        O tempo de serialização entra em ``stats`` à medida que os blocos são
+        gerados; ``on_complete(stats)`` é chamado depois do último bloco.
+        """
+        if not self.project_data:
+            raise ValueError("Nenhum projeto para exportar")
+
+        separators = (",", ":") if indent is None else None
+        encoder = json.JSONEncoder(indent=indent, separators=separators, ensure_ascii=False)
+
+        stats = self.stats
+
+        def generate():
+            buffer = []
+            size = 0
+            start = time.perf_counter()
+            for piece in encoder.iterencode(self.project_data):
+                buffer.append(piece)
+                size += len(piece)
+                if size >= chunk_size:
+                    chunk = "".join(buffer).encode("utf-8")
+                    stats.add("serialization", time.perf_counter() - start)
+                    stats.count("output_bytes", len(chunk))
+                    yield chunk
+                    start = time.perf_counter()
+                    buffer = []
+                    size = 0
+            if buffer:
+                chunk = "".join(buffer).encode("utf-8")
+                stats.count("output_bytes", len(chunk))
+            stats.add("serialization", time.perf_counter() - start)
+            if buffer:
+                yield chunk
+            if on_complete is not None:
+                on_complete(stats)
+
+        return generate()
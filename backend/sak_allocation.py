@@ -0,0 +1,134 @@
+# sak_allocation.py
+"""Alocação de SAKs (endereços de carga) dos circuitos de um projeto.
+
+Regras da criação de circuitos: hvac não recebe SAK; persiana ocupa dois SAKs
+consecutivos; os demais tipos, um. O próximo SAK é o maior SAK do projeto
+somado à quantidade de SAKs do circuito que o ocupa; para persiana, se o SAK
+seguinte a esse já estiver em uso, pula mais dois.
+
+``SakAllocator`` carrega os SAKs do projeto uma vez e aloca em memória, então
+criar N circuitos não custa N consultas.
+
+``plan_renumbering`` recalcula os SAKs do projeto inteiro em uma passada
+ordenada (área, ambiente, identificador), sem os buracos deixados por
+exclusões e trocas de tipo.
+"""
+import re
+
+from sqlalchemy import select
+
+from database import Area, Ambiente, Circuito
+
+
+def quantidade_saks_para(tipo):
+    if tipo == "hvac":
+        return 0
+    return 2 if tipo == "persiana" else 1
+
+
+class SakAllocator:
+    def __init__(self, circuitos):
+        """``circuitos``: objetos ou linhas com ``sak``, ``quantidade_saks`` e ``tipo``."""
+        self.used = set()
+        self.top = None  # (sak, quantidade_saks) do circuito não-hvac com o maior SAK
+        sem_sak = None
+        for c in circuitos:
+            if c.sak is not None:
+                self.used.add(c.sak)
+            if c.tipo == "hvac":
+                continue
+            if c.sak is None:
+                if sem_sak is None:
+                    sem_sak = c.quantidade_saks or 1
+            elif self.top is None or (c.sak, c.quantidade_saks or 1) > self.top:
+                self.top = (c.sak, c.quantidade_saks or 1)
+        if self.top is None and sem_sak is not None:
+            # Só há circuitos sem SAK: o maior "SAK" é tratado como 0
+            self.top = (0, sem_sak)
+
+    @classmethod
+    def load(cls, session, projeto_id):
+        """Carrega SAK, quantidade e tipo de todos os circuitos do projeto em uma consulta."""
+        rows = session.execute(
+            select(Circuito.sak, Circuito.quantidade_saks, Circuito.tipo)
+            .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+            .join(Area, Ambiente.area_id == Area.id)
+            .where(Area.projeto_id == projeto_id)
+            .order_by(Circuito.id)
+        )
+        return cls(rows)
+
+    def allocate(self, tipo):
+        """Reserva e devolve ``(sak, quantidade_saks)`` para um novo circuito do ``tipo``."""
+        quantidade = quantidade_saks_para(tipo)
+        if quantidade == 0:
+            return None, 0
+
+        if self.top is None:
+            sak = 1
+        else:
+            sak = self.top[0] + self.top[1]
+            if tipo == "persiana" and sak + 1 in self.used:
+                sak += 2
+
+        self.used.add(sak)
+        self.top = (sak, quantidade)
+        return sak, quantidade
+
+
+def _natural_key(value):
+    """Ordena "L2" antes de "L10" e ignora maiúsculas."""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part)
+            for part in re.split(r"(\d+)", (value or "").lower()) if part]
+
+
+def load_renumbering_rows(session, projeto_id):
+    """Circuitos do projeto com os nomes de área e ambiente, em uma consulta."""
+    return session.execute(
+        select(Circuito.id, Circuito.identificador, Circuito.tipo, Circuito.sak, Circuito.quantidade_saks,
+               Ambiente.nome.label("ambiente"), Area.nome.label("area"))
+        .join(Ambiente, Circuito.ambiente_id == Ambiente.id)
+        .join(Area, Ambiente.area_id == Area.id)
+        .where(Area.projeto_id == projeto_id)
+    ).all()
+
+
+def plan_renumbering(rows):
+    """Novos SAKs, a partir de 1, na ordem área → ambiente → identificador.
+
+    ``rows``: linhas de ``load_renumbering_rows``. Persianas ocupam dois SAKs
+    consecutivos e hvac fica sem SAK; ``quantidade_saks`` também é corrigida
+    conforme o tipo. Devolve ``(alteracoes, resumo)``, com só os circuitos que
+    mudam em ``alteracoes``.
+    """
+    ordered = sorted(rows, key=lambda r: (_natural_key(r.area), _natural_key(r.ambiente),
+                                          _natural_key(r.identificador), r.id))
+    alteracoes = []
+    proximo = 1
+    for r in ordered:
+        quantidade = quantidade_saks_para(r.tipo)
+        sak = proximo if quantidade else None
+        proximo += quantidade
+        if sak != r.sak or quantidade != r.quantidade_saks:
+            alteracoes.append({
+                "id": r.id,
+                "identificador": r.identificador,
+                "tipo": r.tipo,
+                "area": r.area,
+                "ambiente": r.ambiente,
+                "sak_atual": r.sak,
+                "sak_novo": sak,
+                "quantidade_atual": r.quantidade_saks,
+                "quantidade_nova": quantidade,
+            })
+
+    def maior(pares):
+        return max((sak + (quantidade or 1) - 1 for sak, quantidade in pares if sak is not None), default=0)
+
+    resumo = {
+        "total": len(ordered),
+        "alterados": len(alteracoes),
+        "maior_sak_atual": maior((r.sak, r.quantidade_saks) for r in ordered),
+        "maior_sak_novo": proximo - 1,
+    }
+    return alteracoes, resumo
@@ -0,0 +1,135 @@
+# serializers.py
+"""Serialização para JSON de circuitos, keypads e cenas, compartilhada pelas rotas da API.
+
+Os serializadores aceitam ``fields`` (conjunto de campos de primeiro nível)
+para devolver só parte do objeto; sem ``fields`` devolvem tudo.
+"""
+
+
+def serialize_keypad_button(button):
+    circuito = button.circuito
+    cena = button.cena
+    return {
+        "id": button.id,
+        "ordem": button.ordem,
+        "guid": button.guid,
+        "engraver_text": button.engraver_text,
+        "icon": button.icon,
+        "modo": button.modo,
+        "command_on": button.command_on,
+        "command_off": button.command_off,
+        "can_hold": button.can_hold,
+        "is_rocker": button.is_rocker,
+        "rocker_style": button.rocker_style,
+        "modo_double_press": button.modo_double_press,
+        "command_double_press": button.command_double_press,
+        "target_object_guid": button.target_object_guid,
+        "circuito_id": circuito.id if circuito else None,
+        "circuito": {
+            "id": circuito.id,
+            "identificador": circuito.identificador,
+            "nome": circuito.nome,
+            "tipo": circuito.tipo,
+        } if circuito else None,
+        "cena_id": cena.id if cena else None,
+        "cena": {
+            "id": cena.id,
+            "nome": cena.nome,
+        } if cena else None,
+    }
+
+
+def _pick(getters, fields):
+    """Monta o dict só com os campos pedidos (todos, se ``fields`` for None).
+
+    Os getters dos campos não pedidos não são chamados, então colunas e
+    relacionamentos que a consulta não carregou não disparam lazy load.
+    """
+    return {name: get() for name, get in getters.items() if fields is None or name in fields}
+
+
+def serialize_circuito(c, fields=None):
+    def ambiente():
+        if not c.ambiente:
+            return None
+        return {
+            "id": c.ambiente.id,
+            "nome": c.ambiente.nome,
+            "area": {
+                "id": c.ambiente.area.id,
+                "nome": c.ambiente.area.nome,
+            } if getattr(c.ambiente, "area", None) else None,
+        }
+
+    return _pick({
+        "id": lambda: c.id,
+        "identificador": lambda: c.identificador,
+        "nome": lambda: c.nome,
+        "tipo": lambda: c.tipo,
+        "dimerizavel": lambda: getattr(c, "dimerizavel", False),
+        "potencia": lambda: getattr(c, "potencia", 0.0),
+        "sak": lambda: getattr(c, "sak", None),
+        "ambiente": ambiente,
+    }, fields)
+
+
+def serialize_keypad(keypad, ambiente=None, area=None, fields=None):
+    """Serializa um keypad; ``ambiente``/``area`` evitam o lazy load quando já são conhecidos."""
+    def ambiente_out():
+        amb = ambiente if ambiente is not None else keypad.ambiente
+        if not amb:
+            return None
+        area_ = area if area is not None else amb.area
+        return {
+            "id": amb.id,
+            "nome": amb.nome,
+            "area": {
+                "id": area_.id,
+                "nome": area_.nome,
+            } if area_ else None,
+        }
+
+    return _pick({
+        "id": lambda: keypad.id,
+        "nome": lambda: keypad.nome,
+        "modelo": lambda: keypad.modelo,
+        "color": lambda: keypad.color,
+        "button_color": lambda: keypad.button_color,
+        "button_count": lambda: keypad.button_count,
+        "hsnet": lambda: keypad.hsnet,
+        "dev_id": lambda: keypad.dev_id,
+        "notes": lambda: keypad.notes,
+        "ambiente": ambiente_out,
+        "buttons": lambda: [serialize_keypad_button(btn) for btn in sorted(keypad.buttons, key=lambda b: b.ordem)],
+    }, fields)
+
+
+def serialize_custom_acao(custom_acao):
+    """Serializes a CustomAcao object."""
+    return {
+        "id": custom_acao.id,
+        "target_guid": custom_acao.target_guid,
+        "enable": custom_acao.enable,
+        "level": custom_acao.level,
+    }
+
+def serialize_acao(acao):
+    """Serializes an Acao object."""
+    return {
+        "id": acao.id,
+        "level": acao.level,
+        "action_type": acao.action_type,
+        "target_guid": acao.target_guid,
+        "custom_acoes": [serialize_custom_acao(ca) for ca in sorted(acao.custom_acoes, key=lambda x: x.id)],
+    }
+
+def serialize_cena(cena, fields=None):
+    """Serializes a Cena object."""
+    return _pick({
+        "id": lambda: cena.id,
+        "guid": lambda: cena.guid,
+        "nome": lambda: cena.nome,
+        "ambiente_id": lambda: cena.ambiente_id,
+        "scene_movers": lambda: cena.scene_movers,
+        "acoes": lambda: [serialize_acao(a) for a in sorted(cena.acoes, key=lambda x: x.id)],
+    }, fields)